@@ -1,18 +1,23 @@
 import inspect
 from pathlib import Path
-from typing import Callable, Type, TypeVar
+from typing import Callable, Optional, Type, TypeVar
 
 from .data_types import Evaluation, Prediction, Test  # noqa
 from .evaluator import (  # noqa
     EmbeddingEvaluator,
     Evaluator,
+    JsonEvaluator,
+    RegexEvaluator,
     SemanticEvaluator,
     StringMatchEvaluator,
+    StringSimilarityEvaluator,
 )
 from .input_types import ChatInput, SimilarityInput  # noqa
+from .matrix import Matrix, check_matrix_parameters, matrix_cells
 from .similarity import semantically_similar  # noqa
 from .singleton import TestSingleton  # noqa
 from .tester import Tester  # noqa
+from .usage import UsageTracker, record_usage  # noqa
 
 T = TypeVar("T")
 
@@ -23,18 +28,31 @@ __all__ = [
     "Test",
     "Evaluation",
     "StringMatchEvaluator",
+    "StringSimilarityEvaluator",
     "SemanticEvaluator",
     "Evaluator",
     "EmbeddingEvaluator",
+    "RegexEvaluator",
+    "JsonEvaluator",
+    "UsageTracker",
+    "record_usage",
 ]
 
 
-def test_wrapper(func: Callable[[T], str], input_type: Type[T], suite: Path) -> None:
+def test_wrapper(
+    func: Callable[[T], str], input_type: Type[T], suite: Path, matrix: Optional[list[dict]] = None
+) -> None:
     test_singleton = TestSingleton()
-    test_singleton.register(func, input_type=input_type, suite=suite)
+    test_singleton.register(func, input_type=input_type, suite=suite, matrix=matrix)
 
 
-def test(*, suite: str = ".") -> Callable[[Callable[[T], str]], None]:
+def test(*, suite: str = ".", matrix: Optional[Matrix] = None) -> Callable[[Callable[[T], str]], None]:
+    """Registers a test function, with a `matrix` it runs once per configuration, e.g. per model or prompt.
+
+    A matrix is either a dict of lists, whose every combination is a configuration, or a list of configurations. Each
+    configuration is passed to the function as keyword arguments next to the input.
+    """
+
     def test_decorator(func: Callable[[T], str]) -> None:
         suite_path = Path(suite)
         if not suite_path.is_absolute():
@@ -42,6 +60,10 @@ def test(*, suite: str = ".") -> Callable[[Callable[[T], str]], None]:
         type = func.__annotations__.get("input")
         if type is None:
             raise Exception("Your test function needs to have an input parameter annotated with the input type")
-        return test_wrapper(func, type, suite_path)
+        cells = None
+        if matrix is not None:
+            cells = matrix_cells(matrix)
+            check_matrix_parameters(func, cells)
+        return test_wrapper(func, type, suite_path, cells)
 
     return test_decorator
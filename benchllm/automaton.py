@@ -0,0 +1,116 @@
+from bisect import bisect_right
+from collections import deque
+from functools import lru_cache
+from typing import Sequence
+
+SEPARATOR = "\0"
+# scanning in Python only beats one C level `in` per reference from about this many references on
+AUTOMATON_MIN_REFERENCES = 32
+
+
+class Automaton:
+    """Aho-Corasick automaton that finds which of a fixed set of patterns occur in a text, in a single pass"""
+
+    def __init__(self, patterns: Sequence[str]) -> None:
+        self.patterns = tuple(patterns)
+        self._goto: list[dict[str, int]] = [{}]
+        self._outputs: list[tuple[int, ...]] = [()]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._outputs.append(())
+                state = next_state
+            self._outputs[state] += (index,)
+
+        # breadth first, so the failure state of a node is always finished before the node itself
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._outputs[next_state] += self._outputs[self._fail[next_state]]
+
+        # following the failure links ahead of time makes scanning a single dict lookup per character
+        self._transitions: list[dict[str, int]] = [dict(self._goto[0])] + [{} for _ in self._goto[1:]]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            # a state inherits the transitions of its failure state, which is shallower and already complete
+            self._transitions[state] = {**self._transitions[self._fail[state]], **self._goto[state]}
+            queue.extend(self._goto[state].values())
+
+    def find(self, text: str) -> set[int]:
+        """Indices of the patterns that occur in `text`"""
+        transitions, outputs = self._transitions, self._outputs
+        found = set(outputs[0])
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+                if len(found) == len(self.patterns):
+                    break
+        return found
+
+
+class ReferenceMatcher:
+    """Finds the references that occur in a text and the references that contain it.
+
+    The first direction scans the text once with an automaton when there are many references. The second searches
+    the text in all references joined by a separator, one C level scan per occurrence, and maps each occurrence back
+    to its reference through the offsets.
+    """
+
+    def __init__(self, references: Sequence[str]) -> None:
+        self.references = tuple(references)
+        self._automaton = Automaton(self.references) if len(self.references) >= AUTOMATON_MIN_REFERENCES else None
+        self._joined = SEPARATOR.join(self.references)
+        self._offsets = []
+        offset = 0
+        for reference in self.references:
+            self._offsets.append(offset)
+            offset += len(reference) + len(SEPARATOR)
+
+    def contained_in(self, text: str) -> set[int]:
+        """Indices of the references that are substrings of `text`"""
+        if self._automaton is None:
+            return {index for index, reference in enumerate(self.references) if reference in text}
+        return self._automaton.find(text)
+
+    def containing(self, text: str) -> set[int]:
+        """Indices of the references that `text` is a substring of"""
+        if not text:
+            return set(range(len(self.references)))
+        if SEPARATOR in text:
+            return {index for index, reference in enumerate(self.references) if text in reference}
+
+        found = set()
+        position = self._joined.find(text)
+        while position != -1:
+            index = bisect_right(self._offsets, position) - 1
+            found.add(index)
+            if index + 1 == len(self.references):
+                break
+            # the text can't span a separator, so continue with the next reference
+            position = self._joined.find(text, self._offsets[index + 1])
+        return found
+
+    def matching(self, text: str) -> set[int]:
+        """Indices of the references that are substrings of `text` or contain it"""
+        return self.contained_in(text) | self.containing(text)
+
+
+@lru_cache(maxsize=4096)
+def compile_references(references: tuple[str, ...], *, case_sensitive: bool = False) -> ReferenceMatcher:
+    """Builds the matcher of a test's references once, retries and repeated runs of the test reuse it"""
+    return ReferenceMatcher(references if case_sensitive else tuple(reference.lower() for reference in references))
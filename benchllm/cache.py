@@ -1,43 +1,94 @@
+import hashlib
 import json
+import os
+import re
+import shutil
+import threading
+from dataclasses import asdict, dataclass
 from pathlib import Path
 from typing import Optional
 
-from pydantic import BaseModel
+import numpy as np
 
 from benchllm.data_types import Evaluation, Prediction
+from benchllm.embedding import EmbeddingBackend, HashingEmbeddingBackend
 from benchllm.evaluator import Evaluator
 from benchllm.input_types import Json
 from benchllm.listener import EvaluatorListener
+from benchllm.usage import UsageTracker
 
+# before version 2, keys didn't say which evaluator the verdict came from
+CACHE_VERSION = "2"
+# version 1 caches were written by the default evaluator, the semantic one with its default model
+V1_CACHE_KEY = "SemanticEvaluator(model=gpt-3)"
 
-class MemoryValue(BaseModel):
+# caches of different evaluators in one process can share a file, they save it one at a time
+_save_lock = threading.Lock()
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+@dataclass(slots=True)
+class MemoryValue:
     passed: bool
     score: float
+    approximate: bool = False
+
+    @staticmethod
+    def from_dict(data: dict) -> "MemoryValue":
+        return MemoryValue(
+            passed=bool(data["passed"]), score=float(data["score"]), approximate=bool(data.get("approximate", False))
+        )
 
 
 class MemoryCache(Evaluator):
-    """Caches the results of the evaluator in memory"""
+    """Caches the results of the evaluator in memory.
+
+    Verdicts are keyed by the evaluator's `cache_key` as well as the pair of answers, so evaluators with different
+    rules sharing a cache never reuse each other's verdicts.
+    """
 
     def __init__(self, evaluator: Evaluator):
         super().__init__(workers=evaluator.workers)
-        self._data: dict = {}
+        self._data: dict[str, MemoryValue] = {}
         self._evaluator = evaluator
         self._num_cache_misses = 0
         self._num_cache_hits = 0
 
     def _key(self, answer1: Json, answer2: Json) -> str:
-        key1, key2 = json.dumps([answer1, answer2]), json.dumps([answer2, answer1])
+        evaluator = self._evaluator.cache_key
+        key1, key2 = json.dumps([evaluator, answer1, answer2]), json.dumps([evaluator, answer2, answer1])
         return key1 if key1 < key2 else key2
 
     def lookup(self, answer1: Json, answer2: Json) -> Optional[MemoryValue]:
-        result = self._data.get(self._key(answer1, answer2), None)
-        if result:
-            return MemoryValue(**result)
-        return None
+        return self._data.get(self._key(answer1, answer2))
 
     def store(self, answer1: Json, answer2: Json, value: MemoryValue) -> None:
-        key = self._key(answer1, answer2)
-        self._data[key] = value.dict()
+        self._data[self._key(answer1, answer2)] = value
+
+    @property
+    def name(self) -> str:
+        return self._evaluator.name
+
+    @property
+    def cache_key(self) -> str:
+        return self._evaluator.cache_key
+
+    def set_usage_tracker(self, usage: UsageTracker) -> None:
+        super().set_usage_tracker(usage)
+        self._evaluator.set_usage_tracker(usage)
+
+    def load(self, predictions: list[Prediction]) -> None:
+        super().load(predictions)
+        # evaluators that score all their predictions in one batch need to see them up front
+        self._evaluator.load(predictions)
+
+    def reset(self) -> None:
+        """Forgets the loaded predictions and the hit counts, the cached verdicts are kept"""
+        super().reset()
+        self._evaluator.reset()
+        self._num_cache_misses = 0
+        self._num_cache_hits = 0
 
     def evaluate_prediction(self, prediction: Prediction) -> list[Evaluator.Candidate]:
         uncached_expectations = []
@@ -47,7 +98,15 @@ class MemoryCache(Evaluator):
             if lookup is None:
                 uncached_expectations.append(expected)
             else:
-                candidates.append(Evaluator.Candidate(prediction=prediction.output, expected=expected, **lookup.dict()))
+                candidates.append(
+                    Evaluator.Candidate.construct(
+                        prediction=prediction.output,
+                        expected=expected,
+                        score=lookup.score,
+                        passed=lookup.passed,
+                        approximate=lookup.approximate,
+                    )
+                )
 
         # If any of the cached candidates passed, we return them.
         if any([candidate.passed for candidate in candidates]):
@@ -61,14 +120,21 @@ class MemoryCache(Evaluator):
             return candidates
 
         self._num_cache_misses += 1
-        # set prediction.test.expected to only the ones that were not cached
-        prediction = Prediction(**prediction.dict())
-        prediction.test.expected = uncached_expectations
-        candidates = self._evaluator.evaluate_prediction(prediction)
+        # only evaluate the expectations that were not cached, shallow copies leave the loaded prediction untouched
+        test = prediction.test.copy(update={"expected": uncached_expectations})
+        prediction = prediction.copy(update={"test": test})
+        candidates = self.evaluate_uncached(prediction)
         for candidate in candidates:
-            self.store(candidate.expected, candidate.prediction, MemoryValue(**candidate.dict()))
+            # evaluators may score with NumPy, the stored values have to be plain JSON
+            value = MemoryValue(
+                passed=bool(candidate.passed), score=float(candidate.score), approximate=bool(candidate.approximate)
+            )
+            self.store(candidate.expected, candidate.prediction, value)
         return candidates
 
+    def evaluate_uncached(self, prediction: Prediction) -> list[Evaluator.Candidate]:
+        return self._evaluator.evaluate_prediction(prediction)
+
     @property
     def num_cache_hits(self) -> int:
         return self._num_cache_hits
@@ -79,7 +145,11 @@ class MemoryCache(Evaluator):
 
 
 class FileCache(MemoryCache, EvaluatorListener):
-    """Caches the results of the evaluator in a json file"""
+    """Caches the results of the evaluator in a json file.
+
+    Several caches, e.g. of different evaluators, can share the file. Saving merges the entries with those other
+    caches saved since this one was loaded, rather than overwriting them.
+    """
 
     def __init__(self, evaluator: Evaluator, path: Path):
         super().__init__(evaluator)
@@ -90,17 +160,232 @@ class FileCache(MemoryCache, EvaluatorListener):
     def _load(self) -> None:
         if self._path.exists():
             try:
-                cache = json.loads(self._path.read_text(encoding="UTF-8"), parse_int=str)
-                if cache["version"] != "1":
-                    raise ValueError("Unsupported cache version")
-                self._data = cache["entries"]
+                self._data = {key: MemoryValue.from_dict(entry) for key, entry in read_entries(self._path).items()}
             except Exception:
                 print(f"Failed to load cache file {self._path}")
                 self._data = {}
+            _keep_v1_cache(self._path)
 
     def _save(self) -> None:
-        cache = {"entries": self._data, "version": "1"}
-        self._path.write_text(json.dumps(cache, indent=4), encoding="UTF-8")
+        with _save_lock:
+            try:
+                entries = read_entries(self._path) if self._path.exists() else {}
+            except Exception:
+                entries = {}
+            entries.update({key: asdict(value) for key, value in self._data.items()})
+            cache = {"entries": entries, "version": CACHE_VERSION}
+            # written next to the file and renamed, so other processes never read a partial cache
+            temporary_path = self._path.with_name(f"{self._path.name}.{os.getpid()}.tmp")
+            temporary_path.write_text(json.dumps(cache, indent=4), encoding="UTF-8")
+            os.replace(temporary_path, self._path)
 
     def evaluate_ended(self, evaluations: list[Evaluation]) -> None:
         self._save()
+
+
+class SemanticCache(FileCache):
+    """Reuses the verdict of a similar earlier evaluation when there is no exact match in the cache.
+
+    Outputs and expected values are embedded, and a verdict is reused when both the output and the expected value are
+    at least `threshold` similar to those of an earlier evaluation, and both contain the same numbers. Long texts that
+    only differ in a number embed almost the same, but rarely get the same verdict. Reused verdicts are marked as
+    approximate. The embeddings are kept next to the cache file, in a file per evaluator `cache_key`.
+    """
+
+    def __init__(
+        self, evaluator: Evaluator, path: Path, *, backend: Optional[EmbeddingBackend] = None, threshold: float = 0.95
+    ):
+        self._backend = backend or HashingEmbeddingBackend(dimensions=256)
+        self._threshold = threshold
+        digest = hashlib.sha1(evaluator.cache_key.encode()).hexdigest()[:12]
+        self._index_path = path.with_name(f"{path.stem}.{digest}.semantic.npz")
+        self._index = VerdictIndex()
+        self._index_lock = threading.Lock()
+        self._num_approximate_hits = 0
+        super().__init__(evaluator, path)
+
+    def _load(self) -> None:
+        super()._load()
+        if self._index_path.exists():
+            try:
+                self._index = VerdictIndex.load(self._index_path)
+            except Exception:
+                print(f"Failed to load semantic cache file {self._index_path}")
+
+    def _save(self) -> None:
+        super()._save()
+        with self._index_lock:
+            self._index.save(self._index_path)
+
+    def reset(self) -> None:
+        super().reset()
+        self._num_approximate_hits = 0
+
+    def evaluate_uncached(self, prediction: Prediction) -> list[Evaluator.Candidate]:
+        expected = prediction.test.expected
+        vectors = self._backend.embed([prediction.output, *expected])
+        output_vector, expected_vectors = vectors[0], vectors[1:]
+
+        candidates = []
+        remaining = []
+        with self._index_lock:
+            for text, vector in zip(expected, expected_vectors):
+                numbers = _numbers_digest(prediction.output, text)
+                verdict = self._index.search(output_vector, vector, numbers, threshold=self._threshold)
+                if verdict is None:
+                    remaining.append(text)
+                    continue
+                self._num_approximate_hits += 1
+                passed, score = verdict
+                candidates.append(
+                    Evaluator.Candidate.construct(
+                        prediction=prediction.output,
+                        expected=text,
+                        score=float(score),
+                        passed=bool(passed),
+                        approximate=True,
+                    )
+                )
+        if any(candidate.passed for candidate in candidates) or not remaining:
+            return candidates
+
+        prediction.test.expected = remaining
+        evaluated = self._evaluator.evaluate_prediction(prediction)
+        vectors_by_text = dict(zip(expected, expected_vectors))
+        with self._index_lock:
+            for candidate in evaluated:
+                if isinstance(candidate.expected, str) and candidate.expected in vectors_by_text:
+                    self._index.add(
+                        output_vector,
+                        vectors_by_text[candidate.expected],
+                        _numbers_digest(prediction.output, candidate.expected),
+                        candidate.passed,
+                        candidate.score,
+                    )
+        return candidates + evaluated
+
+    @property
+    def num_approximate_hits(self) -> int:
+        return self._num_approximate_hits
+
+
+def read_entries(path: Path) -> dict[str, dict]:
+    """The entries of a cache file, those of a version 1 file are keyed as verdicts of `V1_CACHE_KEY`"""
+    cache = json.loads(path.read_text(encoding="UTF-8"), parse_int=str)
+    if cache.get("version") == "1":
+        return {_v1_key(key): entry for key, entry in cache["entries"].items()}
+    if cache.get("version") != CACHE_VERSION:
+        raise ValueError("Unsupported cache version")
+    return cache["entries"]
+
+
+def _v1_key(key: str) -> str:
+    answer1, answer2 = json.loads(key)
+    key1, key2 = json.dumps([V1_CACHE_KEY, answer1, answer2]), json.dumps([V1_CACHE_KEY, answer2, answer1])
+    return key1 if key1 < key2 else key2
+
+
+def _keep_v1_cache(path: Path) -> None:
+    """Copies a version 1 cache file aside before it's rewritten in the current version"""
+    try:
+        version = json.loads(path.read_text(encoding="UTF-8")).get("version")
+    except Exception:
+        return
+    backup = path.with_name(f"{path.stem}.v1{path.suffix}")
+    if version == "1" and not backup.exists():
+        shutil.copy2(path, backup)
+        print(f"Upgrading cache file {path}, its verdicts are kept for {V1_CACHE_KEY} and the old file in {backup}")
+
+
+class VerdictIndex:
+    """Embeddings of evaluated (output, expected) pairs and their verdicts, searched by brute force with NumPy.
+
+    Each pair also keeps a digest of the numbers in it, a pair is only found again when its numbers are the same.
+    """
+
+    def __init__(
+        self,
+        outputs: Optional[np.ndarray] = None,
+        expected: Optional[np.ndarray] = None,
+        numbers: Optional[np.ndarray] = None,
+        passed: Optional[np.ndarray] = None,
+        scores: Optional[np.ndarray] = None,
+    ) -> None:
+        self._outputs = outputs
+        self._expected = expected
+        self._numbers = numbers if numbers is not None else np.empty(0, dtype=np.int64)
+        self._passed = passed if passed is not None else np.empty(0, dtype=bool)
+        self._scores = scores if scores is not None else np.empty(0, dtype=np.float32)
+        self._size = len(self._passed)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, output: np.ndarray, expected: np.ndarray, numbers: int, passed: bool, score: float) -> None:
+        if self._outputs is None or self._expected is None:
+            self._outputs = np.empty((0, len(output)), dtype=np.float32)
+            self._expected = np.empty((0, len(expected)), dtype=np.float32)
+        if self._size == len(self._passed):
+            # grow by doubling, so adding stays amortized constant time
+            capacity = max(2 * self._size, 16)
+            self._outputs = _resize(self._outputs, capacity)
+            self._expected = _resize(self._expected, capacity)
+            self._numbers = _resize(self._numbers, capacity)
+            self._passed = _resize(self._passed, capacity)
+            self._scores = _resize(self._scores, capacity)
+        self._outputs[self._size] = _unit(output)
+        self._expected[self._size] = _unit(expected)
+        self._numbers[self._size] = numbers
+        self._passed[self._size] = passed
+        self._scores[self._size] = score
+        self._size += 1
+
+    def search(
+        self, output: np.ndarray, expected: np.ndarray, numbers: int, *, threshold: float
+    ) -> Optional[tuple[bool, float]]:
+        """Verdict of the most similar pair whose output and expected value are both at least `threshold` similar"""
+        if not self._size or self._outputs is None or self._expected is None:
+            return None
+        similarities = np.minimum(
+            self._outputs[: self._size] @ _unit(output), self._expected[: self._size] @ _unit(expected)
+        )
+        similarities[self._numbers[: self._size] != numbers] = -np.inf
+        best = int(np.argmax(similarities))
+        if similarities[best] < threshold:
+            return None
+        return bool(self._passed[best]), float(self._scores[best])
+
+    def save(self, path: Path) -> None:
+        if self._outputs is None or self._expected is None:
+            return
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                outputs=self._outputs[: self._size],
+                expected=self._expected[: self._size],
+                numbers=self._numbers[: self._size],
+                passed=self._passed[: self._size],
+                scores=self._scores[: self._size],
+            )
+
+    @staticmethod
+    def load(path: Path) -> "VerdictIndex":
+        with np.load(path) as data:
+            return VerdictIndex(data["outputs"], data["expected"], data["numbers"], data["passed"], data["scores"])
+
+
+def _numbers_digest(*texts: object) -> int:
+    """Stable digest of the numbers in the texts, in order"""
+    numbers = "|".join(",".join(_NUMBER.findall(str(text))) for text in texts)
+    return int.from_bytes(hashlib.sha1(numbers.encode()).digest()[:8], "big", signed=True)
+
+
+def _resize(array: np.ndarray, capacity: int) -> np.ndarray:
+    resized = np.empty((capacity, *array.shape[1:]), dtype=array.dtype)
+    resized[: len(array)] = array
+    return resized
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional, TextIO
+
+from pydantic import ValidationError
+
+from benchllm.data_types import Evaluation, Prediction
+from benchllm.listener import EvaluatorListener, TesterListener
+
+CHECKPOINT_FILE_NAME = "checkpoint.jsonl"
+
+
+class CheckpointListener(TesterListener, EvaluatorListener):
+    """Appends every prediction and evaluation to a JSON lines file as soon as it's made.
+
+    Each line is flushed right away, so a run that is interrupted or crashes loses at most the line it was writing.
+    `load_checkpoint` reads the file back to resume the run. It's called as the events happen rather than from the
+    listener thread, so nothing that's done is left waiting in the event queue when the run is interrupted.
+    """
+
+    synchronous = True
+
+    def __init__(self, path: Path) -> None:
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        self._file: Optional[TextIO] = None
+
+    def _append(self, kind: str, payload: str) -> None:
+        line = f'{{"type": "{kind}", "{kind}": {payload}}}\n'
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                # a resumed checkpoint can end in a line cut short, the next record mustn't be glued onto it
+                cut_short = not _ends_with_newline(self.path)
+                self._file = open(self.path, "a", encoding="UTF-8")
+                if cut_short:
+                    self._file.write("\n")
+            self._file.write(line)
+            self._file.flush()
+
+    def test_ended(self, prediction: Prediction) -> None:
+        self._append("prediction", prediction.json())
+
+    def test_run_ended(self, predications: list[Prediction]) -> None:
+        self.close()
+
+    def evaluate_prediction_ended(self, evaluation: Evaluation) -> None:
+        self._append("evaluation", evaluation.json())
+
+    def evaluate_ended(self, evaluations: list[Evaluation]) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _ends_with_newline(path: Path) -> bool:
+    """True for files that are missing or empty too, there's nothing to end there"""
+    if not path.exists() or path.stat().st_size == 0:
+        return True
+    with open(path, "rb") as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
+
+
+def load_checkpoint(path: Path) -> tuple[list[Prediction], list[Evaluation]]:
+    """Reads the predictions and evaluations of a checkpoint, skipping a last line cut short by an interruption"""
+    predictions: list[Prediction] = []
+    evaluations: list[Evaluation] = []
+    if not path.exists():
+        return predictions, evaluations
+    with open(path, encoding="UTF-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+                if record["type"] == "prediction":
+                    predictions.append(Prediction(**record["prediction"]))
+                elif record["type"] == "evaluation":
+                    evaluations.append(Evaluation(**record["evaluation"]))
+            except (json.JSONDecodeError, KeyError, ValidationError):
+                continue
+    return predictions, evaluations
@@ -1,6 +1,19 @@
 from .commands.add_test import add_test  # noqa
+from .commands.embed import embed_suites  # noqa
 from .commands.evaluate import evaluate_predictions  # noqa
 from .commands.list_tests import list_tests  # noqa
+from .commands.merge import merge_runs  # noqa
 from .commands.run_suite import run_suite  # noqa
+from .commands.watch import watch_suite  # noqa
+from .commands.worker import run_worker  # noqa
 
-__all__ = ["add_test", "evaluate_predictions", "list_tests", "run_suite"]
+__all__ = [
+    "add_test",
+    "embed_suites",
+    "evaluate_predictions",
+    "list_tests",
+    "merge_runs",
+    "run_suite",
+    "run_worker",
+    "watch_suite",
+]
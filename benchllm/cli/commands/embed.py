@@ -0,0 +1,17 @@
+from pathlib import Path
+
+import typer
+
+from benchllm.embedding import EmbeddingBackend, precompute_expected
+from benchllm.tester import load_files
+
+
+def embed_suites(*, suite_paths: list[Path], backend: EmbeddingBackend) -> None:
+    """Stores the embeddings of all expected values next to the tests, so evaluations only embed outputs"""
+    tests = [test for suite_path in suite_paths for test in load_files(suite_path)]
+    embeddings, num_computed = precompute_expected(tests, backend)
+    typer.secho(
+        f"Embedded {num_computed} new expected values, {len(embeddings) - num_computed} were already stored",
+        fg=typer.colors.GREEN,
+        bold=True,
+    )
@@ -1,18 +1,44 @@
 from pathlib import Path
+from typing import Optional
 
 from benchllm.cache import FileCache
-from benchllm.cli.listener import ReportListener, RichCliListener
-from benchllm.cli.utils import add_cache, get_evaluator
+from benchllm.cli.listener import ReportListener, RichCliListener, print_metrics
+from benchllm.cli.utils import (
+    add_cache,
+    add_limiter,
+    get_evaluator,
+    run_evaluator,
+    write_usage,
+)
+from benchllm.metrics import MetricsListener
+from benchllm.profiler import NO_PROFILER, Profiler
+from benchllm.usage import UsageTracker
 from benchllm.utils import find_json_yml_files, load_prediction_files
 
 
 def evaluate_predictions(
-    file_or_dir: list[Path], model: str, output_dir: Path, workers: int, evaluator_name: str, cache: str
+    file_or_dir: list[Path],
+    model: str,
+    output_dir: Path,
+    workers: int,
+    evaluator_name: str,
+    cache: str,
+    sample_width: Optional[float] = None,
+    pass_threshold: Optional[float] = None,
+    max_failures: Optional[int] = None,
+    metrics: bool = False,
+    profile: bool = False,
+    profile_memory: bool = False,
+    max_tokens: Optional[int] = None,
+    max_cost: Optional[float] = None,
+    adaptive_limit: Optional[int] = None,
 ) -> bool:
     files = find_json_yml_files(file_or_dir)
 
     cli_listener = RichCliListener(root_dir=Path.cwd(), interactive=evaluator_name == "interactive", eval_only=True)
     report_listener = ReportListener(output_dir=output_dir)
+    metrics_listener = MetricsListener(path=output_dir / "metrics.json", root_dir=Path.cwd())
+    profiler = Profiler(cprofile=True, memory=profile_memory) if profile or profile_memory else NO_PROFILER
 
     load_prediction_files(file_or_dir)
 
@@ -20,11 +46,23 @@ def evaluate_predictions(
     evaluator = add_cache(cache, evaluator, output_dir.parent / "cache.json")
 
     cli_listener.set_evaulator(evaluator)
+    metrics_listener.set_evaluator(evaluator)
+    evaluator.set_profiler(profiler)
+    usage = UsageTracker(max_tokens=max_tokens, max_cost=max_cost)
+    evaluator.set_usage_tracker(usage)
+    add_limiter(evaluator, adaptive_limit)
 
     evaluator.add_listener(cli_listener)
     evaluator.add_listener(report_listener)
+    evaluator.add_listener(metrics_listener)
     for file in files:
         evaluator.load_prediction_file(file)
 
-    evaluator.run()
-    return not evaluator.failed
+    success = run_evaluator(
+        evaluator, sample_width=sample_width, pass_threshold=pass_threshold, max_failures=max_failures
+    )
+    if metrics:
+        print_metrics(metrics_listener.summary())
+    write_usage(usage, output_dir)
+    profiler.write(output_dir / "profile")
+    return success
@@ -0,0 +1,55 @@
+import json
+import shutil
+from pathlib import Path
+
+import typer
+
+from benchllm.cache import CACHE_VERSION, read_entries
+from benchllm.cli.listener import RichCliListener
+from benchllm.utils import load_evaluation_files
+
+
+def merge_runs(*, output_dirs: list[Path], output_dir: Path) -> bool:
+    """Combines the reports and caches of several (sharded) runs into `output_dir`"""
+    for report in ("predictions", "evaluations"):
+        for run_dir in output_dirs:
+            if not (run_dir / report).exists():
+                continue
+            (output_dir / report).mkdir(parents=True, exist_ok=True)
+            # the reports of matrix variants are in folders of their own
+            for file_path in (run_dir / report).rglob("*.json"):
+                target = output_dir / report / file_path.relative_to(run_dir / report)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(file_path, target)
+
+    merge_caches(
+        [path for run_dir in output_dirs for path in (run_dir / "cache.json", run_dir.parent / "cache.json")],
+        output_dir.parent / "cache.json",
+    )
+
+    if not (output_dir / "evaluations").exists():
+        num_predictions = len(list((output_dir / "predictions").rglob("*.json")))
+        typer.secho(f"Merged {num_predictions} predictions into {output_dir}", fg=typer.colors.GREEN, bold=True)
+        return True
+
+    evaluations = load_evaluation_files([output_dir / "evaluations"])
+    cli_listener = RichCliListener(root_dir=Path.cwd(), interactive=False)
+    cli_listener.evaluate_ended(evaluations)
+    return all(evaluation.passed for evaluation in evaluations)
+
+
+def merge_caches(cache_paths: list[Path], output_path: Path) -> None:
+    """Adds the entries of the caches to the cache at `output_path`, keeping the verdicts it already has"""
+    entries = {}
+    for cache_path in dict.fromkeys([output_path, *cache_paths]):
+        if not cache_path.exists():
+            continue
+        try:
+            entries.update(read_entries(cache_path))
+        except ValueError:
+            if cache_path == output_path:
+                typer.secho(f"Not merging into unsupported cache file {cache_path}", fg=typer.colors.RED, bold=True)
+                return
+            typer.secho(f"Skipping unsupported cache file {cache_path}", fg=typer.colors.YELLOW)
+    if entries:
+        output_path.write_text(json.dumps({"entries": entries, "version": CACHE_VERSION}, indent=4), encoding="UTF-8")
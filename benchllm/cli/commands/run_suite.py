@@ -1,11 +1,40 @@
+import json
+import sys
 from pathlib import Path
+from typing import Optional
 
 import typer
 
 from benchllm.cache import FileCache
-from benchllm.cli.listener import ReportListener, RichCliListener
-from benchllm.cli.utils import add_cache, get_evaluator
+from benchllm.checkpoint import (
+    CHECKPOINT_FILE_NAME,
+    CheckpointListener,
+    load_checkpoint,
+)
+from benchllm.cli.listener import (
+    ReportListener,
+    RichCliListener,
+    print_comparison,
+    print_metrics,
+    print_stability,
+)
+from benchllm.cli.utils import (
+    add_cache,
+    add_limiter,
+    get_evaluator,
+    print_budget_spent,
+    remaining_failures,
+    run_evaluator,
+    write_usage,
+)
+from benchllm.data_types import Evaluation
+from benchllm.matrix import compare_variants
+from benchllm.metrics import MetricsListener
+from benchllm.profiler import NO_PROFILER, Profiler
+from benchllm.scheduler import find_previous_run, load_history
+from benchllm.stability import summarize_stability
 from benchllm.tester import Tester
+from benchllm.usage import UsageTracker
 from benchllm.utils import find_files
 
 
@@ -19,6 +48,22 @@ def run_suite(
     evaluator_name: str,
     retry_count: int,
     cache: str,
+    sample_width: Optional[float] = None,
+    pass_threshold: Optional[float] = None,
+    prioritize: bool = False,
+    max_failures: Optional[int] = None,
+    metrics: bool = False,
+    profile: bool = False,
+    profile_memory: bool = False,
+    shard: Optional[tuple[int, int]] = None,
+    processes: int = 1,
+    concurrency: Optional[dict[str, int]] = None,
+    max_tokens: Optional[int] = None,
+    max_cost: Optional[float] = None,
+    adaptive_limit: Optional[int] = None,
+    resume: bool = False,
+    retry_workers: int = 1,
+    adaptive_retries: bool = False,
 ) -> bool:
     files = find_files(file_search_paths)
     if not files:
@@ -29,31 +74,102 @@ def run_suite(
         )
         return False
 
-    cli_listener = RichCliListener(root_dir=Path.cwd(), interactive=evaluator_name == "interactive", test_only=no_eval)
+    cli_listener = RichCliListener(
+        root_dir=Path.cwd(),
+        interactive=evaluator_name == "interactive",
+        test_only=no_eval,
+        live_metrics=metrics and sys.stdout.isatty(),
+    )
     report_listener = ReportListener(output_dir=output_dir)
+    metrics_listener = MetricsListener(path=output_dir / "metrics.json", root_dir=Path.cwd())
+    profiler = Profiler(cprofile=True, memory=profile_memory) if profile or profile_memory else NO_PROFILER
+    usage = UsageTracker(max_tokens=max_tokens, max_cost=max_cost)
+    checkpoint_listener = CheckpointListener(output_dir / CHECKPOINT_FILE_NAME)
 
-    tester = Tester(retry_count=retry_count)
+    tester = Tester(
+        retry_count=retry_count,
+        max_failures=max_failures,
+        profiler=profiler,
+        shard=shard,
+        processes=processes,
+        concurrency=concurrency,
+        usage=usage,
+        adaptive_limit=adaptive_limit,
+        retry_workers=retry_workers,
+        adaptive_retries=adaptive_retries,
+    )
     tester.add_listener(cli_listener)
     tester.add_listener(report_listener)
+    tester.add_listener(metrics_listener)
+    tester.add_listener(checkpoint_listener)
 
     # Load the the python files first, then the tests.
     for file in files:
         tester.load_module(file)
 
-    # Finally, start collecting the predictions.
-    tester.run()
+    if prioritize:
+        previous_run = find_previous_run(output_dir)
+        if previous_run:
+            tester.prioritize(load_history(previous_run))
 
-    if no_eval:
-        return True
+    evaluations: list[Evaluation] = []
+    if resume:
+        predictions, evaluations = load_checkpoint(output_dir / CHECKPOINT_FILE_NAME)
+        tester.resume(predictions)
+        typer.secho(
+            f"Resuming {output_dir} with {len(predictions)} predictions and {len(evaluations)} evaluations done",
+            fg=typer.colors.BLUE,
+        )
+
+    try:
+        # Finally, start collecting the predictions.
+        tester.run()
 
-    evaluator = get_evaluator(evaluator_name, model, workers)
-    evaluator = add_cache(cache, evaluator, output_dir.parent / "cache.json")
+        if tester.aborted:
+            typer.secho(f"Stopped after {tester.num_failures} failed tests", fg=typer.colors.RED, bold=True)
+            return False
+        if tester.over_budget:
+            print_budget_spent()
+            return False
+        if no_eval:
+            return True
 
-    cli_listener.set_evaulator(evaluator)
+        evaluator = get_evaluator(evaluator_name, model, workers)
+        evaluator = add_cache(cache, evaluator, output_dir.parent / "cache.json")
 
-    evaluator.add_listener(cli_listener)
-    evaluator.add_listener(report_listener)
-    evaluator.load(tester.predictions)
+        cli_listener.set_evaulator(evaluator)
+        metrics_listener.set_evaluator(evaluator)
+        evaluator.set_profiler(profiler)
+        evaluator.set_usage_tracker(usage)
+        add_limiter(evaluator, adaptive_limit)
 
-    evaluator.run()
-    return not evaluator.failed
+        evaluator.add_listener(cli_listener)
+        evaluator.add_listener(report_listener)
+        evaluator.add_listener(metrics_listener)
+        evaluator.add_listener(checkpoint_listener)
+        evaluator.load(tester.predictions)
+        evaluator.resume(evaluations)
+
+        success = run_evaluator(
+            evaluator,
+            sample_width=sample_width,
+            pass_threshold=pass_threshold,
+            max_failures=remaining_failures(max_failures, tester.num_failures),
+        )
+        comparison = compare_variants(evaluator.evaluations)
+        if comparison["functions"]:
+            (output_dir / "comparison.json").write_text(json.dumps(comparison, indent=2), encoding="UTF-8")
+            print_comparison(comparison)
+        if retry_count > 1:
+            stability = summarize_stability(evaluator.evaluations)
+            if stability["tests"]:
+                stability_json = json.dumps(stability, indent=2, default=str)
+                (output_dir / "stability.json").write_text(stability_json, encoding="UTF-8")
+                print_stability(stability)
+        return success
+    finally:
+        # however the run ends, even stopped early or interrupted, its metrics, usage and profile are kept
+        if metrics:
+            print_metrics(metrics_listener.summary())
+        write_usage(usage, output_dir)
+        profiler.write(output_dir / "profile")
@@ -0,0 +1,165 @@
+import traceback
+from pathlib import Path
+from typing import Optional
+
+import typer
+
+from benchllm.cli.listener import ReportListener, RichCliListener, print_centered
+from benchllm.cli.utils import (
+    add_cache,
+    add_limiter,
+    get_evaluator,
+    remaining_failures,
+    run_evaluator,
+)
+from benchllm.data_types import Test, TestFunction
+from benchllm.evaluator import Evaluator
+from benchllm.tester import Tester
+from benchllm.watcher import FileWatcher, WatchedSuite
+
+
+def watch_suite(
+    *,
+    file_search_paths: list[Path],
+    model: str,
+    output_dir: Path,
+    no_eval: bool,
+    workers: int,
+    evaluator_name: str,
+    retry_count: int,
+    cache: str,
+    pass_threshold: Optional[float] = None,
+    max_failures: Optional[int] = None,
+    shard: Optional[tuple[int, int]] = None,
+    processes: int = 1,
+    concurrency: Optional[dict[str, int]] = None,
+    adaptive_limit: Optional[int] = None,
+    retry_workers: int = 1,
+    adaptive_retries: bool = False,
+    interval: float = 0.5,
+) -> bool:
+    """Runs the suite, then runs the tests affected by each change to the test modules and suites until interrupted.
+
+    The process, the imported modules and the evaluator with its cache stay warm between runs. Returns whether the
+    last run succeeded.
+    """
+    suite = WatchedSuite(file_search_paths)
+    runs = suite.load()
+    print_load_errors(suite)
+    if not suite.test_functions:
+        typer.secho(
+            f"No python files with @benchllm.test found in {', '.join(map(str, file_search_paths))}",
+            fg=typer.colors.RED,
+            bold=True,
+        )
+        return False
+
+    cli_listener = RichCliListener(root_dir=Path.cwd(), interactive=evaluator_name == "interactive", test_only=no_eval)
+    report_listener = ReportListener(output_dir=output_dir)
+    evaluator = None
+    if not no_eval:
+        evaluator = add_cache(cache, get_evaluator(evaluator_name, model, workers), output_dir.parent / "cache.json")
+        add_limiter(evaluator, adaptive_limit)
+        cli_listener.set_evaulator(evaluator)
+        evaluator.add_listener(cli_listener)
+        evaluator.add_listener(report_listener)
+
+    # reports and the cache are written on every run, they must not trigger the next one
+    watcher = FileWatcher(
+        [*file_search_paths, *suite.suite_directories],
+        ignore=[output_dir, output_dir.parent / "cache.json"],
+        interval=interval,
+    )
+    success = False
+    try:
+        while True:
+            success = run_affected(
+                runs,
+                tester=Tester(
+                    retry_count=retry_count,
+                    max_failures=max_failures,
+                    shard=shard,
+                    processes=processes,
+                    concurrency=concurrency,
+                    adaptive_limit=adaptive_limit,
+                    retry_workers=retry_workers,
+                    adaptive_retries=adaptive_retries,
+                ),
+                listeners=[cli_listener, report_listener],
+                evaluator=evaluator,
+                pass_threshold=pass_threshold,
+                max_failures=max_failures,
+            )
+            print_centered(" Watching for changes, press Ctrl+C to stop ", "-")
+            runs = []
+            while not runs:
+                changed = watcher.wait()
+                runs = suite.update(changed)
+                print_load_errors(suite)
+            watcher.add_paths(suite.suite_directories)
+            # loading writes ids into new test files, that isn't a change to run again
+            watcher.poll()
+    except KeyboardInterrupt:
+        return success
+
+
+def run_affected(
+    runs: list[tuple[TestFunction, list[Test]]],
+    *,
+    tester: Tester,
+    listeners: list,
+    evaluator: Optional[Evaluator],
+    pass_threshold: Optional[float],
+    max_failures: Optional[int],
+) -> bool:
+    """Runs and evaluates the tests, an error of a test function or the evaluator fails the run but not the watch"""
+    try:
+        return _run_affected(
+            runs,
+            tester=tester,
+            listeners=listeners,
+            evaluator=evaluator,
+            pass_threshold=pass_threshold,
+            max_failures=max_failures,
+        )
+    except Exception:
+        # a broken prompt or test function is the normal state while editing
+        typer.echo("")
+        typer.secho(traceback.format_exc(), fg=typer.colors.RED)
+        return False
+
+
+def _run_affected(
+    runs: list[tuple[TestFunction, list[Test]]],
+    *,
+    tester: Tester,
+    listeners: list,
+    evaluator: Optional[Evaluator],
+    pass_threshold: Optional[float],
+    max_failures: Optional[int],
+) -> bool:
+    for listener in listeners:
+        tester.add_listener(listener)
+    for test_function, tests in runs:
+        tester.add_test_function(test_function)
+        tester.add_tests(tests, test_function.function_id)
+    tester.run()
+    if tester.aborted:
+        typer.secho(f"Stopped after {tester.num_failures} failed tests", fg=typer.colors.RED, bold=True)
+        return False
+    if evaluator is None or not tester.predictions:
+        return True
+
+    evaluator.reset()
+    evaluator.load(tester.predictions)
+    return run_evaluator(
+        evaluator,
+        sample_width=None,
+        pass_threshold=pass_threshold,
+        max_failures=remaining_failures(max_failures, tester.num_failures),
+    )
+
+
+def print_load_errors(suite: WatchedSuite) -> None:
+    for path, error in suite.errors.items():
+        typer.secho(f"Failed to load {path}: {error}", fg=typer.colors.RED)
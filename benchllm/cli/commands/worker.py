@@ -0,0 +1,142 @@
+import os
+import time
+from pathlib import Path
+
+import typer
+
+from benchllm.cli.listener import ReportListener
+from benchllm.data_types import FunctionID, Prediction, Test
+from benchllm.listener import TesterListener
+from benchllm.tester import Tester
+from benchllm.utils import find_files
+from benchllm.work_queue import Batch, Lease, WorkQueue
+
+
+class LeaseListener(TesterListener):
+    """Keeps the lease of a batch alive while its tests are running"""
+
+    def __init__(self, queue: WorkQueue, lease: Lease) -> None:
+        self._queue = queue
+        self._lease = lease
+
+    def test_ended(self, prediction: Prediction) -> None:
+        self._queue.renew(self._lease)
+
+
+def search_root(file_search_paths: list[Path]) -> Path:
+    """The directory holding all of the search paths, which may be mounted elsewhere on each worker"""
+    directories = [path if path.is_dir() else path.parent for path in file_search_paths]
+    return Path(os.path.commonpath([directory.resolve() for directory in directories]))
+
+
+def _relative_path(path: Path, root: Path) -> str:
+    return Path(os.path.relpath(path.resolve(), root)).as_posix()
+
+
+def function_key(function_id: FunctionID, root: Path) -> str:
+    return str(function_id.copy(update={"module_path": _relative_path(function_id.module_path, root)}))
+
+
+def test_key(test: Test, root: Path) -> str:
+    # test files are the same on every worker, whereas ids generated while loading a suite may not be
+    return _relative_path(test.file_path, root) if test.file_path else test.id
+
+
+def run_worker(
+    *,
+    file_search_paths: list[Path],
+    queue_dir: Path,
+    output_dir: Path,
+    batch_size: int,
+    lease_timeout: float,
+    retry_count: int,
+    max_attempts: int = 3,
+    poll_interval: float = 1.0,
+) -> bool:
+    files = find_files(file_search_paths)
+    if not files:
+        typer.secho(
+            f"No python files with @benchllm.test found in {', '.join(map(str, file_search_paths))}",
+            fg=typer.colors.RED,
+            bold=True,
+        )
+        return False
+
+    discovery = Tester()
+    for file in files:
+        discovery.load_module(file)
+
+    root = search_root(file_search_paths)
+    queue = WorkQueue(queue_dir, lease_timeout=lease_timeout, max_attempts=max_attempts)
+    test_keys = [
+        (function_key(test_function.function_id, root), test_key(test, root))
+        for test_function in discovery.test_functions
+        for test in discovery.tests(test_function.function_id)
+    ]
+    batches = [
+        Batch(id=f"{i // batch_size:08d}", tests=test_keys[i : i + batch_size])
+        for i in range(0, len(test_keys), batch_size)
+    ]
+    try:
+        if queue.seed(batches):
+            typer.secho(f"Queued {len(batches)} batches of up to {batch_size} tests", fg=typer.colors.GREEN)
+    except TimeoutError as e:
+        typer.secho(str(e), fg=typer.colors.RED, bold=True)
+        return False
+
+    test_functions = {
+        function_key(test_function.function_id, root): test_function for test_function in discovery.test_functions
+    }
+    tests = {
+        (function_key(test_function.function_id, root), test_key(test, root)): test
+        for test_function in discovery.test_functions
+        for test in discovery.tests(test_function.function_id)
+    }
+    report_listener = ReportListener(output_dir=output_dir)
+
+    while True:
+        queue.requeue_expired()
+        lease = queue.claim()
+        if lease is None:
+            if queue.is_finished():
+                break
+            time.sleep(poll_interval)
+            continue
+
+        tester = Tester(retry_count=retry_count)
+        tester.add_listener(report_listener)
+        tester.add_listener(LeaseListener(queue, lease))
+        try:
+            for batch_function_key, batch_test_key in lease.batch.tests:
+                if (batch_function_key, batch_test_key) not in tests:
+                    raise LookupError(f"{batch_test_key} of {batch_function_key} isn't in {root}")
+                test_function = test_functions[batch_function_key]
+                tester.add_test_function(test_function)
+                tester.add_test(tests[(batch_function_key, batch_test_key)], test_function.function_id)
+            predictions = tester.run()
+        except Exception as e:
+            gave_up = queue.release(lease, error=f"{type(e).__name__}: {e}")
+            attempts = queue.attempts(lease.batch.id)
+            typer.secho(
+                f"Batch {lease.batch.id} failed on attempt {attempts}: {type(e).__name__}: {e}"
+                + (", giving up on it" if gave_up else ", handing it back"),
+                fg=typer.colors.RED,
+            )
+            continue
+        queue.complete(lease)
+        typer.echo(f"Batch {lease.batch.id}: {len(predictions)} predictions")
+
+    if queue.failed_batches:
+        typer.secho(
+            f"Queue finished, {len(queue.failed_batches)} batches failed after {max_attempts} attempts:"
+            f" {', '.join(queue.failed_batches)}. See {queue_dir / 'attempts'} for the errors.",
+            fg=typer.colors.RED,
+            bold=True,
+        )
+        return False
+    typer.secho(
+        f"Queue finished, {queue.num_done} batches done. Evaluate with: bench eval {output_dir / 'predictions'}",
+        fg=typer.colors.GREEN,
+        bold=True,
+    )
+    return True
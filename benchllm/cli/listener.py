@@ -1,15 +1,17 @@
 import datetime
 import json
+import re
 from pathlib import Path
+from timeit import default_timer as timer
 from typing import Optional
 
 import typer
 from rich import print
 from rich.console import Console
-from rich.markup import render
+from rich.markup import escape, render
 from rich.table import Table
 
-from benchllm.cache import MemoryCache
+from benchllm.cache import MemoryCache, SemanticCache
 from benchllm.data_types import (
     CallErrorType,
     Evaluation,
@@ -20,6 +22,8 @@ from benchllm.data_types import (
 )
 from benchllm.evaluator import Evaluator
 from benchllm.listener import EvaluatorListener, TesterListener
+from benchllm.metrics import LatencyHistogram
+from benchllm.sampling import PassRateEstimate
 from benchllm.utils import collect_call_errors
 
 
@@ -29,7 +33,7 @@ class ReportListener(TesterListener, EvaluatorListener):
         self.output_dir = output_dir
 
     def test_ended(self, prediction: Prediction) -> None:
-        path = self.output_dir / "predictions" / f"{prediction.test.id}.json"
+        path = self.output_dir / "predictions" / report_file_name(prediction)
         path.parent.mkdir(parents=True, exist_ok=True)
 
         with open(path, "w") as f:
@@ -40,14 +44,29 @@ class ReportListener(TesterListener, EvaluatorListener):
         prediction_json = evaluation_json.pop("prediction")
         prediction_json["evaluation"] = evaluation_json
 
-        path = self.output_dir / "evaluations" / f"{evaluation.prediction.test.id}.json"
+        path = self.output_dir / "evaluations" / report_file_name(evaluation.prediction)
         path.parent.mkdir(parents=True, exist_ok=True)
 
         with open(path, "w") as f:
             json.dump(prediction_json, f, indent=2)
 
 
+def report_file_name(prediction: Prediction) -> Path:
+    """The variants of a parameterized test function run the same tests, so their reports go into separate folders"""
+    variant = prediction.function_id.variant
+    if variant is None:
+        return Path(f"{prediction.test.id}.json")
+    return Path(re.sub(r"[^\w.=,-]+", "_", variant), f"{prediction.test.id}.json")
+
+
 class RichCliListener(TesterListener, EvaluatorListener):
+    """Prints the progress of the run, a mark per test and evaluation.
+
+    With `live_metrics`, the marks of the tests are replaced by a line that is rewritten after every test, counting the
+    tests of the function and showing the p50 and p95 latency and throughput of the run so far. It rewrites the line
+    with a carriage return, so it's meant for terminals.
+    """
+
     def __init__(
         self,
         root_dir: Path,
@@ -55,18 +74,28 @@ class RichCliListener(TesterListener, EvaluatorListener):
         interactive: bool,
         test_only: bool = False,
         eval_only: bool = False,
+        live_metrics: bool = False,
     ) -> None:
         super().__init__()
         self.root_dir = root_dir
         self.interactive = interactive
+        # the output must come in between the interactive evaluator's prompts
+        self.synchronous = interactive
         self._eval_only = eval_only
         self._test_only = test_only
         self._evaluator: Optional[Evaluator] = None
+        self._live_metrics = live_metrics
+        self._latency = LatencyHistogram()
+        self._run_started = timer()
+        self._function_name = ""
+        self._function_counts = {".": 0, "E": 0, "s": 0}
 
     def set_evaulator(self, evaluator: Evaluator) -> None:
         self._evaluator = evaluator
 
     def test_run_started(self) -> None:
+        self._latency = LatencyHistogram()
+        self._run_started = timer()
         print_centered(" Run Tests ")
 
     def test_run_ended(self, predications: list[Prediction]) -> None:
@@ -77,7 +106,9 @@ class RichCliListener(TesterListener, EvaluatorListener):
         print_centered(tmp)
 
     def test_function_started(self, test_function: TestFunction) -> None:
-        typer.echo(f"{test_function.function_id.relative_str(self.root_dir)} ", nl=False)
+        self._function_name = test_function.function_id.relative_str(self.root_dir)
+        self._function_counts = {".": 0, "E": 0, "s": 0}
+        typer.echo(f"{self._function_name} ", nl=False)
 
     def test_function_ended(self) -> None:
         typer.echo("")
@@ -86,13 +117,33 @@ class RichCliListener(TesterListener, EvaluatorListener):
         pass
 
     def test_ended(self, prediction: Prediction) -> None:
-        typer.secho(".", fg=typer.colors.GREEN, bold=True, nl=False)
+        self._latency.record(prediction.time_elapsed)
+        self._test_mark(".", typer.colors.GREEN)
 
     def test_skipped(self, test: Test, error: bool = False) -> None:
         if error:
-            typer.secho("E", fg=typer.colors.RED, bold=True, nl=False)
+            self._test_mark("E", typer.colors.RED)
         else:
-            typer.secho("s", fg=typer.colors.YELLOW, bold=True, nl=False)
+            self._test_mark("s", typer.colors.YELLOW)
+
+    def _test_mark(self, mark: str, color: str) -> None:
+        if not self._live_metrics:
+            typer.secho(mark, fg=color, bold=True, nl=False)
+            return
+        self._function_counts[mark] += 1
+        counts = [f"{self._function_counts['.']} tests"]
+        if self._function_counts["E"]:
+            counts.append(typer.style(f"{self._function_counts['E']} errors", fg=typer.colors.RED, bold=True))
+        if self._function_counts["s"]:
+            counts.append(typer.style(f"{self._function_counts['s']} skipped", fg=typer.colors.YELLOW, bold=True))
+        elapsed = timer() - self._run_started
+        tests_per_second = self._latency.count / elapsed if elapsed else 0.0
+        metrics = (
+            f"p50 {format_time(self._latency.percentile(50))}, p95 {format_time(self._latency.percentile(95))}, "
+            f"{tests_per_second:.1f} tests/s"
+        )
+        # back to the start of the line, and clear what's left of the previous one
+        typer.echo(f"\r{self._function_name} {', '.join(counts)}  {metrics}\x1b[K", nl=False)
 
     def evaluate_started(self) -> None:
         print_centered(" Evaluate Tests ")
@@ -172,10 +223,152 @@ class RichCliListener(TesterListener, EvaluatorListener):
         tmp = f" [red]{len(failed)} failed[/red], [green]{len(evaluations) - len(failed)} passed[/green], in [blue]{format_time(total_eval_time + total_test_time)}[/blue] "
         if isinstance(self._evaluator, MemoryCache):
             tmp += f"(cached hits {self._evaluator.num_cache_hits}, cached misses {self._evaluator.num_cache_misses}) "
+        if isinstance(self._evaluator, SemanticCache):
+            tmp += f"(approximate hits {self._evaluator.num_approximate_hits}) "
 
         print_centered(tmp)
 
 
+def print_metrics(summary: dict) -> None:
+    print_centered(" Latency ")
+    console = Console()
+    table = Table()
+    table.add_column("Function")
+    table.add_column("Step")
+    for column in ("Count", "p50", "p90", "p99", "Max"):
+        table.add_column(column, justify="right")
+    for function, steps in summary["functions"].items():
+        for step, histogram in steps.items():
+            if not histogram["count"]:
+                continue
+            table.add_row(
+                function,
+                step,
+                str(histogram["count"]),
+                *(format_time(histogram[key]) for key in ("p50", "p90", "p99", "max")),
+            )
+    console.print(table)
+
+    tmp = f" [green]{summary['tests_per_second']:.2f} tests/s[/green], [green]{summary['evaluations_per_second']:.2f} evaluations/s[/green] "
+    if summary["cache_hit_ratio"] is not None:
+        tmp += f"(cache hit ratio {summary['cache_hit_ratio']:.1%}) "
+    print_centered(tmp)
+    for name, concurrency in summary["concurrency"].items():
+        print_centered(
+            f" {name} concurrency [green]{concurrency['limit']}[/green] (between {concurrency['min']} and"
+            f" {concurrency['max']}, {concurrency['changes']} changes) "
+        )
+
+
+def print_usage(summary: dict) -> None:
+    """Prints the tokens and cost of each test function and evaluator that called an API"""
+    if not summary["total"]["requests"]:
+        return
+    print_centered(" Token usage ")
+    console = Console()
+    table = Table()
+    table.add_column("Function / Evaluator")
+    for column in ("Requests", "Prompt tokens", "Completion tokens", "Cost"):
+        table.add_column(column, justify="right")
+    for kind in ("functions", "evaluators"):
+        for name, usage in summary[kind].items():
+            table.add_row(
+                name,
+                str(usage["requests"]),
+                str(usage["prompt_tokens"]),
+                str(usage["completion_tokens"]),
+                f"${usage['cost']:.4f}",
+            )
+    console.print(table)
+    total = summary["total"]
+    print_centered(f" [blue]{total['total_tokens']} tokens[/blue], [blue]${total['cost']:.4f}[/blue] ")
+
+
+def print_comparison(comparison: dict) -> None:
+    for function, results in comparison["functions"].items():
+        print_centered(f" Comparison {function} ")
+        console = Console()
+        table = Table()
+        table.add_column("Variant")
+        for column in ("Pass rate", "Score", "Mean latency"):
+            table.add_column(column, justify="right")
+        for variant, summary in results["variants"].items():
+            table.add_row(
+                variant,
+                f"{summary['pass_rate']:.1%}",
+                f"{summary['score']:.2f}",
+                format_time(summary["mean_time_elapsed"]),
+            )
+        console.print(table)
+
+        # only the tests the variants disagree on tell them apart
+        variants = list(results["variants"])
+        table = Table(show_lines=True)
+        table.add_column("Input")
+        for variant in variants:
+            table.add_column(variant)
+        for test in results["tests"].values():
+            verdicts = [test["variants"].get(variant) for variant in variants]
+            if len({None if verdict is None else verdict["passed"] / verdict["runs"] for verdict in verdicts}) == 1:
+                continue
+            table.add_row(
+                escape(str(test["input"])),
+                *(_verdict_cell(verdict) for verdict in verdicts),
+            )
+        if table.row_count:
+            console.print(table)
+
+
+def _verdict_cell(verdict: Optional[dict]) -> str:
+    if verdict is None:
+        return "-"
+    color = "green" if verdict["passed"] == verdict["runs"] else "red"
+    # outputs are printed as they are, brackets in them aren't markup
+    return f"[{color}]{escape(str(verdict['output']))}[/]"
+
+
+def print_stability(stability: dict) -> None:
+    """Prints the tests whose retries didn't all pass or fail together, and how stable their outputs were"""
+    if not stability["flaky"]:
+        print_centered(f" [green]{stability['tests']} retried tests are stable[/green] ")
+        return
+    print_centered(" Flaky tests ")
+    console = Console()
+    table = Table(show_lines=True)
+    table.add_column("Function")
+    table.add_column("Input")
+    for column in ("Pass rate", "Attempts", "Distinct outputs", "Agreement"):
+        table.add_column(column, justify="right")
+    for function, tests in stability["functions"].items():
+        for test in tests.values():
+            if not test["flaky"]:
+                continue
+            table.add_row(
+                function,
+                escape(str(test["input"])),
+                f"{test['pass_rate']:.1%}",
+                str(test["attempts"]),
+                str(test["distinct_outputs"]),
+                f"{test['agreement']:.1%}",
+            )
+    console.print(table)
+    print_centered(f" [red]{stability['flaky']} of {stability['tests']} retried tests are flaky[/red] ")
+
+
+def print_pass_rate_estimate(estimate: PassRateEstimate) -> None:
+    tmp = (
+        f" pass rate [blue]{estimate.estimate:.1%}[/blue] "
+        f"({estimate.confidence:.0%} CI [blue]{estimate.lower:.1%}[/blue] - [blue]{estimate.upper:.1%}[/blue]), "
+        f"sampled {estimate.evaluated}/{estimate.total} "
+    )
+    if estimate.threshold is not None:
+        color = "green" if estimate.meets_threshold else "red"
+        verdict = "above" if estimate.meets_threshold else "below"
+        certainty = "" if estimate.decided else "likely "
+        tmp += f"[{color}]{certainty}{verdict} {estimate.threshold:.1%}[/{color}] "
+    print_centered(tmp)
+
+
 def print_centered(text: str, sep: str = "=") -> None:
     console = Console()
     terminal_width = console.width
@@ -187,7 +380,7 @@ def print_centered(text: str, sep: str = "=") -> None:
 def format_time(seconds: float) -> str:
     delta = datetime.timedelta(seconds=seconds)
     if seconds < 1:
-        milliseconds = int(seconds * 1000)
+        milliseconds = seconds * 1000
         return f"{milliseconds:.2f}ms"
     elif seconds < 60:
         return f"{seconds:.2f}s"
@@ -1,15 +1,40 @@
+from enum import Enum
 from pathlib import Path
 from typing import Annotated, Optional
 from uuid import uuid4
 
+import openai
 import typer
 
-from benchllm.cli import add_test, evaluate_predictions, list_tests, run_suite
-from benchllm.cli.utils import output_dir_factory
+from benchllm.cli import (
+    add_test,
+    embed_suites,
+    evaluate_predictions,
+    list_tests,
+    merge_runs,
+    run_suite,
+    run_worker,
+    watch_suite,
+)
+from benchllm.cli.utils import (
+    get_embedding_backend,
+    output_dir_factory,
+    parse_concurrency,
+    parse_shard,
+    resume_output_dir,
+)
 
 app = typer.Typer(add_completion=False)
 
 
+# mirrors benchllm.fake_openai.LatencyDistribution, the servers are only imported by the commands running them
+class LatencyDistributionOption(str, Enum):
+    FIXED = "fixed"
+    UNIFORM = "uniform"
+    NORMAL = "normal"
+    LOGNORMAL = "lognormal"
+
+
 @app.command(help="Run tests and evaluations.")
 def run(
     output_dir: Annotated[
@@ -27,22 +52,138 @@ def run(
     eval: Annotated[bool, typer.Option(help="Run final evaluation.")] = True,
     workers: Annotated[int, typer.Option(help="Number of workers to use to run the evaluation.")] = 1,
     retry_count: Annotated[int, typer.Option(help="Rerun tests to spot flaky output")] = 1,
+    retry_workers: Annotated[int, typer.Option(help="Number of retries of a test to run at the same time.")] = 1,
+    adaptive_retries: Annotated[
+        bool, typer.Option(help="Stop retrying a test once its outputs show it's stable or flaky.")
+    ] = False,
     evaluator: Annotated[str, typer.Option(help="Evaluator to use to run the evaluation.")] = "semantic",
     cache: Annotated[str, typer.Option(help="Type of cache to use.")] = "file",
+    sample_width: Annotated[
+        Optional[float],
+        typer.Option(help="Evaluate a random sample until the pass rate confidence interval is this narrow."),
+    ] = None,
+    pass_threshold: Annotated[Optional[float], typer.Option(help="Minimum pass rate required to succeed.")] = None,
+    prioritize: Annotated[
+        bool, typer.Option(help="Run tests that failed or were slowest in the previous run first.")
+    ] = False,
+    max_failures: Annotated[Optional[int], typer.Option(help="Stop after this many failures.")] = None,
+    metrics: Annotated[
+        bool, typer.Option(help="Print latency percentiles and throughput per function, also live while tests run.")
+    ] = False,
+    profile: Annotated[
+        bool, typer.Option(help="Write a flame graph of the run and cProfile stats per test function.")
+    ] = False,
+    profile_memory: Annotated[bool, typer.Option(help="Also trace memory allocations of each test function.")] = False,
+    api_base: Annotated[
+        Optional[str], typer.Option(help="OpenAI compatible API to use for evaluation, e.g. bench fake-openai.")
+    ] = None,
+    shard: Annotated[
+        Optional[str], typer.Option(help="Only run the i-th of N deterministic shards of the tests, e.g. 1/4.")
+    ] = None,
+    processes: Annotated[int, typer.Option(help="Number of processes to run CPU bound test functions in.")] = 1,
+    max_tokens: Annotated[
+        Optional[int], typer.Option(help="Stop starting tests and evaluations once this many tokens are spent.")
+    ] = None,
+    max_cost: Annotated[
+        Optional[float], typer.Option(help="Stop starting tests and evaluations once this many USD are spent.")
+    ] = None,
+    concurrency: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            help="Run the tests of all functions and matrix variants at once, at most N per provider, e.g. openai=8."
+        ),
+    ] = None,
+    adaptive_limit: Annotated[
+        Optional[int],
+        typer.Option(
+            help="Adapt the number of workers and the --concurrency limits to latency and rate limits, up to this many."
+        ),
+    ] = None,
+    resume: Annotated[
+        Optional[Path],
+        typer.Option(
+            help="Output directory of an interrupted run to continue, skipping the tests and evaluations it completed.",
+            exists=True,
+            file_okay=False,
+            resolve_path=True,
+        ),
+    ] = None,
+    watch: Annotated[
+        bool, typer.Option(help="Keep running and re-run the tests affected by each change to test modules and suites.")
+    ] = False,
+    watch_interval: Annotated[float, typer.Option(help="Seconds between checks for changes with --watch.")] = 0.5,
 ) -> None:
     if not file_or_dir:
         file_or_dir = [Path.cwd()]
+    if api_base:
+        openai.api_base = api_base
 
-    success = run_suite(
-        file_search_paths=file_or_dir,
-        model=model,
-        output_dir=output_dir,
-        workers=workers,
-        evaluator_name=evaluator,
-        no_eval=not eval,
-        retry_count=retry_count,
-        cache=cache,
-    )
+    limits = parse_concurrency(concurrency)
+    if (limits is not None or adaptive_limit is not None) and processes > 1:
+        raise typer.BadParameter("--concurrency and --adaptive-limit can't be combined with --processes")
+
+    if watch:
+        if sample_width is not None or prioritize or metrics or profile or profile_memory:
+            raise typer.BadParameter(
+                "--watch can't be combined with --sample-width, --prioritize, --metrics or --profile"
+            )
+        if max_tokens is not None or max_cost is not None or resume is not None:
+            raise typer.BadParameter("--watch can't be combined with --max-tokens, --max-cost or --resume")
+        success = watch_suite(
+            file_search_paths=file_or_dir,
+            model=model,
+            output_dir=output_dir,
+            workers=workers,
+            evaluator_name=evaluator,
+            no_eval=not eval,
+            retry_count=retry_count,
+            cache=cache,
+            pass_threshold=pass_threshold,
+            max_failures=max_failures,
+            shard=parse_shard(shard),
+            processes=processes,
+            concurrency=limits,
+            adaptive_limit=adaptive_limit,
+            retry_workers=retry_workers,
+            adaptive_retries=adaptive_retries,
+            interval=watch_interval,
+        )
+        if not success:
+            raise typer.Exit(code=1)
+        return
+
+    if resume is not None:
+        output_dir = resume_output_dir(resume, output_dir)
+    try:
+        success = run_suite(
+            file_search_paths=file_or_dir,
+            model=model,
+            output_dir=output_dir,
+            workers=workers,
+            evaluator_name=evaluator,
+            no_eval=not eval,
+            retry_count=retry_count,
+            cache=cache,
+            sample_width=sample_width,
+            pass_threshold=pass_threshold,
+            prioritize=prioritize,
+            max_failures=max_failures,
+            metrics=metrics,
+            profile=profile,
+            profile_memory=profile_memory,
+            shard=parse_shard(shard),
+            processes=processes,
+            concurrency=limits,
+            max_tokens=max_tokens,
+            max_cost=max_cost,
+            adaptive_limit=adaptive_limit,
+            resume=resume is not None,
+            retry_workers=retry_workers,
+            adaptive_retries=adaptive_retries,
+        )
+    except KeyboardInterrupt:
+        typer.secho(f"Interrupted, continue the run with --resume {output_dir}", fg=typer.colors.YELLOW, bold=True)
+        raise typer.Exit(code=130)
     if not success:
         raise typer.Exit(code=1)
 
@@ -64,7 +205,33 @@ def eval(
     workers: Annotated[int, typer.Option(help="Number of workers to use to run the evaluation.")] = 1,
     evaluator: Annotated[str, typer.Option(help="Evaluator to use to run the evaluation.")] = "semantic",
     cache: Annotated[str, typer.Option(help="Type of cache to use.")] = "file",
+    sample_width: Annotated[
+        Optional[float],
+        typer.Option(help="Evaluate a random sample until the pass rate confidence interval is this narrow."),
+    ] = None,
+    pass_threshold: Annotated[Optional[float], typer.Option(help="Minimum pass rate required to succeed.")] = None,
+    max_failures: Annotated[Optional[int], typer.Option(help="Stop after this many failures.")] = None,
+    metrics: Annotated[bool, typer.Option(help="Print latency percentiles and throughput per function.")] = False,
+    profile: Annotated[
+        bool, typer.Option(help="Write a flame graph of the run and cProfile stats per test function.")
+    ] = False,
+    profile_memory: Annotated[bool, typer.Option(help="Also trace memory allocations of each test function.")] = False,
+    api_base: Annotated[
+        Optional[str], typer.Option(help="OpenAI compatible API to use for evaluation, e.g. bench fake-openai.")
+    ] = None,
+    max_tokens: Annotated[
+        Optional[int], typer.Option(help="Stop starting evaluations once this many tokens are spent.")
+    ] = None,
+    max_cost: Annotated[
+        Optional[float], typer.Option(help="Stop starting evaluations once this many USD are spent.")
+    ] = None,
+    adaptive_limit: Annotated[
+        Optional[int],
+        typer.Option(help="Adapt the number of workers to latency and rate limits, up to this many."),
+    ] = None,
 ) -> None:
+    if api_base:
+        openai.api_base = api_base
     success = evaluate_predictions(
         file_or_dir=file_or_dir,
         model=model,
@@ -72,6 +239,68 @@ def eval(
         workers=workers,
         evaluator_name=evaluator,
         cache=cache,
+        sample_width=sample_width,
+        pass_threshold=pass_threshold,
+        max_failures=max_failures,
+        metrics=metrics,
+        profile=profile,
+        profile_memory=profile_memory,
+        max_tokens=max_tokens,
+        max_cost=max_cost,
+        adaptive_limit=adaptive_limit,
+    )
+    if not success:
+        raise typer.Exit(code=1)
+
+
+@app.command(help="Merge the reports and caches of several runs, e.g. shards of the same suite.")
+def merge(
+    file_or_dir: Annotated[
+        list[Path],
+        typer.Argument(help="Output directories of the runs to merge.", exists=True, resolve_path=True),
+    ],
+    output_dir: Annotated[
+        Path, typer.Option(help="Output directory to save the merged reports into.", default_factory=output_dir_factory)
+    ],
+) -> None:
+    success = merge_runs(output_dirs=file_or_dir, output_dir=output_dir)
+    if not success:
+        raise typer.Exit(code=1)
+
+
+@app.command(help="Pull batches of tests from a shared queue directory and run them.")
+def worker(
+    queue_dir: Annotated[
+        Path, typer.Option(help="Queue directory shared by all workers, filled by the first worker to start.")
+    ],
+    file_or_dir: Annotated[
+        Optional[list[Path]],
+        typer.Argument(
+            help="Paths to python files or directories implemented @benchllm.test functions.",
+            exists=True,
+            resolve_path=True,
+        ),
+    ] = None,
+    output_dir: Annotated[
+        Optional[Path], typer.Option(help="Output directory for predictions, defaults to QUEUE_DIR/output.")
+    ] = None,
+    batch_size: Annotated[int, typer.Option(help="Number of tests in each batch.")] = 20,
+    lease_timeout: Annotated[
+        float, typer.Option(help="Seconds without progress after which a batch is handed to another worker.")
+    ] = 300.0,
+    retry_count: Annotated[int, typer.Option(help="Rerun tests to spot flaky output")] = 1,
+    max_attempts: Annotated[
+        int, typer.Option(help="Give up on a batch after this many failed or abandoned attempts.")
+    ] = 3,
+) -> None:
+    success = run_worker(
+        file_search_paths=file_or_dir or [Path.cwd()],
+        queue_dir=queue_dir,
+        output_dir=output_dir or queue_dir / "output",
+        batch_size=batch_size,
+        lease_timeout=lease_timeout,
+        retry_count=retry_count,
+        max_attempts=max_attempts,
     )
     if not success:
         raise typer.Exit(code=1)
@@ -101,6 +330,79 @@ def tests(suite_path: Annotated[Path, typer.Argument(help="Test suite directory.
     list_tests(suite_path=suite_path)
 
 
+@app.command(help="Precompute the embeddings of the expected values of test suites.")
+def embed(
+    suite_paths: Annotated[list[Path], typer.Argument(help="Test suite directories.", exists=True, resolve_path=True)],
+    evaluator: Annotated[
+        str, typer.Option(help="Embedding evaluator to precompute for, 'embedding' or 'local-embedding'.")
+    ] = "embedding",
+    api_base: Annotated[Optional[str], typer.Option(help="OpenAI compatible API to use for the embeddings.")] = None,
+) -> None:
+    if api_base:
+        openai.api_base = api_base
+    embed_suites(suite_paths=suite_paths, backend=get_embedding_backend(evaluator))
+
+
+@app.command(name="fake-openai", help="Serve a local stand-in for the OpenAI API to load test evaluators.")
+def fake_openai(
+    port: Annotated[int, typer.Option(help="Port to listen on.")] = 8000,
+    host: Annotated[str, typer.Option(help="Host to listen on.")] = "127.0.0.1",
+    latency: Annotated[float, typer.Option(help="Mean response latency in seconds.")] = 0.0,
+    latency_std: Annotated[float, typer.Option(help="Standard deviation of the response latency.")] = 0.0,
+    latency_distribution: Annotated[
+        LatencyDistributionOption, typer.Option(help="Distribution of the response latency.")
+    ] = LatencyDistributionOption.FIXED,
+    error_rate: Annotated[float, typer.Option(help="Fraction of requests failing with a 500.")] = 0.0,
+    rate_limit_rate: Annotated[float, typer.Option(help="Fraction of requests failing with a 429.")] = 0.0,
+    completion: Annotated[
+        Optional[str], typer.Option(help="Fixed completion to return instead of judging the answers.")
+    ] = None,
+    seed: Annotated[Optional[int], typer.Option(help="Seed for latencies and injected errors.")] = None,
+) -> None:
+    from benchllm.fake_openai import (
+        FakeOpenAIConfig,
+        FakeOpenAIServer,
+        LatencyDistribution,
+    )
+
+    config = FakeOpenAIConfig(
+        latency=latency,
+        latency_std=latency_std,
+        latency_distribution=LatencyDistribution(latency_distribution.value),
+        error_rate=error_rate,
+        rate_limit_rate=rate_limit_rate,
+        completion=completion,
+        seed=seed,
+    )
+    server = FakeOpenAIServer(config, host=host, port=port)
+    typer.secho(f"Serving a fake OpenAI API on {server.url}", fg=typer.colors.GREEN, bold=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+@app.command(help="Keep suites, evaluators and caches loaded and run tests on request over HTTP.")
+def serve(
+    port: Annotated[int, typer.Option(help="Port to listen on.")] = 8765,
+    host: Annotated[str, typer.Option(help="Host to listen on.")] = "127.0.0.1",
+    socket: Annotated[Optional[Path], typer.Option(help="Listen on this Unix socket instead of a port.")] = None,
+    api_base: Annotated[
+        Optional[str], typer.Option(help="OpenAI compatible API to use for evaluation, e.g. bench fake-openai.")
+    ] = None,
+) -> None:
+    from benchllm.cli.server import BenchServer
+
+    if api_base:
+        openai.api_base = api_base
+    server = BenchServer(host=host, port=port, socket_path=socket, cache_path=Path.cwd() / "output" / "cache.json")
+    typer.secho(f"Serving bench on {server.url}", fg=typer.colors.GREEN, bold=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
 def main() -> None:
     app()
 
@@ -0,0 +1,341 @@
+import json
+import os
+import socketserver
+import stat
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Optional, Union, cast
+
+import yaml
+from pydantic import BaseModel, ValidationError, validator
+
+from benchllm.cli.listener import ReportListener
+from benchllm.cli.utils import (
+    add_cache,
+    get_evaluator,
+    remaining_failures,
+    run_evaluator,
+)
+from benchllm.data_types import (
+    Evaluation,
+    FunctionID,
+    Prediction,
+    Test,
+    TestFunction,
+)
+from benchllm.evaluator import Evaluator
+from benchllm.listener import EvaluatorListener, TesterListener
+from benchllm.tester import Tester
+from benchllm.utils import find_json_yml_files
+from benchllm.watcher import FileWatcher, WatchedSuite
+
+SendEvent = Callable[[str, str], None]
+
+
+class EvaluateRequest(BaseModel):
+    paths: list[Path]
+    evaluator: str = "semantic"
+    model: str = "gpt-3"
+    workers: int = 1
+    cache: str = "memory"
+    pass_threshold: Optional[float] = None
+    max_failures: Optional[int] = None
+    output_dir: Optional[Path] = None
+
+    @validator("evaluator")
+    def evaluator_is_not_interactive(cls, value: str) -> str:
+        if value in ("interactive", "web"):
+            raise ValueError(f"The {value} evaluator needs a user, it can't run in the server")
+        return value
+
+
+class RunRequest(EvaluateRequest):
+    eval: bool = True
+    retry_count: int = 1
+
+
+class BenchServer:
+    """A long lived process that runs tests and evaluations on request.
+
+    Test modules and suites stay loaded and are only reloaded when their files change, evaluators keep their caches
+    and API clients between requests. POST /run and POST /eval take a JSON request and stream the listener events as
+    server-sent events, followed by a final `result` event. Runs are executed one at a time.
+    """
+
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        socket_path: Optional[Path] = None,
+        cache_path: Path = Path("output", "cache.json"),
+    ):
+        self._cache_path = cache_path
+        self._socket_path = socket_path
+        self._suites: dict[tuple[Path, ...], tuple[WatchedSuite, FileWatcher]] = {}
+        self._evaluators: dict[tuple, Evaluator] = {}
+        self._run_lock = threading.Lock()
+        self.num_runs = 0
+        self._httpd: Union[ThreadingHTTPServer, _ThreadingUnixHTTPServer]
+        if socket_path is not None:
+            _remove_stale_socket(socket_path)
+            self._httpd = _ThreadingUnixHTTPServer(str(socket_path), _handler_factory(self))
+        else:
+            self._httpd = ThreadingHTTPServer((host, port), _handler_factory(self))
+            self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        if self._socket_path is not None:
+            return f"unix:{self._socket_path}"
+        host, port = cast(tuple[str, int], self._httpd.server_address)[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "BenchServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+        if self._socket_path is not None:
+            _remove_stale_socket(self._socket_path)
+
+    def __enter__(self) -> "BenchServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def status(self) -> dict:
+        return {
+            "status": "ok",
+            "runs": self.num_runs,
+            "suites": [[str(path) for path in paths] for paths in self._suites],
+            "evaluators": len(self._evaluators),
+        }
+
+    def run(self, request: RunRequest, send: SendEvent) -> dict:
+        """Runs the tests found in the requested paths, then evaluates their predictions unless `eval` is false"""
+        with self._run_lock:
+            self.num_runs += 1
+            suite = self._load_suite(request.paths)
+            listener = EventStreamListener(send)
+            tester = Tester(retry_count=request.retry_count, max_failures=request.max_failures)
+            tester.add_listener(listener)
+            if request.output_dir:
+                tester.add_listener(ReportListener(output_dir=request.output_dir))
+            for test_function in suite.test_functions:
+                tester.add_test_function(test_function)
+                tester.add_tests(suite.tests(test_function.function_id), test_function.function_id)
+
+            result: dict[str, Any] = {"errors": {str(path): error for path, error in suite.errors.items()}}
+            if not suite.test_functions:
+                return {**result, "success": False, "tests": 0}
+            tester.run()
+            result["tests"] = len(tester.predictions)
+            if tester.aborted or not request.eval:
+                return {**result, "success": not tester.aborted}
+            max_failures = remaining_failures(request.max_failures, tester.num_failures)
+            return {**result, **self._evaluate(request, tester.predictions, listener, max_failures=max_failures)}
+
+    def evaluate(self, request: EvaluateRequest, send: SendEvent) -> dict:
+        """Evaluates the prediction files found in the requested paths"""
+        with self._run_lock:
+            self.num_runs += 1
+            predictions = []
+            for file in find_json_yml_files(request.paths):
+                if file.suffix == ".json":
+                    predictions.append(Prediction(**json.loads(file.read_text(encoding="UTF-8"))))
+                else:
+                    predictions.append(Prediction(**yaml.safe_load(file.read_bytes())))
+            return self._evaluate(request, predictions, EventStreamListener(send), max_failures=request.max_failures)
+
+    def _evaluate(
+        self,
+        request: EvaluateRequest,
+        predictions: list[Prediction],
+        listener: "EventStreamListener",
+        *,
+        max_failures: Optional[int] = None,
+    ) -> dict:
+        evaluator = self._get_evaluator(request)
+        listeners: list[EvaluatorListener] = [listener]
+        if request.output_dir:
+            listeners.append(ReportListener(output_dir=request.output_dir))
+        for each in listeners:
+            evaluator.add_listener(each)
+        try:
+            evaluator.reset()
+            evaluator.load(predictions)
+            success = run_evaluator(
+                evaluator, sample_width=None, pass_threshold=request.pass_threshold, max_failures=max_failures
+            )
+        finally:
+            for each in listeners:
+                evaluator.remove_listener(each)
+        return {"success": success, "passed": len(evaluator.passed), "failed": len(evaluator.failed)}
+
+    def _load_suite(self, paths: list[Path]) -> WatchedSuite:
+        key = tuple(sorted(path.resolve() for path in paths))
+        if key not in self._suites:
+            suite = WatchedSuite(key)
+            suite.load()
+            watcher = FileWatcher([*key, *suite.suite_directories], ignore=[self._cache_path.parent])
+            self._suites[key] = (suite, watcher)
+            return suite
+
+        suite, watcher = self._suites[key]
+        changed = watcher.poll()
+        if changed:
+            suite.update(changed)
+            watcher.add_paths(suite.suite_directories)
+            # loading writes ids into new test files, that isn't a change to load again
+            watcher.poll()
+        return suite
+
+    def _get_evaluator(self, request: EvaluateRequest) -> Evaluator:
+        key = (request.evaluator, request.model, request.workers, request.cache)
+        if key not in self._evaluators:
+            evaluator = get_evaluator(request.evaluator, request.model, request.workers)
+            self._evaluators[key] = add_cache(request.cache, evaluator, self._cache_path)
+        return self._evaluators[key]
+
+
+class EventStreamListener(TesterListener, EvaluatorListener):
+    """Forwards every listener call as an event named after the method, with a JSON payload"""
+
+    def __init__(self, send: SendEvent) -> None:
+        super().__init__()
+        self._send = send
+
+    def test_run_started(self) -> None:
+        self._send("test_run_started", "{}")
+
+    def test_run_ended(self, predications: list[Prediction]) -> None:
+        self._send("test_run_ended", json.dumps({"predictions": len(predications)}))
+
+    def test_function_started(self, test_function: TestFunction) -> None:
+        self._send("test_function_started", json.dumps({"function_id": str(test_function.function_id)}))
+
+    def test_function_ended(self) -> None:
+        self._send("test_function_ended", "{}")
+
+    def test_started(self, test: Test) -> None:
+        self._send("test_started", test.json())
+
+    def test_ended(self, prediction: Prediction) -> None:
+        self._send("test_ended", prediction.json())
+
+    def test_skipped(self, test: Test, error: bool = False) -> None:
+        self._send("test_skipped", f'{{"test": {test.json()}, "error": {json.dumps(error)}}}')
+
+    def evaluate_started(self) -> None:
+        self._send("evaluate_started", "{}")
+
+    def evaluate_prediction_started(self, prediction: Prediction) -> None:
+        self._send("evaluate_prediction_started", json.dumps({"test_id": prediction.test.id}))
+
+    def evaluate_prediction_ended(self, evaluation: Evaluation) -> None:
+        self._send("evaluate_prediction_ended", evaluation.json())
+
+    def evaluate_module_started(self, function_id: FunctionID) -> None:
+        self._send("evaluate_module_started", json.dumps({"function_id": str(function_id)}))
+
+    def evaluate_module_ended(self) -> None:
+        self._send("evaluate_module_ended", "{}")
+
+    def evaluate_ended(self, evaluations: list[Evaluation]) -> None:
+        failed = sum(not evaluation.passed for evaluation in evaluations)
+        self._send("evaluate_ended", json.dumps({"passed": len(evaluations) - failed, "failed": failed}))
+
+    def concurrency_changed(self, name: str, limit: int) -> None:
+        self._send("concurrency_changed", json.dumps({"name": name, "limit": limit}))
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def _remove_stale_socket(path: Path) -> None:
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _handler_factory(server: BenchServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            if self.path.rstrip("/") == "/health":
+                self._send(200, server.status())
+            else:
+                self._send(404, {"error": f"Unknown endpoint {self.path}"})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            path = self.path.rstrip("/")
+            if path == "/run":
+                request_type: type[EvaluateRequest] = RunRequest
+                handle: Callable[[Any, SendEvent], dict] = server.run
+            elif path == "/eval":
+                request_type, handle = EvaluateRequest, server.evaluate
+            else:
+                return self._send(404, {"error": f"Unknown endpoint {self.path}"})
+            try:
+                request = request_type(**json.loads(self.rfile.read(length) or b"{}"))
+            except (json.JSONDecodeError, TypeError, ValidationError) as e:
+                return self._send(400, {"error": str(e)})
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            lock = threading.Lock()
+            disconnected = False
+
+            def send_event(event: str, data: str) -> None:
+                nonlocal disconnected
+                # evaluators call listeners from their worker threads
+                with lock:
+                    if disconnected:
+                        return
+                    try:
+                        self.wfile.write(f"event: {event}\ndata: {data}\n\n".encode())
+                        self.wfile.flush()
+                    except (BrokenPipeError, ConnectionResetError):
+                        # the client went away, the run still finishes and warms the caches
+                        disconnected = True
+
+            try:
+                result = handle(request, send_event)
+            except Exception as e:
+                result = {"success": False, "error": f"{type(e).__name__}: {e}"}
+            send_event("result", json.dumps(result))
+
+        def _send(self, status: int, payload: dict) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
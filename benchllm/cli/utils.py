@@ -1,14 +1,31 @@
 import datetime
+import os
 from pathlib import Path
+from typing import Optional
 
-from benchllm.cache import FileCache, MemoryCache
+import typer
+
+from benchllm.cache import FileCache, MemoryCache, SemanticCache
 from benchllm.cli.evaluator import InteractiveEvaluator, WebEvaluator
+from benchllm.cli.listener import print_pass_rate_estimate, print_usage
+from benchllm.concurrency import AdaptiveLimiter
+from benchllm.embedding import (
+    EmbeddingBackend,
+    HashingEmbeddingBackend,
+    OpenAIEmbeddingBackend,
+)
 from benchllm.evaluator import (
     EmbeddingEvaluator,
     Evaluator,
+    JsonEvaluator,
+    RegexEvaluator,
     SemanticEvaluator,
     StringMatchEvaluator,
+    StringSimilarityEvaluator,
 )
+from benchllm.matrix import DEFAULT_PROVIDER
+from benchllm.sampling import estimate_pass_rate
+from benchllm.usage import UsageTracker
 
 
 def output_dir_factory() -> Path:
@@ -23,6 +40,48 @@ def output_dir_factory() -> Path:
     return output_dir
 
 
+def resume_output_dir(resume: Path, unused_output_dir: Path) -> Path:
+    """Continues the run in `resume`, removing the empty directory created for a new run and pointing latest back"""
+    if unused_output_dir != resume and unused_output_dir.is_dir() and not any(unused_output_dir.iterdir()):
+        unused_output_dir.rmdir()
+        latest = unused_output_dir.parent / "latest"
+        if latest.is_symlink() and Path(os.readlink(latest)) == unused_output_dir:
+            latest.unlink()
+            latest.symlink_to(resume)
+    return resume
+
+
+def parse_shard(value: Optional[str]) -> Optional[tuple[int, int]]:
+    """Parses a one based `i/N` shard into a zero based (index, count) pair"""
+    if value is None:
+        return None
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise typer.BadParameter(f"Invalid shard '{value}', expected i/N, e.g. 1/4") from None
+    if not 1 <= index <= count:
+        raise typer.BadParameter(f"Invalid shard '{value}', i must be between 1 and N")
+    return index - 1, count
+
+
+def parse_concurrency(values: Optional[list[str]]) -> Optional[dict[str, int]]:
+    """Parses `provider=N` limits, a bare `N` is the limit of the providers without one of their own"""
+    if not values:
+        return None
+    limits = {}
+    for value in values:
+        provider, _, limit = value.rpartition("=")
+        try:
+            limits[provider or DEFAULT_PROVIDER] = int(limit)
+        except ValueError:
+            raise typer.BadParameter(
+                f"Invalid concurrency '{value}', expected N or provider=N, e.g. openai=8"
+            ) from None
+        if limits[provider or DEFAULT_PROVIDER] < 1:
+            raise typer.BadParameter(f"Invalid concurrency '{value}', the limit must be at least 1")
+    return limits
+
+
 def get_evaluator(evaluator_name: str, model: str, workers: int) -> Evaluator:
     if evaluator_name == "semantic":
         return SemanticEvaluator(model=model, workers=workers)
@@ -30,20 +89,97 @@ def get_evaluator(evaluator_name: str, model: str, workers: int) -> Evaluator:
         return InteractiveEvaluator()
     elif evaluator_name == "string-match":
         return StringMatchEvaluator(workers=workers)
+    elif evaluator_name == "string-similarity":
+        return StringSimilarityEvaluator(workers=workers)
+    elif evaluator_name == "regex":
+        return RegexEvaluator(workers=workers)
+    elif evaluator_name == "json":
+        return JsonEvaluator(workers=workers)
     elif evaluator_name == "web":
         return WebEvaluator()
     elif evaluator_name == "embedding":
-        return EmbeddingEvaluator()
+        return EmbeddingEvaluator(backend=get_embedding_backend(evaluator_name), workers=workers)
+    elif evaluator_name == "local-embedding":
+        return EmbeddingEvaluator(backend=get_embedding_backend(evaluator_name), threshold=0.8, workers=workers)
     else:
         raise ValueError(f"Unknown evaluator {evaluator_name}")
 
 
+def get_embedding_backend(evaluator_name: str) -> EmbeddingBackend:
+    if evaluator_name == "embedding":
+        return OpenAIEmbeddingBackend()
+    elif evaluator_name == "local-embedding":
+        return HashingEmbeddingBackend()
+    else:
+        raise ValueError(
+            f"Unknown embedding evaluator {evaluator_name}, valid values are 'embedding', 'local-embedding'"
+        )
+
+
 def add_cache(cache_name: str, evaluator: Evaluator, cache_path: Path) -> Evaluator:
     if cache_name == "file":
         return FileCache(evaluator, cache_path)
     elif cache_name == "memory":
         return MemoryCache(evaluator)
+    elif cache_name == "semantic":
+        return SemanticCache(evaluator, cache_path)
     elif cache_name == "none":
         return evaluator
     else:
-        raise ValueError(f"Unknown cache {cache_name}, valid values are 'file', 'memory', 'none'")
+        raise ValueError(f"Unknown cache {cache_name}, valid values are 'file', 'memory', 'semantic', 'none'")
+
+
+def add_limiter(evaluator: Evaluator, adaptive_limit: Optional[int]) -> None:
+    """Lets the evaluator adapt its concurrency between 1 and `adaptive_limit`, starting from its number of workers"""
+    if adaptive_limit is not None:
+        evaluator.set_limiter(AdaptiveLimiter(evaluator.name, initial=evaluator.workers, max_limit=adaptive_limit))
+
+
+def run_evaluator(
+    evaluator: Evaluator,
+    *,
+    sample_width: Optional[float],
+    pass_threshold: Optional[float],
+    max_failures: Optional[int] = None,
+) -> bool:
+    """Runs the evaluation, sampling predictions when a confidence interval width is given"""
+    if sample_width is not None:
+        estimate = evaluator.run_sampled(width=sample_width, threshold=pass_threshold, max_failures=max_failures)
+        print_pass_rate_estimate(estimate)
+        if evaluator.over_budget:
+            print_budget_spent()
+            return False
+        if max_failures is not None and len(evaluator.failed) >= max_failures:
+            typer.secho(f"Stopped after {len(evaluator.failed)} failed evaluations", fg=typer.colors.RED, bold=True)
+            return False
+        # without a threshold, the sample only passes when every sampled prediction passed
+        return estimate.meets_threshold
+
+    evaluations = evaluator.run(max_failures=max_failures)
+    if evaluator.over_budget:
+        print_budget_spent()
+        return False
+    if pass_threshold is None:
+        return not evaluator.failed
+    estimate = estimate_pass_rate(len(evaluator.passed), len(evaluations), len(evaluations), threshold=pass_threshold)
+    print_pass_rate_estimate(estimate)
+    return estimate.meets_threshold
+
+
+def remaining_failures(max_failures: Optional[int], num_test_failures: int) -> Optional[int]:
+    """Failed tests and failed evaluations share `max_failures`, the evaluation stops at what the tests left"""
+    if max_failures is None:
+        return None
+    return max(max_failures - num_test_failures, 0)
+
+
+def print_budget_spent() -> None:
+    typer.secho("Stopped after spending the token budget", fg=typer.colors.RED, bold=True)
+
+
+def write_usage(usage: UsageTracker, output_dir: Path) -> None:
+    """Prints the tokens and cost spent, writing them to usage.json when any requests were made"""
+    summary = usage.summary()
+    if summary["total"]["requests"]:
+        usage.write(output_dir / "usage.json")
+    print_usage(summary)
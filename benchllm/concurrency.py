@@ -0,0 +1,192 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from timeit import default_timer as timer
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+import openai
+
+T = TypeVar("T")
+
+ConcurrencyListener = Callable[[str, int], None]
+
+# the limiter gating the API calls made in the current context, set by the evaluators around each evaluation
+_active: ContextVar[Optional["AdaptiveLimiter"]] = ContextVar("benchllm_limiter", default=None)
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Whether the error means the API is overloaded or throttling us, so the same call can succeed later"""
+    if isinstance(
+        error,
+        (
+            openai.error.RateLimitError,
+            openai.error.ServiceUnavailableError,
+            openai.error.Timeout,
+            openai.error.TryAgain,
+            openai.error.APIConnectionError,
+            TimeoutError,
+        ),
+    ):
+        return True
+    return isinstance(error, openai.error.APIError) and (error.http_status or 0) >= 500
+
+
+class AdaptiveLimiter:
+    """Limits how many calls run at once, adapting the limit to their latency and errors (AIMD).
+
+    Each time as many calls as the limit complete without trouble, the limit grows by one. A rate limit, timeout or
+    server error multiplies it by `decrease`, and so does a smoothed latency more than `latency_tolerance` times the
+    best one seen, unless it's less than `latency_floor` seconds above it. Only calls started after the last decrease
+    can decrease it again, so a burst of errors from calls that were already in flight counts once. Throttled calls
+    are retried after an exponential backoff, up to `max_retries` times.
+    """
+
+    def __init__(
+        self,
+        name: str = "default",
+        *,
+        initial: int = 1,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.2,
+        latency_floor: float = 0.01,
+        min_samples: int = 5,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        max_backoff: float = 10.0,
+    ) -> None:
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self._limit = min(max(initial, min_limit), self.max_limit)
+        self._decrease = decrease
+        self._latency_tolerance = latency_tolerance
+        self._smoothing = smoothing
+        self._latency_floor = latency_floor
+        self._min_samples = min_samples
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._successes = 0
+        self._generation = 0
+        self._samples = 0
+        self._latency: Optional[float] = None
+        self._baseline: Optional[float] = None
+        self._listeners: list[ConcurrencyListener] = []
+        self.num_throttled = 0
+
+    def add_listener(self, listener: ConcurrencyListener) -> None:
+        """`listener(name, limit)` is called with every new limit, from the thread of the call that changed it"""
+        self._listeners.append(listener)
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def call(self, function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Calls `function` once a slot is free, retrying it while the API is throttling"""
+        attempt = 0
+        while True:
+            generation = self._acquire()
+            start = timer()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                self._release()
+                if not is_overload_error(e) or attempt >= self._max_retries:
+                    raise
+                self._backoff_from(generation)
+                time.sleep(min(self._backoff * 2**attempt, self._max_backoff) * random.uniform(0.5, 1.0))
+                attempt += 1
+                continue
+            self._completed(generation, timer() - start)
+            return result
+
+    @contextmanager
+    def active(self) -> Iterator[None]:
+        """Gates the API calls benchllm makes in this context, see `call_limited`"""
+        token = _active.set(self)
+        try:
+            yield
+        finally:
+            _active.reset(token)
+
+    def _acquire(self) -> int:
+        with self._condition:
+            while self._in_flight >= self._limit:
+                self._condition.wait()
+            self._in_flight += 1
+            return self._generation
+
+    def _release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def _completed(self, generation: int, latency: float) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            if self._latency is None:
+                self._latency = latency
+            else:
+                self._latency += self._smoothing * (latency - self._latency)
+            self._samples += 1
+            if self._baseline is None or self._latency < self._baseline:
+                self._baseline = self._latency
+            else:
+                # forget the best latency slowly, an API that got slower for good shouldn't keep the limit down
+                self._baseline += 0.01 * (self._latency - self._baseline)
+
+            slower = self._latency > max(self._latency_tolerance * self._baseline, self._baseline + self._latency_floor)
+            if self._samples >= self._min_samples and slower:
+                changed = self._decrease_locked(generation)
+            else:
+                self._successes += 1
+                changed = self._successes >= self._limit and self._limit < self.max_limit
+                if changed:
+                    self._limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+            limit = self._limit
+        if changed:
+            self._broadcast(limit)
+
+    def _backoff_from(self, generation: int) -> None:
+        with self._condition:
+            self.num_throttled += 1
+            changed = self._decrease_locked(generation)
+            limit = self._limit
+        if changed:
+            self._broadcast(limit)
+
+    def _decrease_locked(self, generation: int) -> bool:
+        self._successes = 0
+        if generation != self._generation:
+            return False
+        self._generation += 1
+        limit = max(self.min_limit, int(self._limit * self._decrease))
+        changed = limit != self._limit
+        self._limit = limit
+        return changed
+
+    def _broadcast(self, limit: int) -> None:
+        for listener in self._listeners:
+            listener(self.name, limit)
+
+
+def call_limited(function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Calls `function` through the limiter active in this context, or directly when there is none"""
+    limiter = _active.get()
+    if limiter is None:
+        return function(*args, **kwargs)
+    return limiter.call(function, *args, **kwargs)
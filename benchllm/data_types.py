@@ -26,23 +26,22 @@ class FunctionID(BaseModel):
     module_path: Path
     line_number: int
     name: str
+    # the matrix cell of a parameterized test function, e.g. "model=gpt-4,temperature=0"
+    variant: Optional[str] = None
 
     def __hash__(self) -> int:
-        return hash((self.module_path, self.line_number))
+        return hash((self.module_path, self.line_number, self.variant))
 
     def __str__(self) -> str:
-        return f"{self.module_path}:{self.line_number} ({self.name})"
+        variant = f" [{self.variant}]" if self.variant is not None else ""
+        return f"{self.module_path}:{self.line_number} ({self.name}){variant}"
 
     def relative_str(self, root_dir: Path) -> str:
         try:
-            return str(
-                FunctionID(
-                    module_path=self.module_path.relative_to(root_dir), line_number=self.line_number, name=self.name
-                )
-            )
+            return str(self.copy(update={"module_path": self.module_path.relative_to(root_dir)}))
         except ValueError:
             # we can't be sure that the module_path loaded from json files is relative to the root_dir
-            return str(FunctionID(module_path=self.module_path, line_number=self.line_number, name=self.name))
+            return str(self)
 
     @staticmethod
     def default() -> "FunctionID":
@@ -76,13 +75,18 @@ class Evaluation(BaseModel):
     passed: bool
     eval_time_elapsed: float
     score: float
+    # the verdict was reused from a similar, but not identical, earlier evaluation
+    approximate: bool = False
 
 
 T = TypeVar("T")
 
 
 class TestFunction(BaseModel, Generic[T]):
+    __test__ = False
     function: Callable[[T], Any]
     function_id: FunctionID
     input_type: T
     suite: Optional[Path] = None
+    # tests of functions with the same provider share its concurrency limit
+    provider: Optional[str] = None
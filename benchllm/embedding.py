@@ -0,0 +1,169 @@
+import hashlib
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import openai
+
+from benchllm.concurrency import call_limited
+from benchllm.data_types import Test
+from benchllm.usage import record_usage
+
+
+class EmbeddingBackend(ABC):
+    """Turns texts into vectors, one row per text"""
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Identifies the backend and its settings, vectors of different backends can't be compared"""
+
+    @abstractmethod
+    def embed(self, texts: list[str]) -> np.ndarray:
+        pass
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    def __init__(self, *, engine: str = "text-similarity-davinci-001", batch_size: int = 100):
+        self._engine = engine
+        self._batch_size = batch_size
+
+    @property
+    def name(self) -> str:
+        return f"openai-{self._engine}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors: list[list[float]] = []
+        for start in range(0, len(texts), self._batch_size):
+            batch = [text.replace("\n", " ") for text in texts[start : start + self._batch_size]]
+            response = call_limited(openai.Embedding.create, input=batch, engine=self._engine)
+            record_usage(response, model=self._engine)
+            vectors.extend(item["embedding"] for item in sorted(response["data"], key=lambda item: item["index"]))
+        return np.array(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """Local bag of hashed character n-grams, no network and no model files.
+
+    It only captures surface similarity, so it suits pre-screening and offline CI rather than judging paraphrases.
+    """
+
+    def __init__(self, *, dimensions: int = 1024, ngram_size: int = 3):
+        self._dimensions = dimensions
+        self._ngram_size = ngram_size
+
+    @property
+    def name(self) -> str:
+        return f"hashing-{self._dimensions}-{self._ngram_size}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self._dimensions), dtype=np.float32)
+        for i, text in enumerate(texts):
+            vectors[i] = hashed_ngram_embedding(text, dimensions=self._dimensions, n=self._ngram_size)
+        return vectors
+
+
+class EmbeddingStore:
+    """Embeddings of texts keyed by the hash of their content, kept in a .npz file next to a suite's tests"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._vectors: dict[str, np.ndarray] = {}
+        self._dirty = False
+        if path.exists():
+            with np.load(path) as data:
+                self._vectors = dict(zip(data["keys"].tolist(), data["vectors"]))
+
+    @staticmethod
+    def for_directory(directory: Path, backend: EmbeddingBackend) -> "EmbeddingStore":
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", backend.name)
+        return EmbeddingStore(directory / f".embeddings-{name}.npz")
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        return self._vectors.get(self.key(text))
+
+    def add(self, text: str, vector: np.ndarray) -> None:
+        self._vectors[self.key(text)] = vector
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        keys = list(self._vectors)
+        # a temporary file of its own, so processes saving the same store at once don't write into each other's file
+        with tempfile.NamedTemporaryFile(dir=self.path.parent, prefix=f".{self.path.name}.", delete=False) as f:
+            try:
+                np.savez(f, keys=np.array(keys), vectors=np.stack([self._vectors[key] for key in keys]))
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        os.replace(f.name, self.path)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+
+def precompute_expected(tests: Iterable[Test], backend: EmbeddingBackend) -> tuple[dict[str, np.ndarray], int]:
+    """Embeds the expected values of the tests, reusing and updating the stores next to their test files.
+
+    Returns the embedding of every expected value and how many of them had to be computed. All missing values are
+    embedded in one batch, tests without a file are embedded but not stored.
+    """
+    stores: dict[Path, EmbeddingStore] = {}
+    embeddings: dict[str, np.ndarray] = {}
+    missing: list[tuple[str, Optional[EmbeddingStore]]] = []
+    for test in tests:
+        store = None
+        if test.file_path is not None:
+            directory = Path(test.file_path).parent
+            if directory not in stores:
+                stores[directory] = EmbeddingStore.for_directory(directory, backend)
+            store = stores[directory]
+        for expected in test.expected:
+            vector = store.get(expected) if store else None
+            if vector is None:
+                missing.append((expected, store))
+            else:
+                embeddings.setdefault(expected, vector)
+
+    # a text can be stored next to one suite and still be missing next to another
+    texts = list(dict.fromkeys(text for text, _ in missing if text not in embeddings))
+    if texts:
+        embeddings.update(zip(texts, backend.embed(texts)))
+    for text, store in missing:
+        if store is not None:
+            store.add(text, embeddings[text])
+    for store in stores.values():
+        try:
+            store.save()
+        except OSError:
+            # a read only suite still works, its references are embedded again next time
+            pass
+    return embeddings, len(texts)
+
+
+def hashed_ngram_embedding(text: str, *, dimensions: int, n: int = 3) -> np.ndarray:
+    """Unit length bag of hashed character n-grams, similar texts get similar vectors"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    padded = f" {text.lower()} "
+    for i in range(max(len(padded) - n + 1, 1)):
+        digest = hashlib.blake2b(padded[i : i + n].encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        vector[value % dimensions] += 1.0 if value >> 63 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def cosine_similarities(vectors: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(vector)
+    return np.divide(vectors @ vector, norms, out=np.zeros(len(vectors), dtype=np.float64), where=norms > 0)
@@ -1,5 +1,8 @@
 from benchllm.evaluator.evaluator import Evaluator  # noqa
 # Adding an empty comment to force import order to avoid circular imports
 from benchllm.evaluator.embedding import EmbeddingEvaluator  # noqa
+from benchllm.evaluator.json_match import JsonEvaluator  # noqa
+from benchllm.evaluator.regex_match import RegexEvaluator  # noqa
 from benchllm.evaluator.semantic import SemanticEvaluator  # noqa
 from benchllm.evaluator.string_match import StringMatchEvaluator  # noqa
+from benchllm.evaluator.string_similarity import StringSimilarityEvaluator  # noqa
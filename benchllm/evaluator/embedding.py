@@ -1,38 +1,87 @@
+import threading
+from typing import Any, Optional
+
 import numpy as np
 import openai
+from numpy.typing import ArrayLike
 
+from benchllm.concurrency import call_limited
 from benchllm.data_types import Prediction
+from benchllm.embedding import (
+    EmbeddingBackend,
+    OpenAIEmbeddingBackend,
+    cosine_similarities,
+    precompute_expected,
+)
 from benchllm.evaluator import Evaluator
+from benchllm.usage import record_usage
 
 
 class EmbeddingEvaluator(Evaluator):
-    def __init__(self, *, engine: str = "text-similarity-davinci-001", threshold: float = 0.9, workers: int = 1):
+    def __init__(
+        self,
+        *,
+        engine: str = "text-similarity-davinci-001",
+        threshold: float = 0.9,
+        workers: int = 1,
+        backend: Optional[EmbeddingBackend] = None,
+        precompute: bool = True,
+    ):
         super().__init__(workers=workers)
         self._engine = engine
         self._threshold = threshold
+        self._backend = backend or OpenAIEmbeddingBackend(engine=engine)
+        self._precompute = precompute
+        # retries of a test share their expected values, so those are only embedded once
+        self._embeddings: dict[str, np.ndarray] = {}
+        self._embeddings_lock = threading.Lock()
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}(backend={self._backend.name}, threshold={self._threshold})"
+
+    def load(self, predictions: list[Prediction]) -> None:
+        super().load(predictions)
+        if self._precompute:
+            # expected values are static, they are embedded once per suite and stored next to its tests
+            with self._usage.scope("evaluators", self.name):
+                embeddings, _ = precompute_expected([prediction.test for prediction in predictions], self._backend)
+            with self._embeddings_lock:
+                self._embeddings.update(embeddings)
 
     def evaluate_prediction(self, prediction: Prediction) -> list[Evaluator.Candidate]:
-        output_embedding = get_embedding(prediction.output, engine=self._engine)
-        candidates = []
-        for expected in prediction.test.expected:
-            expected_embedding = get_embedding(expected, engine=self._engine)
-            similarity = cosine_similarity(output_embedding, expected_embedding)
-            candidates.append(
-                Evaluator.Candidate(
-                    prediction=prediction.output,
-                    expected=expected,
-                    score=similarity,
-                    passed=similarity > self._threshold,
-                )
+        expected_embeddings = self.embed(prediction.test.expected, cache=True)
+        output_embedding = self.embed([prediction.output])[0]
+        similarities = cosine_similarities(expected_embeddings, output_embedding)
+        return [
+            Evaluator.Candidate.construct(
+                prediction=prediction.output,
+                expected=expected,
+                score=float(similarity),
+                passed=bool(similarity > self._threshold),
             )
-        return candidates
+            for expected, similarity in zip(prediction.test.expected, similarities)
+        ]
+
+    def embed(self, texts: list[str], *, cache: bool = False) -> np.ndarray:
+        """Embeds the texts in a single backend call, optionally reusing and keeping earlier embeddings"""
+        if not cache:
+            return self._backend.embed(texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in self._embeddings))
+        if missing:
+            vectors = self._backend.embed(missing)
+            with self._embeddings_lock:
+                self._embeddings.update(zip(missing, vectors))
+        return np.array([self._embeddings[text] for text in texts]).reshape(len(texts), -1)
 
 
 # these also exist in openai.embeddings_utils but have additional dependencies
-def get_embedding(text: str, engine: str, **kwargs) -> list[float]:
+def get_embedding(text: str, engine: str, **kwargs: Any) -> list[float]:
     text = text.replace("\n", " ")
-    return openai.Embedding.create(input=[text], engine=engine, **kwargs)["data"][0]["embedding"]
+    response = call_limited(openai.Embedding.create, input=[text], engine=engine, **kwargs)
+    record_usage(response, model=engine)
+    return response["data"][0]["embedding"]
 
 
-def cosine_similarity(a, b):
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+def cosine_similarity(a: ArrayLike, b: ArrayLike) -> float:
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
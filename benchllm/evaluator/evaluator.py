@@ -1,39 +1,111 @@
 import json
+import random
 from abc import ABC, abstractmethod
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from itertools import groupby
 from operator import attrgetter
 from pathlib import Path
 from timeit import default_timer as timer
-from typing import Optional
+from typing import ContextManager, Optional
 
 import yaml
 from pydantic import BaseModel
 
+from benchllm.concurrency import AdaptiveLimiter
 from benchllm.data_types import Evaluation, FunctionID, Prediction
 from benchllm.input_types import Json
-from benchllm.listener import EvaluatorListener
+from benchllm.listener import EvaluatorListener, EventDispatcher
+from benchllm.profiler import NO_PROFILER, Profiler
+from benchllm.sampling import PassRateEstimate, estimate_pass_rate
+from benchllm.usage import NO_USAGE_TRACKER, UsageTracker
 
 
 class Evaluator(ABC):
     def __init__(self, workers: int = 1):
         self._predictions: list[Prediction] = []
-        self._listeners: list[EvaluatorListener] = []
+        self._events = EventDispatcher()
         self._evaluations: list[Evaluation] = []
+        self._resumed: list[Evaluation] = []
         self._workers: int = workers
+        self._profiler: Profiler = NO_PROFILER
+        self._usage: UsageTracker = NO_USAGE_TRACKER
+        self._limiter: Optional[AdaptiveLimiter] = None
 
+    # evaluators create one for every reference of every prediction, the built-in ones use `construct()` to skip
+    # validation as their fields already have the right types
     class Candidate(BaseModel):
         prediction: Json
         expected: Json
         score: float
         passed: bool
+        approximate: bool = False
 
     def add_listener(self, listener: EvaluatorListener) -> None:
-        self._listeners.append(listener)
+        """Listeners are called from a background thread, see `EventDispatcher`"""
+        self._events.add_listener(listener)
+
+    def remove_listener(self, listener: EvaluatorListener) -> None:
+        self._events.remove_listener(listener)
+
+    def set_profiler(self, profiler: Profiler) -> None:
+        self._profiler = profiler
+
+    def set_usage_tracker(self, usage: UsageTracker) -> None:
+        """Records the tokens spent by the evaluator and stops evaluating once the tracker's budget is spent"""
+        self._usage = usage
+
+    def set_limiter(self, limiter: AdaptiveLimiter) -> None:
+        """Runs up to `limiter.max_limit` evaluations at once, with the API calls gated by the limiter's adaptive limit
+        instead of a fixed number of workers"""
+        self._limiter = limiter
+        limiter.add_listener(self._broadcast_concurrency_changed)
+
+    @property
+    def name(self) -> str:
+        """The name the evaluator's token usage is reported under"""
+        return type(self).__name__
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies the evaluator and the settings its verdicts depend on, caches only reuse verdicts of the same key"""
+        return self.name
+
+    @property
+    def over_budget(self) -> bool:
+        return self._usage.exhausted
 
     def load(self, predictions: list[Prediction]) -> None:
         self._predictions.extend(predictions)
 
+    def reset(self) -> None:
+        """Forgets the loaded predictions and their evaluations, so the evaluator and its caches can run again"""
+        self._predictions = []
+        self._evaluations = []
+        self._resumed = []
+
+    def resume(self, evaluations: list[Evaluation]) -> None:
+        """Takes the evaluations of an interrupted run as done, the next run only evaluates the loaded predictions
+        without one and returns them together with the new evaluations"""
+        self._resumed.extend(evaluations)
+
+    def _take_resumed(self) -> list[Prediction]:
+        """Moves the resumed evaluations into `evaluations`, returns the loaded predictions that still need one"""
+        evaluated = Counter(
+            (evaluation.prediction.function_id, evaluation.prediction.test.id) for evaluation in self._resumed
+        )
+        self._evaluations.extend(self._resumed)
+        self._resumed = []
+        pending = []
+        for prediction in self._predictions:
+            key = (prediction.function_id, prediction.test.id)
+            if evaluated[key]:
+                evaluated[key] -= 1
+            else:
+                pending.append(prediction)
+        return pending
+
     def load_prediction_file(self, path: Path) -> None:
         if path.suffix == ".yml" or path.suffix == ".yaml":
             data = yaml.safe_load(path.read_bytes())
@@ -42,34 +114,110 @@ class Evaluator(ABC):
             data = json.loads(path.read_text(encoding="UTF-8"))
             self.load([Prediction(**data)])
 
-    def run(self) -> list[Evaluation]:
+    def run(self, *, max_failures: Optional[int] = None) -> list[Evaluation]:
+        """Evaluates all loaded predictions, stopping early once `max_failures` evaluations have failed or the token
+        budget is spent"""
         self._broadcast_evaluate_started()
-        sorted_predictions = sorted(self._predictions, key=lambda x: str(x.function_id))
+        num_failures = sum(not evaluation.passed for evaluation in self._resumed)
+        sorted_predictions = sorted(self._take_resumed(), key=lambda x: str(x.function_id))
         grouped_predictions_by_function = [
             (function, list(group)) for function, group in groupby(sorted_predictions, key=attrgetter("function_id"))
         ]
-        with ThreadPoolExecutor(max_workers=self._workers) as executor:
-            for function, predictions in grouped_predictions_by_function:
-                self._broadcast_evaluate_module_started(function)
-                for evaluation in executor.map(self._run_evaluation, predictions):
-                    self._evaluations.append(evaluation)
-                self._broadcast_evaluate_module_ended()
-            self._broadcast_evaluate_ended(self._evaluations)
+
+        def stopped() -> bool:
+            return (max_failures is not None and num_failures >= max_failures) or self.over_budget
+
+        try:
+            with ThreadPoolExecutor(max_workers=self._num_threads) as executor, self._profiler.span("Evaluator.run"):
+                for function, predictions in grouped_predictions_by_function:
+                    if stopped():
+                        break
+                    self._broadcast_evaluate_module_started(function)
+                    for evaluation in executor.map(self._run_evaluation, predictions):
+                        self._evaluations.append(evaluation)
+                        num_failures += not evaluation.passed
+                        if stopped():
+                            # leaving the map iterator cancels the evaluations that haven't started yet
+                            break
+                    self._broadcast_evaluate_module_ended()
+                self._broadcast_evaluate_ended(self._evaluations)
+        finally:
+            # an interrupted evaluation still delivers the events it emitted
+            self._events.drain()
         return self._evaluations
 
+    def run_sampled(
+        self,
+        *,
+        width: float = 0.1,
+        threshold: Optional[float] = None,
+        confidence: float = 0.95,
+        min_samples: int = 30,
+        seed: Optional[int] = None,
+        max_failures: Optional[int] = None,
+    ) -> PassRateEstimate:
+        """Evaluates predictions in random order until the pass rate is known well enough.
+
+        Stops once the confidence interval is narrower than `width`, or once it lies entirely above or below
+        `threshold`, and like `run` once `max_failures` evaluations have failed. Only the sampled predictions end up in
+        `evaluations`.
+        """
+        self._broadcast_evaluate_started()
+        resumed = self._resumed
+        predictions = self._take_resumed()
+        random.Random(seed).shuffle(predictions)
+
+        passed = sum(evaluation.passed for evaluation in resumed)
+        evaluated = len(resumed)
+        population = len(predictions) + len(resumed)
+        estimate = estimate_pass_rate(passed, len(resumed), population, confidence=confidence, threshold=threshold)
+        executor = ThreadPoolExecutor(max_workers=self._num_threads)
+        try:
+            with executor, self._profiler.span("Evaluator.run_sampled"):
+                offset = 0
+                while offset < len(predictions):
+                    # with an adaptive limiter, each batch is as large as the current limit
+                    batch_size = self._limiter.limit if self._limiter else self._workers
+                    batch = predictions[offset : offset + batch_size]
+                    for evaluation in executor.map(self._run_evaluation, batch):
+                        self._evaluations.append(evaluation)
+                        passed += evaluation.passed
+                        evaluated += 1
+                        if max_failures is not None and evaluated - passed >= max_failures:
+                            # leaving the map iterator cancels the evaluations that haven't started yet
+                            break
+                    offset += len(batch)
+                    estimate = estimate_pass_rate(
+                        passed, evaluated, population, confidence=confidence, threshold=threshold
+                    )
+                    if estimate.evaluated >= min_samples and (estimate.width <= width or estimate.decided):
+                        break
+                    if self.over_budget or (max_failures is not None and evaluated - passed >= max_failures):
+                        break
+                self._broadcast_evaluate_ended(self._evaluations)
+        finally:
+            # an interrupted evaluation still delivers the events it emitted
+            self._events.drain()
+        return estimate
+
     def _run_evaluation(self, prediction: Prediction) -> Evaluation:
-        self._broadcast_evaluate_prediction_started(prediction)
-        start = timer()
-        candidates = self.evaluate_prediction(prediction)
-        end = timer()
-
-        evaluation = Evaluation(
-            prediction=prediction,
-            passed=any([candidate.passed for candidate in candidates]),
-            eval_time_elapsed=end - start,
-            score=max([candidate.score for candidate in candidates], default=0.0),
-        )
-        self._broadcast_evaluate_prediction_ended(evaluation)
+        with self._profiler.span("evaluate"):
+            self._broadcast_evaluate_prediction_started(prediction)
+            start = timer()
+            with self._profiler.span(type(self).__name__), self._usage.scope("evaluators", self.name), self._limited():
+                candidates = self.evaluate_prediction(prediction)
+            end = timer()
+
+            with self._profiler.span("evaluation"):
+                # every field has its final type already, validating the loaded prediction again would only copy it
+                evaluation = Evaluation.construct(
+                    prediction=prediction,
+                    passed=any([candidate.passed for candidate in candidates]),
+                    eval_time_elapsed=end - start,
+                    score=float(max([candidate.score for candidate in candidates], default=0.0)),
+                    approximate=any(candidate.approximate for candidate in candidates),
+                )
+            self._broadcast_evaluate_prediction_ended(evaluation)
         return evaluation
 
     @property
@@ -80,6 +228,13 @@ class Evaluator(ABC):
     def failed(self) -> list[Evaluation]:
         return [evaluation for evaluation in self._evaluations if not evaluation.passed]
 
+    def _limited(self) -> ContextManager[None]:
+        return self._limiter.active() if self._limiter else nullcontext()
+
+    @property
+    def _num_threads(self) -> int:
+        return self._limiter.max_limit if self._limiter else self._workers
+
     @property
     def evaluations(self) -> list[Evaluation]:
         return self._evaluations
@@ -101,25 +256,26 @@ class Evaluator(ABC):
         return 1
 
     def _broadcast_evaluate_started(self) -> None:
-        for listener in self._listeners:
-            listener.evaluate_started()
+        self._events.emit("evaluate_started")
 
     def _broadcast_evaluate_prediction_started(self, prediction: Prediction) -> None:
-        for listener in self._listeners:
-            listener.evaluate_prediction_started(prediction)
+        with self._profiler.span("listeners"):
+            self._events.emit("evaluate_prediction_started", prediction)
 
     def _broadcast_evaluate_prediction_ended(self, evaluation: Evaluation) -> None:
-        for listener in self._listeners:
-            listener.evaluate_prediction_ended(evaluation)
+        with self._profiler.span("listeners"):
+            self._events.emit("evaluate_prediction_ended", evaluation)
 
     def _broadcast_evaluate_module_started(self, function_id: FunctionID) -> None:
-        for listener in self._listeners:
-            listener.evaluate_module_started(function_id)
+        self._events.emit("evaluate_module_started", function_id)
 
     def _broadcast_evaluate_module_ended(self) -> None:
-        for listener in self._listeners:
-            listener.evaluate_module_ended()
+        self._events.emit("evaluate_module_ended")
 
     def _broadcast_evaluate_ended(self, evaluations: list[Evaluation]) -> None:
-        for listener in self._listeners:
-            listener.evaluate_ended(evaluations)
+        self._events.emit("evaluate_ended", evaluations)
+        # the listeners are done with the evaluation once it returns
+        self._events.flush()
+
+    def _broadcast_concurrency_changed(self, name: str, limit: int) -> None:
+        self._events.emit("concurrency_changed", name, limit)
@@ -0,0 +1,178 @@
+import json
+import re
+from collections.abc import Sized
+from functools import lru_cache
+from typing import Any, Callable
+
+from benchllm.data_types import Prediction
+from benchllm.evaluator import Evaluator
+from benchllm.evaluator.regex_match import compile_pattern
+
+Matcher = Callable[[Any], bool]
+
+MISSING = object()
+CODE_FENCE = re.compile(r"^```(?:json)?\s*(.*?)\s*```$", re.DOTALL)
+KEY_PATH_CONSTRAINT = re.compile(
+    r"^\s*(?P<path>[^\s=!~]+)\s*(?:(?P<operator>==|!=|=~)\s*(?P<value>.*?))?\s*$", re.DOTALL
+)
+PATH_SEGMENT = re.compile(r"([^.\[\]]+)|\[(\d+)\]")
+JSON_TYPES: dict[str, Callable[[Any], bool]] = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+}
+
+
+class JsonEvaluator(Evaluator):
+    """Parses the output as JSON and checks it against each expected constraint.
+
+    An expected value starting with `{` is a JSON schema, anything else is a key path constraint such as
+    `user.id`, `user.tags[0] == "admin"`, `status != "error"` or `created =~ ^\\d{4}-\\d{2}-\\d{2}`.
+    """
+
+    def load(self, predictions: list[Prediction]) -> None:
+        # compiling up front reports invalid constraints before anything is evaluated
+        for prediction in predictions:
+            for expected in prediction.test.expected:
+                compile_constraint(expected)
+        super().load(predictions)
+
+    def evaluate_prediction(self, prediction: Prediction) -> list[Evaluator.Candidate]:
+        document = parse_output(prediction.output)
+        candidates = []
+        for expected in prediction.test.expected:
+            passed = bool(document is not MISSING and compile_constraint(expected)(document))
+            candidates.append(
+                Evaluator.Candidate.construct(
+                    prediction=prediction.output, expected=expected, score=float(passed), passed=passed
+                )
+            )
+        return candidates
+
+
+def parse_output(output: str) -> Any:
+    """The JSON document in the output, which may be wrapped in a markdown code block, or MISSING"""
+    text = output.strip()
+    fenced = CODE_FENCE.match(text)
+    try:
+        return json.loads(fenced.group(1) if fenced else text)
+    except json.JSONDecodeError:
+        return MISSING
+
+
+@lru_cache(maxsize=4096)
+def compile_constraint(constraint: str) -> Matcher:
+    if constraint.lstrip().startswith("{"):
+        try:
+            schema = json.loads(constraint)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON schema {constraint!r}: {e}") from e
+        return compile_schema(schema)
+    return compile_key_path(constraint)
+
+
+def compile_key_path(constraint: str) -> Matcher:
+    match = KEY_PATH_CONSTRAINT.match(constraint)
+    if match is None:
+        raise ValueError(f"Invalid key path constraint {constraint!r}")
+    path = match.group("path").removeprefix("$").lstrip(".")
+    segments: list[str | int] = []
+    for key, index in PATH_SEGMENT.findall(path):
+        segments.append(key if key else int(index))
+    if "".join(f"[{s}]" if isinstance(s, int) else f".{s}" for s in segments).lstrip(".") != path:
+        raise ValueError(f"Invalid key path {match.group('path')!r}")
+
+    def resolve(document: Any) -> Any:
+        for segment in segments:
+            if isinstance(segment, int):
+                if not isinstance(document, list) or segment >= len(document):
+                    return MISSING
+            elif not isinstance(document, dict) or segment not in document:
+                return MISSING
+            document = document[segment]
+        return document
+
+    operator, raw_value = match.group("operator"), match.group("value")
+    if operator is None:
+        return lambda document: resolve(document) is not MISSING
+    if operator == "=~":
+        pattern = compile_pattern(raw_value)
+        return lambda document: isinstance(value := resolve(document), str) and bool(pattern.search(value))
+
+    try:
+        expected = json.loads(raw_value)
+    except json.JSONDecodeError:
+        # unquoted strings are accepted for convenience, `status == ok`
+        expected = raw_value
+    if operator == "==":
+        return lambda document: resolve(document) == expected
+    return lambda document: (value := resolve(document)) is not MISSING and value != expected
+
+
+def compile_schema(schema: Any) -> Matcher:
+    """Compiles the commonly used subset of JSON schema into a single predicate, unknown keywords are ignored"""
+    if isinstance(schema, bool):
+        return lambda value: schema
+    if not isinstance(schema, dict):
+        raise ValueError(f"Invalid JSON schema {schema!r}")
+
+    checks: list[Matcher] = []
+    if "type" in schema:
+        types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        unknown = [name for name in types if name not in JSON_TYPES]
+        if unknown:
+            raise ValueError(f"Unknown JSON schema type {unknown[0]!r}")
+        type_checks = [JSON_TYPES[name] for name in types]
+        checks.append(lambda value: any(check(value) for check in type_checks))
+    if "enum" in schema:
+        checks.append(lambda value: value in schema["enum"])
+    if "const" in schema:
+        checks.append(lambda value: value == schema["const"])
+
+    if "required" in schema:
+        required = list(schema["required"])
+        checks.append(lambda value: not isinstance(value, dict) or all(key in value for key in required))
+    properties = {key: compile_schema(subschema) for key, subschema in schema.get("properties", {}).items()}
+    if properties:
+        checks.append(
+            lambda value: not isinstance(value, dict)
+            or all(check(value[key]) for key, check in properties.items() if key in value)
+        )
+    if "additionalProperties" in schema:
+        additional = compile_schema(schema["additionalProperties"])
+        checks.append(
+            lambda value: not isinstance(value, dict)
+            or all(additional(item) for key, item in value.items() if key not in properties)
+        )
+
+    if "items" in schema:
+        items = compile_schema(schema["items"])
+        checks.append(lambda value: not isinstance(value, list) or all(items(item) for item in value))
+    for keyword, applies, compare in (
+        ("minItems", list, int.__le__),
+        ("maxItems", list, int.__ge__),
+        ("minLength", str, int.__le__),
+        ("maxLength", str, int.__ge__),
+    ):
+        if keyword in schema:
+            checks.append(_length_check(schema[keyword], applies, compare))
+
+    if "pattern" in schema:
+        pattern = compile_pattern(schema["pattern"])
+        checks.append(lambda value: not isinstance(value, str) or bool(pattern.search(value)))
+    if "minimum" in schema:
+        minimum = schema["minimum"]
+        checks.append(lambda value: not JSON_TYPES["number"](value) or value >= minimum)
+    if "maximum" in schema:
+        maximum = schema["maximum"]
+        checks.append(lambda value: not JSON_TYPES["number"](value) or value <= maximum)
+
+    return lambda value: all(check(value) for check in checks)
+
+
+def _length_check(limit: int, applies: type[Sized], compare: Callable[[int, int], bool]) -> Matcher:
+    return lambda value: not isinstance(value, applies) or compare(limit, len(value))
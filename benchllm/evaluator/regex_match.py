@@ -0,0 +1,45 @@
+import re
+from functools import lru_cache
+
+from benchllm.data_types import Prediction
+from benchllm.evaluator import Evaluator
+
+
+class RegexEvaluator(Evaluator):
+    """Treats every expected value as a regular expression that the output has to match"""
+
+    def __init__(self, *, full_match: bool = False, case_sensitive: bool = True, workers: int = 1):
+        super().__init__(workers=workers)
+        self._full_match = full_match
+        self._flags = 0 if case_sensitive else re.IGNORECASE
+
+    def load(self, predictions: list[Prediction]) -> None:
+        # compiling up front reports invalid patterns before anything is evaluated
+        for prediction in predictions:
+            for expected in prediction.test.expected:
+                compile_pattern(expected, self._flags)
+        super().load(predictions)
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}(full_match={self._full_match}, flags={self._flags})"
+
+    def evaluate_prediction(self, prediction: Prediction) -> list[Evaluator.Candidate]:
+        candidates = []
+        for expected in prediction.test.expected:
+            pattern = compile_pattern(expected, self._flags)
+            match = pattern.fullmatch(prediction.output) if self._full_match else pattern.search(prediction.output)
+            candidates.append(
+                Evaluator.Candidate.construct(
+                    prediction=prediction.output, expected=expected, score=float(bool(match)), passed=bool(match)
+                )
+            )
+        return candidates
+
+
+@lru_cache(maxsize=4096)
+def compile_pattern(pattern: str, flags: int = 0) -> re.Pattern:
+    try:
+        return re.compile(pattern, flags)
+    except re.error as e:
+        raise ValueError(f"Invalid regular expression {pattern!r}: {e}") from e
@@ -11,6 +11,10 @@ class SemanticEvaluator(Evaluator):
         self.model = model
         self.early_quitting = early_quitting
 
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}(model={self.model})"
+
     def evaluate_prediction(self, prediction: Prediction) -> list[Evaluator.Candidate]:
         candidates = []
         for expected in prediction.test.expected:
@@ -1,3 +1,4 @@
+from benchllm.automaton import compile_references
 from benchllm.data_types import Prediction
 from benchllm.evaluator import Evaluator
 
@@ -19,12 +20,27 @@ class StringMatchEvaluator(Evaluator):
 
         return expected == output
 
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}(case_sensitive={self._case_sensitive}, fuzzy={self._fuzzy})"
+
     def evaluate_prediction(self, prediction: Prediction) -> list[Evaluator.Candidate]:
         output = prediction.output
+        if self._fuzzy:
+            # the references of a test are normalized and compiled once, the output is scanned once for all of them
+            matcher = compile_references(tuple(prediction.test.expected), case_sensitive=self._case_sensitive)
+            matches = matcher.matching(output if self._case_sensitive else output.lower())
+        else:
+            matches = {i for i, expected in enumerate(prediction.test.expected) if self.match_strings(expected, output)}
+
         candidates = []
-        for expected in prediction.test.expected:
-            if self.match_strings(expected, output):
-                candidates.append(Evaluator.Candidate(prediction=output, expected=expected, score=1.0, passed=True))
+        for i, expected in enumerate(prediction.test.expected):
+            if i in matches:
+                candidates.append(
+                    Evaluator.Candidate.construct(prediction=output, expected=expected, score=1.0, passed=True)
+                )
             else:
-                candidates.append(Evaluator.Candidate(prediction=output, expected=expected, score=0.0, passed=False))
+                candidates.append(
+                    Evaluator.Candidate.construct(prediction=output, expected=expected, score=0.0, passed=False)
+                )
         return candidates
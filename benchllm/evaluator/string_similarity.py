@@ -0,0 +1,255 @@
+import re
+import threading
+from typing import Optional, Sequence
+
+import numpy as np
+
+from benchllm.data_types import Prediction
+from benchllm.evaluator import Evaluator
+
+METRICS = ("levenshtein", "token_set", "jaccard")
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class StringSimilarityEvaluator(Evaluator):
+    """Scores outputs against the expected values with edit distance based similarities in [0, 1].
+
+    A metric is only computed when it has a threshold, and a candidate passes when every computed metric reaches its
+    threshold. The score of a candidate is its lowest similarity. When a prediction isn't scored yet, it is scored in
+    one batch together with the loaded predictions that follow it, up to `batch_size` pairs.
+    """
+
+    def __init__(
+        self,
+        *,
+        levenshtein: Optional[float] = 0.8,
+        token_set: Optional[float] = None,
+        jaccard: Optional[float] = None,
+        ngram_size: int = 3,
+        case_sensitive: bool = False,
+        batch_size: int = 4096,
+        workers: int = 1,
+    ):
+        super().__init__(workers=workers)
+        self._thresholds = {
+            metric: threshold
+            for metric, threshold in zip(METRICS, (levenshtein, token_set, jaccard))
+            if threshold is not None
+        }
+        if not self._thresholds:
+            raise ValueError("StringSimilarityEvaluator needs a threshold for at least one metric")
+        self._ngram_size = ngram_size
+        self._case_sensitive = case_sensitive
+        self._batch_size = batch_size
+        self._scores: dict[tuple[str, str], dict[str, float]] = {}
+        # the loaded predictions before this one were scored along with earlier batches
+        self._next_unscored = 0
+        self._scores_lock = threading.Lock()
+
+    @property
+    def cache_key(self) -> str:
+        thresholds = ", ".join(f"{metric}={threshold}" for metric, threshold in self._thresholds.items())
+        return f"{self.name}({thresholds}, ngram_size={self._ngram_size}, case_sensitive={self._case_sensitive})"
+
+    def reset(self) -> None:
+        super().reset()
+        with self._scores_lock:
+            self._scores = {}
+            self._next_unscored = 0
+
+    def evaluate_prediction(self, prediction: Prediction) -> list[Evaluator.Candidate]:
+        pairs = [
+            (self._normalize(prediction.output), self._normalize(expected)) for expected in prediction.test.expected
+        ]
+        if any(pair not in self._scores for pair in pairs):
+            self._score_batch(pairs)
+
+        candidates = []
+        for expected, pair in zip(prediction.test.expected, pairs):
+            similarities = self._scores[pair]
+            candidates.append(
+                Evaluator.Candidate.construct(
+                    prediction=prediction.output,
+                    expected=expected,
+                    score=float(min(similarities.values())),
+                    passed=all(similarities[metric] >= threshold for metric, threshold in self._thresholds.items()),
+                )
+            )
+        return candidates
+
+    def _normalize(self, text: str) -> str:
+        return text if self._case_sensitive else text.lower()
+
+    def _score_batch(self, pairs: list[tuple[str, str]]) -> None:
+        with self._scores_lock:
+            pending = {pair: None for pair in pairs if pair not in self._scores}
+            while self._next_unscored < len(self._predictions) and len(pending) < self._batch_size:
+                prediction = self._predictions[self._next_unscored]
+                self._next_unscored += 1
+                output = self._normalize(prediction.output)
+                for expected in prediction.test.expected:
+                    pair = (output, self._normalize(expected))
+                    if pair not in self._scores:
+                        pending[pair] = None
+            if pending:
+                self._scores.update(self.score_pairs(list(pending)))
+
+    def score_pairs(self, pairs: Sequence[tuple[str, str]]) -> dict[tuple[str, str], dict[str, float]]:
+        """Computes the similarities of the configured metrics for each (output, expected) pair"""
+        columns = {}
+        if "levenshtein" in self._thresholds:
+            columns["levenshtein"] = levenshtein_similarities(pairs)
+        if "token_set" in self._thresholds:
+            columns["token_set"] = token_set_similarities(pairs)
+        if "jaccard" in self._thresholds:
+            columns["jaccard"] = jaccard_similarities(pairs, n=self._ngram_size)
+        return {pair: {metric: float(values[i]) for metric, values in columns.items()} for i, pair in enumerate(pairs)}
+
+
+def levenshtein_distances(pairs: Sequence[tuple[str, str]], *, chunk_size: int = 2048) -> np.ndarray:
+    """Edit distance of each pair, computed for a whole chunk of pairs with a few NumPy operations per anti-diagonal.
+
+    Pairs are sorted by length and chunked so that little work is spent on padding. The matrices hold one column per
+    pair, so each step covers a whole diagonal of every pair in the chunk. Small chunks keep the diagonals in cache.
+    """
+    firsts = [a for a, _ in pairs]
+    seconds = [b for _, b in pairs]
+    first_lengths = np.fromiter(map(len, firsts), dtype=np.int64, count=len(pairs))
+    second_lengths = np.fromiter(map(len, seconds), dtype=np.int64, count=len(pairs))
+    # the distance is symmetric, diagonals along the shorter string are shorter
+    swapped = first_lengths > second_lengths
+    order = np.lexsort((np.maximum(first_lengths, second_lengths), np.minimum(first_lengths, second_lengths))).tolist()
+
+    distances = np.empty(len(pairs), dtype=np.int64)
+    for start in range(0, len(order), chunk_size):
+        indices = order[start : start + chunk_size]
+        shorter = [seconds[i] if swapped[i] else firsts[i] for i in indices]
+        longer = [firsts[i] if swapped[i] else seconds[i] for i in indices]
+        distances[indices] = _levenshtein_chunk(shorter, longer)
+    return distances
+
+
+def _levenshtein_chunk(shorter: list[str], longer: list[str]) -> np.ndarray:
+    """Fills the edit distance matrices one anti-diagonal at a time, every cell of which only depends on the two
+    diagonals before it. A diagonal holds one row per character of the shorter strings and one column per pair."""
+    a, len_a = _encode(shorter, padding=-1)
+    b, len_b = _encode(longer, padding=-2)
+    num_a, num_b = a.shape[0], b.shape[0]
+    dtype = np.int16 if num_a + num_b < np.iinfo(np.int16).max else np.int32
+    columns = np.arange(len(shorter))
+    # b reversed and padded, so the characters facing a[i - 1] on diagonal d, b[d - i - 1], are the slice
+    # reversed_b[num_a + num_b - d + 1 : 2 * num_a + num_b - d + 1]
+    reversed_b = np.full((2 * num_a + num_b, len(longer)), -2, dtype=b.dtype)
+    reversed_b[num_a : num_a + num_b] = b[::-1]
+
+    # cells left of the first column hold garbage, they are only read by the first column, which is set explicitly
+    before_previous = np.zeros((num_a + 1, len(shorter)), dtype=dtype)
+    previous = np.zeros_like(before_previous)
+    current = np.empty_like(before_previous)
+    mismatch = np.empty(a.shape, dtype=bool)
+    substitution = np.empty(a.shape, dtype=dtype)
+    distances = np.zeros(len(shorter), dtype=np.int64)
+    for d in range(1, num_a + num_b + 1):
+        # deletions come from the cell above and insertions from the cell to the left, both on the previous diagonal
+        np.minimum(previous[:-1], previous[1:], out=current[1:])
+        current[1:] += 1
+        # substitutions come from the cell above and to the left, two diagonals back
+        offset = num_a + num_b - d + 1
+        np.not_equal(a, reversed_b[offset : offset + num_a], out=mismatch)
+        np.add(before_previous[:-1], mismatch, out=substitution)
+        np.minimum(current[1:], substitution, out=current[1:])
+        current[0] = d
+        if d <= num_a:
+            current[d] = d
+        finished = columns[len_a + len_b == d]
+        distances[finished] = current[len_a[finished], finished]
+        before_previous, previous, current = previous, current, before_previous
+    return distances
+
+
+def _encode(texts: list[str], *, padding: int) -> tuple[np.ndarray, np.ndarray]:
+    """Code points of the texts as the columns of a matrix, padded to the longest text"""
+    lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    codes = np.full((int(lengths.max(initial=0)), len(texts)), padding, dtype=np.int32)
+    characters = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.int32)
+    columns = np.repeat(np.arange(len(texts)), lengths)
+    rows = np.arange(len(characters)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    codes[rows, columns] = characters
+    return codes, lengths
+
+
+def levenshtein_similarities(pairs: Sequence[tuple[str, str]]) -> np.ndarray:
+    """1 - distance / length of the longer string, two empty strings are identical"""
+    if not pairs:
+        return np.empty(0)
+    distances = levenshtein_distances(pairs)
+    longest = np.fromiter((max(len(a), len(b)) for a, b in pairs), dtype=np.int64, count=len(pairs))
+    return 1.0 - distances / np.maximum(longest, 1)
+
+
+def token_set_similarities(pairs: Sequence[tuple[str, str]]) -> np.ndarray:
+    """Token set ratio: compares the sorted common words with each side's common plus remaining words.
+
+    Word order and duplicated words are ignored, and an answer that contains all words of the other scores 1.
+    """
+    common_lengths, with_a_lengths, with_b_lengths = [], [], []
+    remaining: list[tuple[str, str]] = []
+    for a, b in pairs:
+        tokens_a, tokens_b = set(TOKEN_PATTERN.findall(a)), set(TOKEN_PATTERN.findall(b))
+        common = " ".join(sorted(tokens_a & tokens_b))
+        with_a = " ".join(filter(None, (common, " ".join(sorted(tokens_a - tokens_b)))))
+        with_b = " ".join(filter(None, (common, " ".join(sorted(tokens_b - tokens_a)))))
+        common_lengths.append(len(common))
+        with_a_lengths.append(len(with_a))
+        with_b_lengths.append(len(with_b))
+        remaining.append((with_a, with_b))
+    if not pairs:
+        return np.empty(0)
+
+    # the common words are a prefix of both other strings, so their distance is just the difference in length
+    shortest = np.minimum(with_a_lengths, with_b_lengths)
+    similarities = np.maximum(np.array(common_lengths) / np.maximum(shortest, 1), levenshtein_similarities(remaining))
+    # an answer without any words only matches another one without words
+    similarities[shortest == 0] = np.equal(with_a_lengths, with_b_lengths)[shortest == 0]
+    return similarities
+
+
+def jaccard_similarities(pairs: Sequence[tuple[str, str]], *, n: int = 3, chunk_size: int = 16384) -> np.ndarray:
+    """Jaccard index of the sets of character n-grams.
+
+    The n-grams of each string are hashed into one row of a matrix; sorting the rows deduplicates them, and sorting
+    both sides of a pair together counts the n-grams they have in common.
+    """
+    similarities = np.empty(len(pairs))
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start : start + chunk_size]
+        ngrams_a = _unique_ngrams([f" {a} " for a, _ in chunk], n)
+        ngrams_b = _unique_ngrams([f" {b} " for _, b in chunk], n)
+        num_a = (ngrams_a != NO_NGRAM).sum(axis=1)
+        num_b = (ngrams_b != NO_NGRAM).sum(axis=1)
+        both = np.sort(np.concatenate([ngrams_a, ngrams_b], axis=1), axis=1)
+        common = ((both[:, 1:] == both[:, :-1]) & (both[:, 1:] != NO_NGRAM)).sum(axis=1)
+        similarities[start : start + len(chunk)] = common / (num_a + num_b - common)
+    return similarities
+
+
+NO_NGRAM = np.iinfo(np.int64).max
+
+
+def _unique_ngrams(texts: list[str], n: int) -> np.ndarray:
+    """Sorted hashes of the distinct n-grams of each text, one row per text padded with NO_NGRAM"""
+    codes, lengths = _encode(texts, padding=-1)
+    if codes.shape[0] < n:
+        codes = np.concatenate([codes, np.full((n - codes.shape[0], len(texts)), -1, dtype=codes.dtype)])
+    width = codes.shape[0] - n + 1
+    hashes = np.zeros((width, len(texts)), dtype=np.int64)
+    with np.errstate(over="ignore"):
+        for k in range(n):
+            hashes = hashes * 1_000_003 + codes[k : k + width]
+    # a text shorter than n is a single n-gram
+    positions = np.arange(width)[:, None]
+    hashes[(positions + n > lengths) & (positions > 0)] = NO_NGRAM
+
+    ngrams = np.sort(hashes.T, axis=1)
+    ngrams[:, 1:][ngrams[:, 1:] == ngrams[:, :-1]] = NO_NGRAM
+    return ngrams
@@ -0,0 +1,218 @@
+import base64
+import json
+import math
+import random
+import re
+import threading
+import time
+from enum import Enum
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from benchllm.embedding import hashed_ngram_embedding
+
+ANSWERS_PATTERN = re.compile(r'"answer_1":\s*"(.*?)",\s*"answer_2":\s*"(.*?)"', re.DOTALL)
+
+
+class LatencyDistribution(str, Enum):
+    FIXED = "fixed"
+    UNIFORM = "uniform"
+    NORMAL = "normal"
+    LOGNORMAL = "lognormal"
+
+
+class FakeOpenAIConfig(BaseModel):
+    latency: float = 0.0
+    latency_std: float = 0.0
+    latency_distribution: LatencyDistribution = LatencyDistribution.FIXED
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    completion: Optional[str] = None
+    embedding_dimensions: int = 256
+    seed: Optional[int] = None
+
+
+class FakeOpenAIServer:
+    """A local stand-in for the OpenAI completion, chat and embedding endpoints.
+
+    Responses are deterministic: the semantic similarity prompt is answered with "same" when both answers are equal
+    after normalization, and embeddings are hashed character trigrams. Latency and 429/500 errors are drawn from a
+    seeded random generator. Point openai at it with `openai.api_base = server.url`.
+    """
+
+    def __init__(self, config: FakeOpenAIConfig = FakeOpenAIConfig(), *, host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self._random = random.Random(config.seed)
+        self._random_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _handler_factory(self))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+        self.num_requests = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def draw(self) -> tuple[float, Optional[int]]:
+        """Returns the latency and optional error status code for the next request"""
+        config = self.config
+        with self._random_lock:
+            self.num_requests += 1
+            if config.latency_distribution == LatencyDistribution.UNIFORM:
+                latency = self._random.uniform(config.latency - config.latency_std, config.latency + config.latency_std)
+            elif config.latency_distribution == LatencyDistribution.NORMAL:
+                latency = self._random.gauss(config.latency, config.latency_std)
+            elif config.latency_distribution == LatencyDistribution.LOGNORMAL and config.latency > 0:
+                sigma = math.sqrt(math.log(1 + (config.latency_std / config.latency) ** 2))
+                latency = self._random.lognormvariate(math.log(config.latency) - sigma**2 / 2, sigma)
+            else:
+                latency = config.latency
+            roll = self._random.random()
+        if roll < config.rate_limit_rate:
+            return max(latency, 0.0), 429
+        if roll < config.rate_limit_rate + config.error_rate:
+            return max(latency, 0.0), 500
+        return max(latency, 0.0), None
+
+    def complete(self, prompt: str) -> str:
+        if self.config.completion is not None:
+            return self.config.completion
+        answers = ANSWERS_PATTERN.findall(prompt)
+        if not answers:
+            return "same"
+        answer_1, answer_2 = answers[-1]
+        return "same" if _normalize(answer_1) == _normalize(answer_2) else "different"
+
+    def embed(self, text: str) -> np.ndarray:
+        return hashed_ngram_embedding(text, dimensions=self.config.embedding_dimensions)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def _num_tokens(text: str) -> int:
+    return max(1, len(text.split()))
+
+
+def _handler_factory(server: FakeOpenAIServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+
+            latency, error = server.draw()
+            time.sleep(latency)
+            if error == 429:
+                return self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}})
+            if error:
+                return self._send(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+
+            path = self.path.rstrip("/")
+            if path.endswith("/chat/completions"):
+                self._send(200, self._chat_completion(body))
+            elif path.endswith("/completions"):
+                self._send(200, self._completion(body))
+            elif path.endswith("/embeddings"):
+                self._send(200, self._embeddings(body))
+            else:
+                self._send(
+                    404, {"error": {"message": f"Unknown endpoint {self.path}", "type": "invalid_request_error"}}
+                )
+
+        def _completion(self, body: dict) -> dict:
+            prompts = body.get("prompt", "")
+            prompts = prompts if isinstance(prompts, list) else [prompts]
+            texts = [server.complete(prompt) for prompt in prompts]
+            choices = [
+                {"text": text, "index": i, "finish_reason": "stop", "logprobs": None} for i, text in enumerate(texts)
+            ]
+            prompt_tokens = sum(_num_tokens(prompt) for prompt in prompts)
+            completion_tokens = sum(_num_tokens(text) for text in texts)
+            return {
+                "object": "text_completion",
+                "model": body.get("model", self.path.split("/")[-2]),
+                "choices": choices,
+                "usage": _usage(prompt_tokens, completion_tokens),
+            }
+
+        def _chat_completion(self, body: dict) -> dict:
+            prompt = "\n".join(message.get("content") or "" for message in body.get("messages", []))
+            content = server.complete(prompt)
+            return {
+                "object": "chat.completion",
+                "model": body.get("model"),
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                ],
+                "usage": _usage(_num_tokens(prompt), _num_tokens(content)),
+            }
+
+        def _embeddings(self, body: dict) -> dict:
+            texts = body.get("input", "")
+            texts = texts if isinstance(texts, list) else [texts]
+            data = []
+            for i, text in enumerate(texts):
+                vector = server.embed(text)
+                embedding: Any = (
+                    base64.b64encode(vector.astype("<f4").tobytes()).decode()
+                    if body.get("encoding_format") == "base64"
+                    else vector.tolist()
+                )
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            prompt_tokens = sum(_num_tokens(text) for text in texts)
+            return {
+                "object": "list",
+                "model": body.get("model", self.path.split("/")[-2]),
+                "data": data,
+                "usage": _usage(prompt_tokens, 0),
+            }
+
+        def _send(self, status: int, payload: dict) -> None:
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> dict[str, int]:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
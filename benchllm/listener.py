@@ -1,7 +1,14 @@
+import queue
+import threading
+from typing import Any, Optional, Union
+
 from .data_types import Evaluation, FunctionID, Prediction, Test, TestFunction
 
 
 class TesterListener:
+    # listeners are called from a background thread unless they need to be called as the events happen
+    synchronous: bool = False
+
     def test_run_started(self) -> None:
         pass
 
@@ -23,8 +30,14 @@ class TesterListener:
     def test_skipped(self, test: Test, error: bool = False) -> None:
         pass
 
+    def concurrency_changed(self, name: str, limit: int) -> None:
+        """The adaptive concurrency limit of provider `name` changed, called from a worker thread"""
+        pass
+
 
 class EvaluatorListener:
+    synchronous: bool = False
+
     def evaluate_started(self) -> None:
         pass
 
@@ -42,3 +55,101 @@ class EvaluatorListener:
 
     def evaluate_ended(self, evaluations: list[Evaluation]) -> None:
         pass
+
+    def concurrency_changed(self, name: str, limit: int) -> None:
+        """The adaptive concurrency limit of evaluator `name` changed, called from a worker thread"""
+        pass
+
+
+Listener = Union[TesterListener, EvaluatorListener]
+
+# tells the delivery thread to stop once the events queued before it are delivered
+_STOP = object()
+
+
+class EventDispatcher:
+    """Delivers the events of a tester or evaluator to its listeners off the thread that emitted them.
+
+    Events are queued and delivered by a single background thread in the order they were emitted, so slow listeners,
+    like the ones writing reports or redrawing the terminal, don't hold up the tests, and listeners never run
+    concurrently even when evaluator workers emit the events. The thread takes up to `batch_size` events at a time.
+    The queue holds at most `max_queue` events, emitting blocks when it's full so listeners that can't keep up slow the
+    run down instead of queueing unboundedly.
+
+    Listeners with `synchronous` set are called right away, on the emitting thread, one at a time. That suits
+    listeners that must see each event before the run moves on, like checkpoints and interactive prompts.
+    """
+
+    def __init__(self, *, max_queue: int = 1024, batch_size: int = 64) -> None:
+        self._listeners: list[Listener] = []
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._batch_size = batch_size
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def add_listener(self, listener: Listener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Listener) -> None:
+        # the listener still gets the events emitted before it was removed
+        self.drain()
+        self._listeners.remove(listener)
+
+    @property
+    def listeners(self) -> list[Listener]:
+        return list(self._listeners)
+
+    def emit(self, method: str, *args: Any) -> None:
+        """Calls `method` with `args` on every listener"""
+        queued = False
+        for listener in self._listeners:
+            if getattr(listener, "synchronous", False):
+                with self._sync_lock:
+                    getattr(listener, method)(*args)
+            else:
+                queued = True
+        if queued:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._deliver, name="benchllm-listeners", daemon=True)
+                    self._thread.start()
+                self._queue.put((method, args))
+
+    def drain(self) -> None:
+        """Waits until the queued events are delivered and stops the delivery thread, it starts again when needed"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+
+    def flush(self) -> None:
+        """Drains the queue and raises the first error a listener raised since the last flush"""
+        self.drain()
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _deliver(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for event in batch:
+                if event is _STOP:
+                    return
+                method, args = event
+                for listener in self._listeners:
+                    if getattr(listener, "synchronous", False):
+                        continue
+                    try:
+                        getattr(listener, method)(*args)
+                    except Exception as e:
+                        if self._error is None:
+                            self._error = e
@@ -0,0 +1,76 @@
+import inspect
+from itertools import product
+from typing import Any, Callable, Optional, Union
+
+from benchllm.data_types import Evaluation
+
+Matrix = Union[dict[str, list[Any]], list[dict[str, Any]]]
+
+DEFAULT_PROVIDER = "default"
+
+
+def matrix_cells(matrix: Matrix) -> list[dict[str, Any]]:
+    """The configurations of a matrix: every combination of a dict of lists, or the dicts of a list as they are"""
+    if isinstance(matrix, dict):
+        keys = list(matrix)
+        return [dict(zip(keys, values)) for values in product(*(matrix[key] for key in keys))]
+    return [dict(cell) for cell in matrix]
+
+
+def check_matrix_parameters(func: Callable[..., Any], cells: list[dict[str, Any]]) -> None:
+    parameters = inspect.signature(func).parameters
+    accepts_any = any(parameter.kind == inspect.Parameter.VAR_KEYWORD for parameter in parameters.values())
+    for key in dict.fromkeys(key for cell in cells for key in cell):
+        if key == "input":
+            raise Exception("The matrix can't set the input parameter, it comes from the tests")
+        if key not in parameters and not accepts_any:
+            raise Exception(f"Your test function needs a parameter named {key} to run the matrix")
+
+
+def variant_name(cell: dict[str, Any]) -> str:
+    return ",".join(f"{key}={value}" for key, value in cell.items())
+
+
+def provider_of(cell: dict[str, Any]) -> Optional[str]:
+    """Cells with a `provider` key share that provider's concurrency limit"""
+    return str(cell["provider"]) if "provider" in cell else None
+
+
+def compare_variants(evaluations: list[Evaluation]) -> dict:
+    """Side by side results of the variants of each parameterized test function.
+
+    For each function there's a summary per variant and, for each test, the verdict, score and output of each variant.
+    Functions without variants are left out.
+    """
+    functions: dict[str, dict] = {}
+    for evaluation in evaluations:
+        prediction = evaluation.prediction
+        variant = prediction.function_id.variant
+        if variant is None:
+            continue
+        function = functions.setdefault(str(prediction.function_id.copy(update={"variant": None})), {})
+        summaries = function.setdefault("variants", {})
+        summary = summaries.setdefault(variant, {"runs": 0, "passed": 0, "score": 0.0, "time_elapsed": 0.0})
+        summary["runs"] += 1
+        summary["passed"] += evaluation.passed
+        summary["score"] += evaluation.score
+        summary["time_elapsed"] += prediction.time_elapsed
+
+        test = function.setdefault("tests", {}).setdefault(
+            prediction.test.id, {"input": prediction.test.input, "expected": prediction.test.expected, "variants": {}}
+        )
+        result = test["variants"].setdefault(variant, {"runs": 0, "passed": 0, "score": 0.0})
+        result["runs"] += 1
+        result["passed"] += evaluation.passed
+        result["score"] += evaluation.score
+        result["output"] = prediction.output
+
+    for function in functions.values():
+        for summary in function["variants"].values():
+            summary["pass_rate"] = summary["passed"] / summary["runs"]
+            summary["score"] /= summary["runs"]
+            summary["mean_time_elapsed"] = summary.pop("time_elapsed") / summary["runs"]
+        for test in function["tests"].values():
+            for result in test["variants"].values():
+                result["score"] /= result["runs"]
+    return {"functions": functions}
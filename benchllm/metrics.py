@@ -0,0 +1,167 @@
+import json
+import math
+import threading
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import Optional
+
+from benchllm.cache import MemoryCache
+from benchllm.data_types import Evaluation, FunctionID, Prediction
+from benchllm.evaluator import Evaluator
+from benchllm.listener import EvaluatorListener, TesterListener
+
+
+class LatencyHistogram:
+    """Streaming histogram with logarithmic buckets, percentiles are accurate to within `precision`"""
+
+    def __init__(self, *, precision: float = 0.01, lowest: float = 1e-6) -> None:
+        self._log_base = math.log1p(precision)
+        self._lowest = lowest
+        self._buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> None:
+        bucket = 0 if value <= self._lowest else math.ceil(math.log(value / self._lowest) / self._log_base)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percentile: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = math.ceil(percentile / 100 * self.count)
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(self._lowest * math.exp(bucket * self._log_base), self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class _Throughput:
+    def __init__(self) -> None:
+        self.count = 0
+        self.elapsed = 0.0
+        self._started: Optional[float] = None
+
+    def start(self) -> None:
+        self._started = timer()
+
+    def stop(self) -> None:
+        if self._started is not None:
+            self.elapsed += timer() - self._started
+            self._started = None
+
+    @property
+    def per_second(self) -> float:
+        elapsed = self.elapsed + (timer() - self._started if self._started is not None else 0.0)
+        return self.count / elapsed if elapsed else 0.0
+
+
+class MetricsListener(TesterListener, EvaluatorListener):
+    """Collects latency percentiles and throughput per test function, and the adaptive concurrency limits.
+
+    The summary is available at any time through `summary()` and is rewritten to `path` whenever a test function or
+    evaluation module finishes.
+    """
+
+    def __init__(
+        self, *, path: Optional[Path] = None, root_dir: Optional[Path] = None, evaluator: Optional[Evaluator] = None
+    ) -> None:
+        super().__init__()
+        self._path = path
+        self._root_dir = root_dir
+        self._evaluator = evaluator
+        self._lock = threading.Lock()
+        self._test_latency: dict[FunctionID, LatencyHistogram] = {}
+        self._eval_latency: dict[FunctionID, LatencyHistogram] = {}
+        self._tests = _Throughput()
+        self._evaluations = _Throughput()
+        self._concurrency: dict[str, dict[str, int]] = {}
+
+    def set_evaluator(self, evaluator: Evaluator) -> None:
+        self._evaluator = evaluator
+
+    def test_run_started(self) -> None:
+        self._tests.start()
+
+    def test_run_ended(self, predications: list[Prediction]) -> None:
+        self._tests.stop()
+        self.write()
+
+    def test_function_ended(self) -> None:
+        self.write()
+
+    def test_ended(self, prediction: Prediction) -> None:
+        with self._lock:
+            self._test_latency.setdefault(prediction.function_id, LatencyHistogram()).record(prediction.time_elapsed)
+            self._tests.count += 1
+
+    def evaluate_started(self) -> None:
+        self._evaluations.start()
+
+    def evaluate_prediction_ended(self, evaluation: Evaluation) -> None:
+        with self._lock:
+            function_id = evaluation.prediction.function_id
+            self._eval_latency.setdefault(function_id, LatencyHistogram()).record(evaluation.eval_time_elapsed)
+            self._evaluations.count += 1
+
+    def evaluate_module_ended(self) -> None:
+        self.write()
+
+    def concurrency_changed(self, name: str, limit: int) -> None:
+        with self._lock:
+            if name not in self._concurrency:
+                self._concurrency[name] = {"limit": limit, "min": limit, "max": limit, "changes": 0}
+            concurrency = self._concurrency[name]
+            concurrency["limit"] = limit
+            concurrency["min"] = min(concurrency["min"], limit)
+            concurrency["max"] = max(concurrency["max"], limit)
+            concurrency["changes"] += 1
+
+    def evaluate_ended(self, evaluations: list[Evaluation]) -> None:
+        self._evaluations.stop()
+        self.write()
+
+    @property
+    def cache_hit_ratio(self) -> Optional[float]:
+        if not isinstance(self._evaluator, MemoryCache):
+            return None
+        lookups = self._evaluator.num_cache_hits + self._evaluator.num_cache_misses
+        return self._evaluator.num_cache_hits / lookups if lookups else 0.0
+
+    def summary(self) -> dict:
+        with self._lock:
+            function_ids = sorted(set(self._test_latency) | set(self._eval_latency), key=str)
+            return {
+                "functions": {
+                    function_id.relative_str(self._root_dir) if self._root_dir else str(function_id): {
+                        "tests": self._test_latency.get(function_id, LatencyHistogram()).summary(),
+                        "evaluations": self._eval_latency.get(function_id, LatencyHistogram()).summary(),
+                    }
+                    for function_id in function_ids
+                },
+                "tests_per_second": self._tests.per_second,
+                "evaluations_per_second": self._evaluations.per_second,
+                "cache_hit_ratio": self.cache_hit_ratio,
+                "concurrency": {name: dict(concurrency) for name, concurrency in self._concurrency.items()},
+            }
+
+    def write(self) -> None:
+        if self._path is None:
+            return
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._path.write_text(json.dumps(self.summary(), indent=2), encoding="UTF-8")
@@ -0,0 +1,129 @@
+import cProfile
+import json
+import pstats
+import re
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import ContextManager, Iterator
+
+
+class _Frame:
+    __slots__ = ("name", "children_time")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.children_time = 0.0
+
+
+class Profiler:
+    """Records named, nested spans and optionally cProfile/tracemalloc data per test function.
+
+    Spans are written in the collapsed stack format (`a;b;c <microseconds>`) understood by flamegraph.pl and
+    speedscope, each line holding the time spent in the innermost span itself.
+
+    Test functions running on several threads at once get a cProfile profile per thread, merged when written. The
+    memory peak of a test function then also covers the tests running next to it.
+    """
+
+    def __init__(self, *, enabled: bool = True, cprofile: bool = False, memory: bool = False) -> None:
+        self.enabled = enabled
+        self._cprofile = cprofile
+        self._memory = memory
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._self_times: dict[str, float] = {}
+        self._profiles: dict[tuple[str, int], cProfile.Profile] = {}
+        self._memory_peaks: dict[str, int] = {}
+
+    def _stack(self) -> list[_Frame]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def span(self, name: str) -> ContextManager[None]:
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        stack = self._stack()
+        frame = _Frame(name)
+        stack.append(frame)
+        start = timer()
+        try:
+            yield
+        finally:
+            elapsed = timer() - start
+            path = ";".join(frame.name for frame in stack)
+            stack.pop()
+            if stack:
+                stack[-1].children_time += elapsed
+            with self._lock:
+                self._self_times[path] = self._self_times.get(path, 0.0) + elapsed - frame.children_time
+
+    def function(self, name: str) -> ContextManager[None]:
+        """Profiles the user code of a test function, accumulating over all its tests"""
+        if not self.enabled or not (self._cprofile or self._memory):
+            return nullcontext()
+        return self._function(name)
+
+    @contextmanager
+    def _function(self, name: str) -> Iterator[None]:
+        profile = None
+        if self._cprofile:
+            # a profile can only be enabled on one thread at a time
+            with self._lock:
+                profile = self._profiles.setdefault((name, threading.get_ident()), cProfile.Profile())
+        if self._memory:
+            with self._lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                tracemalloc.reset_peak()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            if self._memory:
+                _, peak = tracemalloc.get_traced_memory()
+                with self._lock:
+                    self._memory_peaks[name] = max(self._memory_peaks.get(name, 0), peak)
+
+    def write(self, directory: Path) -> None:
+        if not self.enabled:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            lines = [f"{path} {round(seconds * 1_000_000)}" for path, seconds in sorted(self._self_times.items())]
+        (directory / "spans.folded").write_text("\n".join(lines) + "\n", encoding="UTF-8")
+        profiles: dict[str, list[cProfile.Profile]] = {}
+        for (name, _), profile in self._profiles.items():
+            profiles.setdefault(name, []).append(profile)
+        for name, (first, *others) in profiles.items():
+            stats = pstats.Stats(first)
+            for profile in others:
+                stats.add(profile)
+            stats.dump_stats(str(directory / f"{_safe_file_name(name)}.prof"))
+        if self._memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if self._memory_peaks:
+            (directory / "memory.json").write_text(json.dumps(self._memory_peaks, indent=2), encoding="UTF-8")
+
+    @property
+    def span_times(self) -> dict[str, float]:
+        """Self time in seconds for each span path"""
+        with self._lock:
+            return dict(self._self_times)
+
+
+def _safe_file_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")
+
+
+NO_PROFILER = Profiler(enabled=False)
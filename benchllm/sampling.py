@@ -0,0 +1,70 @@
+import math
+from statistics import NormalDist
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class PassRateEstimate(BaseModel):
+    passed: int
+    evaluated: int
+    total: int
+    confidence: float
+    lower: float
+    upper: float
+    threshold: Optional[float] = None
+
+    @property
+    def estimate(self) -> float:
+        return self.passed / self.evaluated if self.evaluated else 0.0
+
+    @property
+    def width(self) -> float:
+        return self.upper - self.lower
+
+    @property
+    def decided(self) -> bool:
+        """True when the whole interval lies on one side of the threshold"""
+        if self.threshold is None:
+            return False
+        return self.lower >= self.threshold or self.upper < self.threshold
+
+    @property
+    def meets_threshold(self) -> bool:
+        """Falls back to the point estimate when the interval still straddles the threshold. Without a threshold, only
+        a sample where every evaluated prediction passed meets it, whatever the estimate"""
+        if self.threshold is None:
+            return self.passed == self.evaluated
+        if self.decided:
+            return self.lower >= self.threshold
+        return self.estimate >= self.threshold
+
+
+def wilson_interval(passed: int, evaluated: int, confidence: float = 0.95) -> tuple[float, float]:
+    """Wilson score interval for a binomial proportion, well behaved for small samples and rates near 0 or 1"""
+    if evaluated == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    p = passed / evaluated
+    denominator = 1 + z**2 / evaluated
+    centre = (p + z**2 / (2 * evaluated)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / evaluated + z**2 / (4 * evaluated**2)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def estimate_pass_rate(
+    passed: int, evaluated: int, total: int, *, confidence: float = 0.95, threshold: Optional[float] = None
+) -> PassRateEstimate:
+    lower, upper = wilson_interval(passed, evaluated, confidence)
+    if evaluated == total:
+        # every prediction was evaluated, there is nothing left to be uncertain about
+        lower = upper = passed / total if total else 0.0
+    return PassRateEstimate(
+        passed=passed,
+        evaluated=evaluated,
+        total=total,
+        confidence=confidence,
+        lower=lower,
+        upper=upper,
+        threshold=threshold,
+    )
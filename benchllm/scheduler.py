@@ -0,0 +1,80 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel
+
+from benchllm.data_types import Test
+
+
+class TestHistory(BaseModel):
+    __test__ = False
+    passed: Optional[bool] = None
+    time_elapsed: float = 0.0
+
+
+def load_history(output_dir: Path) -> dict[str, TestHistory]:
+    """Reads the outcome and duration of each test from a previous run's output directory"""
+    history: dict[str, TestHistory] = {}
+    for file_path in (output_dir / "predictions").rglob("*.json"):
+        data = json.loads(file_path.read_text(encoding="UTF-8"))
+        _record(history, data["test"]["id"], TestHistory(time_elapsed=data["time_elapsed"]))
+
+    # evaluations embed their prediction, so they take precedence over predictions-only runs
+    evaluated: dict[str, TestHistory] = {}
+    for file_path in (output_dir / "evaluations").rglob("*.json"):
+        data = json.loads(file_path.read_text(encoding="UTF-8"))
+        _record(
+            evaluated,
+            data["test"]["id"],
+            TestHistory(passed=data["evaluation"]["passed"], time_elapsed=data["time_elapsed"]),
+        )
+    return {**history, **evaluated}
+
+
+def _record(history: dict[str, TestHistory], test_id: str, outcome: TestHistory) -> None:
+    """The variants of a matrix run the same test, it failed if any of them failed and took as long as the slowest"""
+    previous = history.get(test_id)
+    if previous is None:
+        history[test_id] = outcome
+        return
+    passed = None if previous.passed is None or outcome.passed is None else previous.passed and outcome.passed
+    history[test_id] = TestHistory(passed=passed, time_elapsed=max(previous.time_elapsed, outcome.time_elapsed))
+
+
+def find_previous_run(output_dir: Path) -> Optional[Path]:
+    """Finds the most recent sibling run of `output_dir` that produced any report"""
+    if not output_dir.parent.exists():
+        return None
+    candidates = [
+        path
+        for path in output_dir.parent.iterdir()
+        if path.is_dir()
+        and not path.is_symlink()
+        and path.resolve() != output_dir.resolve()
+        and ((path / "evaluations").exists() or (path / "predictions").exists())
+    ]
+    return max(candidates, key=lambda path: path.stat().st_mtime, default=None)
+
+
+def priority(test: Test, history: dict[str, TestHistory]) -> tuple[int, float]:
+    """Previously failed tests first, then tests without history, then passed ones; slowest first within each"""
+    record = history.get(test.id)
+    if record is None:
+        return 1, 0.0
+    if record.passed is False:
+        return 0, -record.time_elapsed
+    if record.passed is None:
+        return 1, -record.time_elapsed
+    return 2, -record.time_elapsed
+
+
+def prioritize(tests: list[Test], history: dict[str, TestHistory]) -> list[Test]:
+    return sorted(tests, key=lambda test: priority(test, history))
+
+
+def shard_of(test: Test, num_shards: int) -> int:
+    """Stable, zero based shard of a test, the same on every machine as long as the test ids are committed"""
+    digest = hashlib.sha1(test.id.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
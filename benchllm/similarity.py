@@ -1,17 +1,34 @@
 import openai
 
+from benchllm.concurrency import call_limited
+from benchllm.usage import record_usage
+
 
 def completion_func(prompt: str) -> str:
-    response = openai.Completion.create(
-        prompt=prompt, engine="text-davinci-003", max_tokens=100, temperature=0.7, n=1, stop=None
+    response = call_limited(
+        openai.Completion.create,
+        prompt=prompt,
+        engine="text-davinci-003",
+        max_tokens=100,
+        temperature=0.7,
+        n=1,
+        stop=None,
     )
+    record_usage(response, model="text-davinci-003")
     return response.choices[0].text.strip()
 
 
 def chat_completion_func(prompt: str, *, model: str) -> str:
-    response = openai.ChatCompletion.create(
-        model=model, messages=[{"role": "user", "content": prompt}], max_tokens=100, temperature=0.7, n=1, stop=None
+    response = call_limited(
+        openai.ChatCompletion.create,
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=100,
+        temperature=0.7,
+        n=1,
+        stop=None,
     )
+    record_usage(response, model=model)
     return response.choices[0].message.content.strip()
 
 
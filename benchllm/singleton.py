@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Any, Callable, Generic, Type, TypeVar
+from typing import Any, Callable, Generic, Optional, Type, TypeVar
 
 from pydantic import BaseModel
 
@@ -10,6 +10,7 @@ class FunctionRegistry(BaseModel, Generic[T]):
     func: Callable[[T], T]
     type: Any
     suite: Path
+    matrix: Optional[list[dict[str, Any]]] = None
 
 
 class TestSingleton(Generic[T]):
@@ -21,8 +22,10 @@ class TestSingleton(Generic[T]):
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def register(self, func: Callable[[T], T], input_type: Type[T], suite: Path) -> None:
-        self.functions.append(FunctionRegistry(func=func, type=input_type, suite=suite))
+    def register(
+        self, func: Callable[[T], T], input_type: Type[T], suite: Path, matrix: Optional[list[dict[str, Any]]] = None
+    ) -> None:
+        self.functions.append(FunctionRegistry(func=func, type=input_type, suite=suite, matrix=matrix))
 
     def clear(self) -> None:
         self.functions = []
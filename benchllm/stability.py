@@ -0,0 +1,104 @@
+import json
+import math
+import threading
+from collections import Counter
+from statistics import mean, pvariance
+from typing import Any, Optional
+
+from benchllm.data_types import Evaluation
+
+
+def output_key(output: Any) -> str:
+    """Outputs are compared by their JSON, so dicts and lists can be counted too"""
+    return json.dumps(output, sort_keys=True, default=str)
+
+
+class RetryTracker:
+    """Watches the outputs of the retries of one test to stop retrying once the outcome is clear.
+
+    The test is stable once its first `min_attempts` outputs are all the same, and flaky once `max_disagreements`
+    outputs differ from the most common one. Until then, it keeps being retried. A single odd output among
+    otherwise equal ones is not enough to decide either way, so rare flakes are still measured over every retry.
+    """
+
+    def __init__(self, *, min_attempts: int = 3, max_disagreements: int = 2) -> None:
+        self.min_attempts = min_attempts
+        self.max_disagreements = max_disagreements
+        self._outputs: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, output: Any) -> None:
+        with self._lock:
+            self._outputs[output_key(output)] += 1
+
+    @property
+    def attempts(self) -> int:
+        with self._lock:
+            return sum(self._outputs.values())
+
+    @property
+    def verdict(self) -> Optional[str]:
+        """Either "stable", "flaky" or None while it's not clear yet"""
+        with self._lock:
+            attempts = sum(self._outputs.values())
+            if not attempts:
+                return None
+            disagreements = attempts - self._outputs.most_common(1)[0][1]
+            if disagreements >= self.max_disagreements:
+                return "flaky"
+            if attempts >= self.min_attempts and len(self._outputs) == 1:
+                return "stable"
+            return None
+
+
+def _as_number(output: Any) -> Optional[float]:
+    """The output as a number, unless it isn't finite: the variance of "nan" or "inf" isn't valid JSON"""
+    try:
+        number = float(output)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def summarize_stability(evaluations: list[Evaluation]) -> dict:
+    """Groups the evaluations of the retries of each test into a stability summary.
+
+    For every test that ran more than once there's the pass rate across attempts, the number of distinct outputs, the
+    share of attempts that gave the most common one, and the mean and variance of the scores, and of the outputs when
+    they're all numbers. A test is flaky when some attempts passed and others failed.
+    """
+    grouped: dict[tuple[str, str], list[Evaluation]] = {}
+    for evaluation in evaluations:
+        prediction = evaluation.prediction
+        grouped.setdefault((str(prediction.function_id), prediction.test.id), []).append(evaluation)
+
+    tests: dict[str, dict[str, dict]] = {}
+    num_flaky = 0
+    for (function, test_id), attempts in grouped.items():
+        if len(attempts) < 2:
+            continue
+        outputs = [attempt.prediction.output for attempt in attempts]
+        counts = Counter(output_key(output) for output in outputs)
+        scores = [attempt.score for attempt in attempts]
+        passed = sum(attempt.passed for attempt in attempts)
+        parsed = [_as_number(output) for output in outputs]
+        numbers = [number for number in parsed if number is not None]
+        flaky = 0 < passed < len(attempts)
+        num_flaky += flaky
+        tests.setdefault(function, {})[test_id] = {
+            "input": attempts[0].prediction.test.input,
+            "attempts": len(attempts),
+            "passed": passed,
+            "pass_rate": passed / len(attempts),
+            "flaky": flaky,
+            "distinct_outputs": len(counts),
+            "agreement": counts.most_common(1)[0][1] / len(attempts),
+            "score_mean": mean(scores),
+            "score_variance": pvariance(scores),
+            "output_variance": pvariance(numbers) if len(numbers) == len(outputs) else None,
+        }
+    return {
+        "tests": sum(len(function_tests) for function_tests in tests.values()),
+        "flaky": num_flaky,
+        "functions": tests,
+    }
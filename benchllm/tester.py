@@ -2,38 +2,114 @@ import importlib.util
 import inspect
 import json
 import sys
+import threading
 import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from contextlib import contextmanager
+from enum import Enum
+from functools import partial
 from pathlib import Path
 from timeit import default_timer as timer
 from types import ModuleType
-from typing import Any, Callable, Iterator, Optional, Union
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar, Union
 
 import yaml
-from pydantic import ValidationError, parse_obj_as
-
-from .data_types import FunctionID, Prediction, Test, TestFunction
-from .listener import TesterListener
+from pydantic import ValidationError, create_model
+
+from .concurrency import AdaptiveLimiter
+from .data_types import FunctionID, Prediction, Test, TestCall, TestFunction
+from .listener import EventDispatcher, TesterListener
+from .matrix import DEFAULT_PROVIDER, provider_of, variant_name
+from .profiler import NO_PROFILER, Profiler
+from .scheduler import TestHistory, prioritize, priority, shard_of
 from .singleton import TestSingleton
+from .stability import RetryTracker
+from .usage import NO_USAGE_TRACKER, UsageTracker
 
 CallableTest = Union[TestFunction, Callable[[Any], Any]]
+T = TypeVar("T")
+RunResult = Optional[tuple[Any, float, dict[str, Any]]]
+
+
+class _NotRun(Enum):
+    """Returned for the runs of a test that weren't started, because the budget is spent or its retries decided"""
+
+    NOT_RUN = "not run"
+
+
+_NOT_RUN = _NotRun.NOT_RUN
 
 
 class Tester:
     __test__ = False
 
-    def __init__(self, test_function: Optional[CallableTest] = None, *, retry_count: int = 1) -> None:
+    def __init__(
+        self,
+        test_function: Optional[CallableTest] = None,
+        *,
+        retry_count: int = 1,
+        max_failures: Optional[int] = None,
+        profiler: Profiler = NO_PROFILER,
+        shard: Optional[tuple[int, int]] = None,
+        processes: int = 1,
+        batch_size: int = 50,
+        concurrency: Optional[dict[str, int]] = None,
+        usage: UsageTracker = NO_USAGE_TRACKER,
+        adaptive_limit: Optional[int] = None,
+        retry_workers: int = 1,
+        adaptive_retries: bool = False,
+    ) -> None:
+        """`shard` is a zero based (index, count) pair, only the tests hashed into that shard are run.
+
+        With `processes` > 1, test functions loaded with `load_module` run in a pool of worker processes, in batches of
+        up to `batch_size` tests. Use this for CPU bound test functions that threads can't speed up.
+
+        With `concurrency`, the tests of all test functions run at the same time in threads, at most
+        `concurrency[provider]` at once for the test functions of each provider. Providers without a limit of their
+        own use the "default" limit, or 1. Results are still reported function by function, in order.
+
+        With `adaptive_limit`, the tests run at the same time as with `concurrency`, but the limit of each provider
+        only starts at its `concurrency` and then adapts between 1 and `adaptive_limit` to the latency and rate limits
+        the tests run into, see `AdaptiveLimiter`. Listeners hear of each new limit through `concurrency_changed`.
+
+        With `retry_workers` > 1, the retries of each test run at the same time, on that many threads. Retries of tests
+        that mock calls still run one after the other. With `adaptive_retries`, a test is no longer retried once its
+        outputs show whether it's stable or flaky, see `RetryTracker`. Tests running in worker processes are always
+        retried `retry_count` times.
+
+        The tokens test functions spend are recorded in `usage`, and no further tests are started once its budget is
+        spent. Tests running in worker processes aren't tracked.
+
+        With `max_failures`, a test whose input doesn't parse or whose function raises counts as failed, and the run
+        stops once that many tests failed. Without it, exceptions of test functions end the run.
+        """
         self._tests: dict[FunctionID, list[Test]] = {}
         self._test_functions: dict[FunctionID, TestFunction] = {}
-        self._listeners: list[TesterListener] = []
+        self._events = EventDispatcher()
         self._predictions: list[Prediction] = []
         self._retry_count = retry_count
+        self._max_failures = max_failures
+        self._num_failures = 0
+        self._profiler = profiler
+        self._shard = shard
+        self._processes = processes
+        self._batch_size = batch_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._concurrency = concurrency
+        self._usage = usage
+        self._adaptive_limit = adaptive_limit
+        self._completed: Counter[tuple[FunctionID, str]] = Counter()
+        self._retry_workers = retry_workers
+        self._retry_executor: Optional[ThreadPoolExecutor] = None
+        self._adaptive_retries = adaptive_retries
 
         if test_function:
             self.add_test_function(test_function=test_function)
 
     def add_listener(self, listener: TesterListener) -> None:
-        self._listeners.append(listener)
+        """Listeners are called from a background thread, see `EventDispatcher`"""
+        self._events.add_listener(listener)
 
     def add_tests(self, tests: list[Test], function_id: FunctionID = FunctionID.default()) -> None:
         self._tests.setdefault(function_id, []).extend(tests)
@@ -56,31 +132,39 @@ class Tester:
             self.add_test(test, function_id)
 
     def load_module(self, path: Union[str, Path]) -> None:
-        path = Path(path)
-        test_singleton = TestSingleton()
-        test_singleton.clear()
-
-        import_module_from_file(path)
-
-        if not test_singleton.functions:
-            raise NoBenchLLMTestFunction()
-
-        for function in test_singleton.functions:
-            function_id = FunctionID(
-                module_path=path,
-                line_number=inspect.getsourcelines(function.func)[1],
-                name=function.func.__name__,
-            )
-
-            self.add_test_function(
-                TestFunction(
-                    function=function.func,
-                    function_id=function_id,
-                    input_type=function.type,
-                    suite=function.suite,
-                )
-            )
-            self.load_tests(function.suite, function_id)
+        with self._profiler.span("Tester.load_module"):
+            self._load_module(Path(path))
+
+    def _load_module(self, path: Path) -> None:
+        with self._profiler.span("import"):
+            test_functions = load_test_functions(path)
+
+        for test_function in test_functions:
+            self.add_test_function(test_function)
+            if test_function.suite is None:
+                continue
+            with self._profiler.span("load_tests"):
+                self.load_tests(test_function.suite, test_function.function_id)
+
+    def resume(self, predictions: list[Prediction]) -> None:
+        """Takes the predictions of an interrupted run as done, `run` only runs the tests and retries without one"""
+        self._predictions.extend(predictions)
+        for prediction in predictions:
+            self._completed[(prediction.function_id, prediction.test.id)] += 1
+
+    def prioritize(self, history: dict[str, TestHistory]) -> None:
+        """Reorders tests and test functions so that previously failing and slow tests run first"""
+        for function_id, tests in self._tests.items():
+            self._tests[function_id] = prioritize(tests, history)
+
+        def function_priority(test_function: TestFunction) -> tuple[int, float]:
+            tests = self._tests.get(test_function.function_id, [])
+            return min((priority(test, history) for test in tests), default=(1, 0.0))
+
+        self._test_functions = {
+            test_function.function_id: test_function
+            for test_function in sorted(self._test_functions.values(), key=function_priority)
+        }
 
     def run(self) -> list[Prediction]:
         """Runs each test through the test function and stores the result"""
@@ -93,80 +177,488 @@ class Tester:
         if not self._tests:
             raise Exception("No tests loaded, run load_tests() first")
 
-        for test_function in self._test_functions.values():
+        with self._profiler.span("Tester.run"):
+            try:
+                self._run_test_functions()
+            finally:
+                self._shutdown_executor()
+                # an interrupted run still delivers the events it emitted, e.g. to be checkpointed
+                self._events.drain()
+        self._broadcast_test_run_ended(self._predictions)
+        return self._predictions
+
+    def _run_test_functions(self) -> None:
+        if self._concurrency is not None or self._adaptive_limit is not None:
+            self._run_scheduled(self._concurrency or {})
+            return
+        for test_function in self._until_stopped(self._test_functions.values()):
             self._broadcast_test_function_started(test_function)
-            for test in self._tests.get(test_function.function_id, []):
-                for _ in range(self._retry_count):
-                    # Checks that the arity of the function matches the number of inputs.
-                    if "__annotations__" in dir(test_function.input_type):
-                        if len(test.input) != len(test_function.input_type.__annotations__):
-                            raise Exception(
-                                f"Your test function needs to have an input parameter annotated with the input type, {test.input}\n\n{test_function.input_type.__annotations__}"
-                            )
-
-                    # Now, try to parse the input. If we fail, we will skip the test.
-                    try:
-                        input = parse_obj_as(test_function.input_type, test.input)
-                    except ValidationError:
-                        self._broadcast_test_skipped(test, error=True)
-                        continue
+            with self._profiler.span(test_function.function_id.name):
+                if self._processes > 1 and test_function.function_id.module_path.is_file():
+                    self._run_in_processes(test_function)
+                else:
+                    plan = TestPlan(test_function.function, test_function.input_type)
+                    for test, attempts in self._until_stopped(self._pending_attempts(test_function)):
+                        if attempts == 1:
+                            self._run_test(test_function, test, plan)
+                        else:
+                            self._run_retries(test_function, test, plan, attempts)
+            self._broadcast_test_function_ended()
+
+    def _until_stopped(self, items: Iterable[T]) -> Iterator[T]:
+        """The items, until the run is stopped by failures or the budget"""
+        for item in items:
+            if self.stopped:
+                return
+            yield item
+
+    def _selected_tests(self, test_function: TestFunction) -> list[Test]:
+        tests = self._tests.get(test_function.function_id, [])
+        if self._shard:
+            index, count = self._shard
+            tests = [test for test in tests if shard_of(test, count) == index]
+        return tests
+
+    def _pending_attempts(self, test_function: TestFunction) -> list[tuple[Test, int]]:
+        """The selected tests, each with the number of retries that a resumed run hasn't completed yet"""
+        attempts = []
+        for test in self._selected_tests(test_function):
+            pending = self._retry_count - self._completed[(test_function.function_id, test.id)]
+            if pending > 0:
+                attempts.append((test, pending))
+        return attempts
+
+    def _pending_runs(self, test_function: TestFunction) -> list[Test]:
+        return [test for test, attempts in self._pending_attempts(test_function) for _ in range(attempts)]
+
+    def _run_retries(self, test_function: TestFunction, test: Test, plan: "TestPlan", attempts: int) -> None:
+        """Runs the retries of a test, `retry_workers` at a time, until they're done or the tracker decides"""
+        tracker = RetryTracker() if self._adaptive_retries else None
+        if self._retry_workers == 1 or test.calls:
+            # mocks replace module attributes, retries running at the same time would restore each other's
+            for _ in range(attempts):
+                if self.stopped or (tracker is not None and tracker.verdict):
+                    break
+                prediction = self._run_test(test_function, test, plan)
+                if tracker is not None and prediction is not None:
+                    tracker.add(prediction.output)
+            return
 
+        try:
+            input = plan.parse_input(test)
+        except ValidationError:
+            for _ in range(attempts):
+                self._test_failed(test)
+            return
+        if self._retry_executor is None:
+            self._retry_executor = ThreadPoolExecutor(max_workers=self._retry_workers)
+        run = partial(
+            _run_attempt,
+            plan,
+            input,
+            test,
+            tracker=tracker,
+            usage=self._usage,
+            name=str(test_function.function_id),
+            profiler=self._profiler,
+        )
+        futures = [self._retry_executor.submit(run) for _ in range(attempts)]
+        try:
+            for future in futures:
+                if self.stopped:
+                    break
+                try:
+                    result = future.result()
+                except Exception:
+                    self._test_raised(test)
+                    continue
+                if result is _NOT_RUN:
+                    continue
+                self._broadcast_test_started(test)
+                self._add_prediction(test_function, test, *result)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _run_test(self, test_function: TestFunction, test: Test, plan: "TestPlan") -> Optional[Prediction]:
+        # Now, try to parse the input. If we fail, we will skip the test.
+        try:
+            with self._profiler.span("parse"):
+                input = plan.parse_input(test)
+        except ValidationError:
+            self._test_failed(test)
+            return None
+
+        self._broadcast_test_started(test)
+        name = str(test_function.function_id)
+        try:
+            with self._usage.scope("functions", name):
+                output, time_elapsed, calls_made = plan.call(input, test, profiler=self._profiler, name=name)
+        except Exception:
+            self._test_raised(test)
+            return None
+        return self._add_prediction(test_function, test, output, time_elapsed, calls_made)
+
+    def _test_failed(self, test: Test) -> None:
+        self._num_failures += 1
+        self._broadcast_test_skipped(test, error=True)
+
+    def _test_raised(self, test: Test) -> None:
+        """Counts a test whose function raised as failed, re-raises without max_failures, call it in an except block"""
+        if self._max_failures is None:
+            raise
+        self._test_failed(test)
+
+    def _add_prediction(
+        self, test_function: TestFunction, test: Test, output: Any, time_elapsed: float, calls_made: dict[str, Any]
+    ) -> Prediction:
+        with self._profiler.span("prediction"):
+            if isinstance(output, str):
+                # the test and function id are validated already, only outputs that need converting go through pydantic
+                prediction = Prediction.construct(
+                    test=test,
+                    output=output,
+                    time_elapsed=time_elapsed,
+                    function_id=test_function.function_id,
+                    calls=calls_made,
+                )
+            else:
+                prediction = Prediction(
+                    test=test,
+                    output=output,
+                    time_elapsed=time_elapsed,
+                    function_id=test_function.function_id,
+                    calls=calls_made,
+                )
+        self._predictions.append(prediction)
+        self._broadcast_test_ended(prediction)
+        return prediction
+
+    def _run_in_processes(self, test_function: TestFunction) -> None:
+        """Runs the tests of a function loaded from a module in worker processes, each importing the module once"""
+        tests = self._pending_runs(test_function)
+        if not tests:
+            return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._processes)
+        batch_size = max(1, min(self._batch_size, len(tests) // self._processes))
+        batches = [tests[i : i + batch_size] for i in range(0, len(tests), batch_size)]
+        catch_errors = self._max_failures is not None
+        futures = [
+            self._executor.submit(_run_batch, test_function.function_id, batch, catch_errors=catch_errors)
+            for batch in batches
+        ]
+        try:
+            for batch, future in zip(batches, futures):
+                for test, result in zip(batch, future.result()):
+                    if self.stopped:
+                        return
+                    if result is None:
+                        self._test_failed(test)
+                        continue
                     self._broadcast_test_started(test)
-                    start = timer()
-
-                    # set up mock functions for the test calls
-                    calls_made: dict[str, Any] = {}
-                    with setup_mocks(test, calls_made):
-                        output = test_function.function(input)
-
-                    end = timer()
-                    prediction = Prediction(
-                        test=test,
-                        output=output,
-                        time_elapsed=end - start,
-                        function_id=test_function.function_id,
-                        calls=calls_made,
-                    )
-                    self._predictions.append(prediction)
-                    self._broadcast_test_ended(prediction)
-            self._broadcast_test_function_ended()
-        self._broadcast_test_run_ended(self._predictions)
-        return self._predictions
+                    self._add_prediction(test_function, test, *result)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _run_scheduled(self, concurrency: dict[str, int]) -> None:
+        """Submits the tests of all test functions up front, each provider to a thread pool of its own size"""
+        executors: dict[str, ThreadPoolExecutor] = {}
+        limiters: dict[str, Optional[AdaptiveLimiter]] = {}
+        mocks_lock = threading.Lock()
+        scheduled = []
+        for test_function in self._test_functions.values():
+            provider = test_function.provider or DEFAULT_PROVIDER
+            if provider not in executors:
+                limit = concurrency.get(provider, concurrency.get(DEFAULT_PROVIDER, 1))
+                limiter = None
+                if self._adaptive_limit is not None:
+                    # the pool is as large as the limit can grow, the limiter decides how many tests run at once
+                    limiter = AdaptiveLimiter(provider, initial=limit, max_limit=self._adaptive_limit)
+                    limiter.add_listener(self._broadcast_concurrency_changed)
+                    limit = limiter.max_limit
+                limiters[provider] = limiter
+                executors[provider] = ThreadPoolExecutor(max_workers=limit)
+            plan = TestPlan(test_function.function, test_function.input_type)
+            tests = self._pending_runs(test_function)
+            # the retries of a test share a tracker, those that start after it decided don't run
+            trackers = {test.id: RetryTracker() for test in tests} if self._adaptive_retries else {}
+            run = partial(
+                _run_scheduled_test,
+                mocks_lock=mocks_lock,
+                usage=self._usage,
+                name=str(test_function.function_id),
+                limiter=limiters[provider],
+                profiler=self._profiler,
+            )
+            futures = [executors[provider].submit(run, plan, test, tracker=trackers.get(test.id)) for test in tests]
+            scheduled.append((test_function, tests, futures))
+
+        try:
+            for test_function, tests, futures in self._until_stopped(scheduled):
+                self._broadcast_test_function_started(test_function)
+                with self._profiler.span(test_function.function_id.name):
+                    for test, future in self._until_stopped(zip(tests, futures)):
+                        try:
+                            result = future.result()
+                        except Exception:
+                            self._test_raised(test)
+                            continue
+                        if result is _NOT_RUN:
+                            if self.over_budget:
+                                # tests that hadn't started when the budget ran out didn't run
+                                break
+                            continue
+                        if result is None:
+                            self._test_failed(test)
+                            continue
+                        self._broadcast_test_started(test)
+                        self._add_prediction(test_function, test, *result)
+                self._broadcast_test_function_ended()
+        finally:
+            for executor in executors.values():
+                executor.shutdown(cancel_futures=True)
+
+    def _shutdown_executor(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        if self._retry_executor is not None:
+            self._retry_executor.shutdown(cancel_futures=True)
+            self._retry_executor = None
 
     @property
     def predictions(self) -> list[Prediction]:
         return self._predictions
 
+    @property
+    def num_failures(self) -> int:
+        return self._num_failures
+
+    @property
+    def aborted(self) -> bool:
+        return self._max_failures is not None and self._num_failures >= self._max_failures
+
+    @property
+    def over_budget(self) -> bool:
+        return self._usage.exhausted
+
+    @property
+    def stopped(self) -> bool:
+        return self.aborted or self.over_budget
+
+    @property
+    def test_functions(self) -> list[TestFunction]:
+        return list(self._test_functions.values())
+
     def tests(self, function_id: FunctionID = FunctionID.default()) -> list[Test]:
         return self._tests.get(function_id, [])
 
     def _broadcast_test_run_started(self) -> None:
-        for listener in self._listeners:
-            listener.test_run_started()
+        self._events.emit("test_run_started")
 
     def _broadcast_test_run_ended(self, predications: list[Prediction]) -> None:
-        for listener in self._listeners:
-            listener.test_run_ended(predications)
+        self._events.emit("test_run_ended", predications)
+        # the listeners are done with the run once it returns
+        self._events.flush()
 
     def _broadcast_test_function_started(self, test_function: TestFunction) -> None:
-        for listener in self._listeners:
-            listener.test_function_started(test_function)
+        self._events.emit("test_function_started", test_function)
 
     def _broadcast_test_function_ended(self) -> None:
-        for listener in self._listeners:
-            listener.test_function_ended()
+        self._events.emit("test_function_ended")
 
     def _broadcast_test_started(self, test: Test) -> None:
-        for listener in self._listeners:
-            listener.test_started(test)
+        with self._profiler.span("listeners"):
+            self._events.emit("test_started", test)
 
     def _broadcast_test_ended(self, prediction: Prediction) -> None:
-        for listener in self._listeners:
-            listener.test_ended(prediction)
+        with self._profiler.span("listeners"):
+            self._events.emit("test_ended", prediction)
 
     def _broadcast_test_skipped(self, test: Test, error: bool = False) -> None:
-        for listener in self._listeners:
-            listener.test_skipped(test, error)
+        with self._profiler.span("listeners"):
+            self._events.emit("test_skipped", test, error)
+
+    def _broadcast_concurrency_changed(self, name: str, limit: int) -> None:
+        self._events.emit("concurrency_changed", name, limit)
+
+
+class TestPlan:
+    """Everything needed to run the tests of a test function that doesn't depend on the test itself.
+
+    The input validator, the number of inputs the input type expects and the modules of mocked functions are resolved
+    once, instead of for every test and retry.
+    """
+
+    __test__ = False
+
+    def __init__(self, function: Callable[[Any], Any], input_type: Any) -> None:
+        self.function = function
+        self.input_type = input_type
+        self._arity = len(input_type.__annotations__) if "__annotations__" in dir(input_type) else None
+        self._input_model = create_model("TestInput", __root__=(input_type, ...))
+        self._input_field = self._input_model.__fields__["__root__"]
+        self._mock_targets: dict[str, tuple[ModuleType, str]] = {}
+
+    def parse_input(self, test: Test) -> Any:
+        """Parses the test input into the input type of the test function, raises a ValidationError if it doesn't fit"""
+        # Checks that the arity of the function matches the number of inputs.
+        if self._arity is not None and len(test.input) != self._arity:
+            raise Exception(
+                f"Your test function needs to have an input parameter annotated with the input type, {test.input}\n\n{self.input_type.__annotations__}"
+            )
+        input, errors = self._input_field.validate(test.input, {}, loc="__root__", cls=self._input_model)
+        if errors:
+            raise ValidationError([errors], self._input_model)
+        return input
+
+    def call(
+        self, input: Any, test: Test, *, profiler: Profiler = NO_PROFILER, name: str = ""
+    ) -> tuple[Any, float, dict[str, Any]]:
+        return call_test_function(
+            self.function, input, test, profiler=profiler, name=name, mock_targets=self._mock_targets
+        )
+
+
+def call_test_function(
+    function: Callable[[Any], Any],
+    input: Any,
+    test: Test,
+    *,
+    profiler: Profiler = NO_PROFILER,
+    name: str = "",
+    mock_targets: Optional[dict[str, tuple[ModuleType, str]]] = None,
+) -> tuple[Any, float, dict[str, Any]]:
+    """Calls the test function with the test's mocks installed, returns the output, elapsed time and mocked calls"""
+    start = timer()
+
+    # set up mock functions for the test calls
+    calls_made: dict[str, Any] = {}
+    with profiler.span("mocks"), setup_mocks(test, calls_made, mock_targets):
+        with profiler.span("function"), profiler.function(name):
+            output = function(input)
+
+    end = timer()
+    return output, end - start, calls_made
+
+
+# Plans of the test functions imported by each worker process
+_worker_plans: dict[FunctionID, TestPlan] = {}
+
+
+def _worker_plan(function_id: FunctionID) -> TestPlan:
+    if function_id not in _worker_plans:
+        for test_function in load_test_functions(function_id.module_path):
+            _worker_plans[test_function.function_id] = TestPlan(test_function.function, test_function.input_type)
+    return _worker_plans[function_id]
+
+
+def _run_batch(function_id: FunctionID, tests: list[Test], *, catch_errors: bool = False) -> list[RunResult]:
+    """Runs tests in a worker process, None for those whose input doesn't parse or, with `catch_errors`, that raised"""
+    plan = _worker_plan(function_id)
+    results: list[RunResult] = []
+    for test in tests:
+        try:
+            input = plan.parse_input(test)
+        except ValidationError:
+            results.append(None)
+            continue
+        try:
+            results.append(plan.call(input, test))
+        except Exception:
+            if not catch_errors:
+                raise
+            results.append(None)
+    return results
+
+
+def _run_scheduled_test(
+    plan: TestPlan,
+    test: Test,
+    *,
+    mocks_lock: threading.Lock,
+    usage: UsageTracker,
+    name: str,
+    limiter: Optional[AdaptiveLimiter] = None,
+    tracker: Optional[RetryTracker] = None,
+    profiler: Profiler = NO_PROFILER,
+) -> Union[RunResult, _NotRun]:
+    if usage.exhausted or (tracker is not None and tracker.verdict):
+        return _NOT_RUN
+    try:
+        input = plan.parse_input(test)
+    except ValidationError:
+        return None
+    call = plan.call if limiter is None else partial(limiter.call, plan.call)
+    with usage.scope("functions", name):
+        if test.calls:
+            # mocks replace module attributes, the tests running at the same time would see them
+            with mocks_lock:
+                result = call(input, test, profiler=profiler, name=name)
+        else:
+            result = call(input, test, profiler=profiler, name=name)
+    if tracker is not None:
+        tracker.add(result[0])
+    return result
+
+
+def _run_attempt(
+    plan: TestPlan,
+    input: Any,
+    test: Test,
+    *,
+    tracker: Optional[RetryTracker],
+    usage: UsageTracker,
+    name: str,
+    profiler: Profiler = NO_PROFILER,
+) -> Union[tuple[Any, float, dict[str, Any]], _NotRun]:
+    """Runs one retry of a test, unless the budget is spent or the retries before it decided the test already"""
+    if usage.exhausted or (tracker is not None and tracker.verdict):
+        return _NOT_RUN
+    with usage.scope("functions", name):
+        result = plan.call(input, test, profiler=profiler, name=name)
+    if tracker is not None:
+        tracker.add(result[0])
+    return result
+
+
+def load_test_functions(path: Path) -> list[TestFunction]:
+    """Imports the module at `path` and returns its @benchllm.test functions, importing it again reloads them"""
+    test_singleton = TestSingleton()
+    test_singleton.clear()
+    import_module_from_file(path)
+
+    if not test_singleton.functions:
+        raise NoBenchLLMTestFunction()
+
+    test_functions = []
+    for function in test_singleton.functions:
+        function_id = FunctionID(
+            module_path=path,
+            line_number=inspect.getsourcelines(function.func)[1],
+            name=function.func.__name__,
+        )
+        if function.matrix is None:
+            test_functions.append(
+                TestFunction(
+                    function=function.func, function_id=function_id, input_type=function.type, suite=function.suite
+                )
+            )
+            continue
+        # every cell of the matrix becomes a test function of its own, with the cell bound to its parameters
+        for cell in function.matrix:
+            test_functions.append(
+                TestFunction(
+                    function=partial(function.func, **cell),
+                    function_id=function_id.copy(update={"variant": variant_name(cell)}),
+                    input_type=function.type,
+                    suite=function.suite,
+                    provider=provider_of(cell),
+                )
+            )
+    return test_functions
 
 
 def load_files(directory: Union[str, Path]) -> list[Test]:
@@ -253,27 +745,27 @@ def import_module_from_file(file_path: Path) -> ModuleType:
 
 
 @contextmanager
-def setup_mocks(test: Test, calls_made: dict[str, Any]) -> Iterator[None]:
-    """Sets up mock functions for the test calls"""
+def setup_mocks(
+    test: Test, calls_made: dict[str, Any], targets: Optional[dict[str, tuple[ModuleType, str]]] = None
+) -> Iterator[None]:
+    """Sets up mock functions for the test calls, `targets` caches the resolved modules between tests"""
     old_functions = []
     for call in test.calls or []:
         mock_name = call.name
-        module_name, function_name = mock_name.rsplit(".", 1)
-        # we need to import the module before we can mock the function
-        module = importlib.import_module(module_name)
+        if targets is not None and mock_name in targets:
+            module, function_name = targets[mock_name]
+        else:
+            module_name, function_name = mock_name.rsplit(".", 1)
+            # we need to import the module before we can mock the function
+            module = importlib.import_module(module_name)
+            if targets is not None:
+                targets[mock_name] = (module, function_name)
         old_functions.append((module, function_name, getattr(module, function_name)))
 
-        def mock_function(*args: tuple, **kwargs: dict[str, Any]) -> Any:
-            assert not args, "Positional arguments are not supported"
-            if mock_name not in calls_made:
-                calls_made[mock_name] = []
-            calls_made[mock_name].append(kwargs)
-            return call.returns
-
         try:
-            setattr(module, function_name, mock_function)
+            setattr(module, function_name, _mock_function(call, calls_made))
         except AttributeError:
-            print(f"Function {function_name} doesn't exist in module {module_name}")
+            print(f"Function {function_name} doesn't exist in module {module.__name__}")
 
     try:
         yield
@@ -281,3 +773,14 @@ def setup_mocks(test: Test, calls_made: dict[str, Any]) -> Iterator[None]:
         # restore the old function
         for old_function in old_functions:
             setattr(old_function[0], old_function[1], old_function[2])
+
+
+def _mock_function(call: TestCall, calls_made: dict[str, Any]) -> Callable[..., Any]:
+    def mock_function(*args: tuple, **kwargs: dict[str, Any]) -> Any:
+        assert not args, "Positional arguments are not supported"
+        if call.name not in calls_made:
+            calls_made[call.name] = []
+        calls_made[call.name].append(kwargs)
+        return call.returns
+
+    return mock_function
@@ -0,0 +1,154 @@
+import json
+import threading
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, ContextManager, Iterator, Optional
+
+# USD per 1000 prompt and completion tokens, models are matched by their longest listed prefix
+PRICES: dict[str, tuple[float, float]] = {
+    "gpt-4-32k": (0.06, 0.12),
+    "gpt-4": (0.03, 0.06),
+    "gpt-3.5-turbo-16k": (0.003, 0.004),
+    "gpt-3.5-turbo": (0.0015, 0.002),
+    "text-davinci-003": (0.02, 0.02),
+    "text-similarity-davinci-001": (0.02, 0.0),
+    "text-embedding-ada-002": (0.0001, 0.0),
+}
+
+
+@dataclass(slots=True)
+class TokenUsage:
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, other: "TokenUsage") -> None:
+        self.requests += other.requests
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cost += other.cost
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "total_tokens": self.total_tokens}
+
+
+def cost_of(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    """The cost in USD of a request to `model`, or 0 for models without a known price"""
+    if not model:
+        return 0.0
+    prefixes = [prefix for prefix in PRICES if model.startswith(prefix)]
+    if not prefixes:
+        return 0.0
+    prompt_price, completion_price = PRICES[max(prefixes, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+# the tracker and the (kind, name) key that API calls made in the current context are attributed to
+_scope: ContextVar[Optional[tuple["UsageTracker", str, str]]] = ContextVar("benchllm_usage_scope", default=None)
+
+
+class UsageTracker:
+    """Adds up the tokens and cost of the API calls made by each test function and each evaluator.
+
+    Calls are attributed to the innermost `scope`, the Tester and the evaluators open one around every test and every
+    evaluation. Once `max_tokens` or `max_cost` is spent the tracker is `exhausted`, calls already in flight still
+    complete so the budget can be overshot by up to one request per worker.
+    """
+
+    def __init__(
+        self, *, enabled: bool = True, max_tokens: Optional[int] = None, max_cost: Optional[float] = None
+    ) -> None:
+        self.enabled = enabled
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self._lock = threading.Lock()
+        self._total = TokenUsage()
+        self._scopes: dict[str, dict[str, TokenUsage]] = {"functions": {}, "evaluators": {}}
+
+    def scope(self, kind: str, name: str) -> ContextManager[None]:
+        """Attributes the usage recorded in this context to the test function or evaluator `name`"""
+        if not self.enabled:
+            return nullcontext()
+        return self._scope(kind, name)
+
+    @contextmanager
+    def _scope(self, kind: str, name: str) -> Iterator[None]:
+        token = _scope.set((self, kind, name))
+        try:
+            yield
+        finally:
+            _scope.reset(token)
+
+    def add(self, kind: str, name: str, usage: TokenUsage) -> None:
+        with self._lock:
+            self._total.add(usage)
+            self._scopes[kind].setdefault(name, TokenUsage()).add(usage)
+
+    @property
+    def total(self) -> TokenUsage:
+        with self._lock:
+            return TokenUsage(**asdict(self._total))
+
+    @property
+    def exhausted(self) -> bool:
+        if not self.enabled:
+            return False
+        with self._lock:
+            return (self.max_tokens is not None and self._total.total_tokens >= self.max_tokens) or (
+                self.max_cost is not None and self._total.cost >= self.max_cost
+            )
+
+    def summary(self) -> dict:
+        with self._lock:
+            summary = {
+                "total": self._total.to_dict(),
+                **{
+                    kind: {name: usage.to_dict() for name, usage in sorted(usages.items())}
+                    for kind, usages in self._scopes.items()
+                },
+            }
+        summary["budget"] = {"max_tokens": self.max_tokens, "max_cost": self.max_cost, "exhausted": self.exhausted}
+        return summary
+
+    def write(self, path: Path) -> None:
+        if not self.enabled:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.summary(), indent=2), encoding="UTF-8")
+
+
+def record_usage(
+    response: Any = None,
+    *,
+    model: Optional[str] = None,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cost: Optional[float] = None,
+) -> None:
+    """Records the tokens of an API call against the test function or evaluator that made it.
+
+    Pass an OpenAI response to read its `usage` and `model`, or give the token counts yourself. The cost is looked up
+    in `PRICES` unless given. Outside of a run with usage tracking this does nothing.
+    """
+    current = _scope.get()
+    if current is None:
+        return
+    tracker, kind, name = current
+    if response is not None:
+        usage = response.get("usage") or {}
+        prompt_tokens += usage.get("prompt_tokens", 0)
+        completion_tokens += usage.get("completion_tokens", 0)
+        model = model or response.get("model")
+    if cost is None:
+        cost = cost_of(model, prompt_tokens, completion_tokens)
+    tracker.add(kind, name, TokenUsage(1, prompt_tokens, completion_tokens, cost))
+
+
+NO_USAGE_TRACKER = UsageTracker(enabled=False)
@@ -4,7 +4,7 @@ from pathlib import Path
 
 import yaml
 
-from benchllm.data_types import CallError, CallErrorType, Prediction
+from benchllm.data_types import CallError, CallErrorType, Evaluation, Prediction
 
 
 class DecoratorFinder(ast.NodeVisitor):
@@ -84,6 +84,17 @@ def load_prediction_files(paths: list[Path]) -> list[Prediction]:
     return predictions
 
 
+def load_evaluation_files(paths: list[Path]) -> list[Evaluation]:
+    """Loads the evaluation reports written by ReportListener"""
+    evaluations = []
+    for path in paths:
+        for file_path in path.rglob("*.json"):
+            data = json.loads(file_path.read_text(encoding="UTF-8"))
+            evaluation = data.pop("evaluation")
+            evaluations.append(Evaluation(prediction=Prediction(**data), **evaluation))
+    return evaluations
+
+
 def collect_call_errors(prediction: Prediction) -> list[CallError]:
     """Assert that the calls in the prediction match the expected calls."""
     if prediction.test.calls is None:
@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from benchllm.data_types import FunctionID, Test, TestFunction
+from benchllm.tester import NoBenchLLMTestFunction, load_files, load_test_functions
+from benchllm.utils import check_file
+
+WATCHED_SUFFIXES = {".py", ".json", ".yml", ".yaml"}
+TEST_SUFFIXES = {".json", ".yml", ".yaml"}
+
+Snapshot = dict[Path, tuple[int, int]]
+
+
+class FileWatcher:
+    """Polls the modification times of the python and test files under some paths.
+
+    Polling needs no platform specific APIs, and a stat per file keeps a scan of a few thousand files in the
+    milliseconds. Hidden directories, `__pycache__` and the `ignore` paths are skipped.
+    """
+
+    def __init__(self, paths: Iterable[Path], *, ignore: Iterable[Path] = (), interval: float = 0.5) -> None:
+        self._paths: list[Path] = []
+        self._ignore = {path.resolve() for path in ignore}
+        self._interval = interval
+        self._snapshot: Snapshot = {}
+        self.add_paths(paths)
+
+    def add_paths(self, paths: Iterable[Path]) -> None:
+        """Starts watching more paths, their current files are not reported as changes"""
+        new_paths = [path.resolve() for path in paths if path.resolve() not in self._paths]
+        self._paths.extend(new_paths)
+        self._snapshot.update(self._scan(new_paths))
+
+    def poll(self) -> set[Path]:
+        """Files added, modified or removed since the previous poll"""
+        snapshot = self._scan(self._paths)
+        changed = {
+            path for path in snapshot.keys() | self._snapshot.keys() if snapshot.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = snapshot
+        return changed
+
+    def wait(self, *, timeout: Optional[float] = None) -> set[Path]:
+        """Blocks until files change, returns an empty set after `timeout` seconds without changes"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(self._interval)
+            changed = self.poll()
+            if changed:
+                # editors and git write several files in a row, wait until they are done
+                while more := self._wait_for_more():
+                    changed |= more
+                return changed
+        return set()
+
+    def _wait_for_more(self) -> set[Path]:
+        time.sleep(self._interval / 5)
+        return self.poll()
+
+    def _scan(self, paths: Iterable[Path]) -> Snapshot:
+        snapshot: Snapshot = {}
+        for root in paths:
+            if root.is_file():
+                self._stat(root, snapshot)
+                continue
+            for directory, directories, files in os.walk(root):
+                directories[:] = [
+                    name
+                    for name in directories
+                    if not name.startswith(".") and name != "__pycache__" and Path(directory, name) not in self._ignore
+                ]
+                for name in files:
+                    self._stat(Path(directory, name), snapshot)
+        return snapshot
+
+    def _stat(self, path: Path, snapshot: Snapshot) -> None:
+        if path.suffix not in WATCHED_SUFFIXES or path.name.startswith(".") or path in self._ignore:
+            return
+        try:
+            stat = path.stat()
+        except OSError:
+            # removed while scanning
+            return
+        snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+
+class WatchedSuite:
+    """The test functions and tests found under some paths, reloaded piece by piece as files change.
+
+    A changed test module is imported again and all of its tests run. A changed test file only runs the tests in that
+    file. Any other changed python file may be imported by any test module, so it's dropped from `sys.modules` and all
+    test modules are imported again.
+    """
+
+    def __init__(self, paths: Iterable[Path]) -> None:
+        self.paths = [path.resolve() for path in paths]
+        self._modules: dict[Path, list[TestFunction]] = {}
+        self._tests: dict[FunctionID, list[Test]] = {}
+        self.errors: dict[Path, str] = {}
+
+    @property
+    def test_functions(self) -> list[TestFunction]:
+        return [test_function for test_functions in self._modules.values() for test_function in test_functions]
+
+    @property
+    def suite_directories(self) -> list[Path]:
+        return list(dict.fromkeys(test_function.suite for test_function in self.test_functions if test_function.suite))
+
+    def tests(self, function_id: FunctionID) -> list[Test]:
+        return self._tests.get(function_id, [])
+
+    def load(self) -> list[tuple[TestFunction, list[Test]]]:
+        """Loads every test module under the paths, returns all test functions with all their tests"""
+        modules = {path for root in self.paths for path in _python_files(root) if self._is_test_module(path)}
+        return self._reload_modules(modules)
+
+    def update(self, changed: set[Path]) -> list[tuple[TestFunction, list[Test]]]:
+        """Reloads what the changed files affect, returns the test functions and tests to run again"""
+        changed = {path.resolve() for path in changed}
+        modules = set()
+        for path in (path for path in changed if path.suffix == ".py" and self._is_watched(path)):
+            if path in self._modules:
+                modules.add(path)
+                continue
+            try:
+                is_test_module = path.exists() and check_file(path)
+            except (SyntaxError, UnicodeDecodeError) as e:
+                # a new module that is still being written
+                self.errors[path] = f"{type(e).__name__}: {e}"
+                continue
+            self.errors.pop(path, None)
+            if is_test_module:
+                modules.add(path)
+            else:
+                _forget_module(path)
+                modules.update(self._modules)
+        runs = self._reload_modules(modules)
+
+        reloaded = {test_function.function_id for test_function, _ in runs}
+        changed_tests = {path for path in changed if path.suffix in TEST_SUFFIXES}
+        for test_function in self.test_functions:
+            if test_function.function_id in reloaded or test_function.suite is None:
+                continue
+            suite = test_function.suite.resolve()
+            if not any(path.is_relative_to(suite) for path in changed_tests):
+                continue
+            tests = self._load_tests(test_function)
+            selected = [test for test in tests if test.file_path and Path(test.file_path).resolve() in changed_tests]
+            if selected:
+                runs.append((test_function, selected))
+        return runs
+
+    def _reload_modules(self, modules: set[Path]) -> list[tuple[TestFunction, list[Test]]]:
+        runs = []
+        for path in sorted(modules):
+            for test_function in self._modules.pop(path, []):
+                self._tests.pop(test_function.function_id, None)
+            self.errors.pop(path, None)
+            if not path.exists():
+                continue
+            try:
+                test_functions = load_test_functions(path)
+            except NoBenchLLMTestFunction:
+                continue
+            except Exception as e:
+                # the module is probably being edited, it's loaded again with the next change
+                self.errors[path] = f"{type(e).__name__}: {e}"
+                continue
+            self._modules[path] = test_functions
+            for test_function in test_functions:
+                runs.append((test_function, self._load_tests(test_function)))
+        return runs
+
+    def _load_tests(self, test_function: TestFunction) -> list[Test]:
+        try:
+            tests = load_files(test_function.suite) if test_function.suite else []
+        except Exception as e:
+            self.errors[test_function.function_id.module_path] = f"{type(e).__name__}: {e}"
+            tests = []
+        self._tests[test_function.function_id] = tests
+        return tests
+
+    def _is_watched(self, path: Path) -> bool:
+        return any(path == root or path.is_relative_to(root) for root in self.paths)
+
+    def _is_test_module(self, path: Path) -> bool:
+        try:
+            return check_file(path)
+        except (SyntaxError, UnicodeDecodeError) as e:
+            self.errors[path] = f"{type(e).__name__}: {e}"
+            return False
+
+
+def _python_files(root: Path) -> Iterable[Path]:
+    if root.suffix == ".py":
+        return [root]
+    return (path for path in root.rglob("*.py") if not path.name.startswith("."))
+
+
+def _forget_module(path: Path) -> None:
+    """Drops the modules imported from `path`, so importing them again picks up the change"""
+    for name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None)
+        if module_file and Path(module_file).resolve() == path:
+            del sys.modules[name]
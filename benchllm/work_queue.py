@@ -0,0 +1,169 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class Batch(BaseModel):
+    id: str
+    # pairs of (function key, test key), with paths relative to the directory searched for tests
+    tests: list[tuple[str, str]]
+
+
+class Lease(BaseModel):
+    batch: Batch
+    path: Path
+
+
+class WorkQueue:
+    """A queue of test batches stored in a directory.
+
+    Batches move between `pending/`, `leased/` and `done/` with atomic renames, so any number of processes, or hosts
+    sharing the filesystem, can pull from the same queue. A leased batch whose file hasn't been touched for
+    `lease_timeout` seconds is considered abandoned by a crashed worker and is moved back to `pending/`.
+
+    Every claim of a batch counts as an attempt, logged in `attempts/`. A batch that was released after an error, or
+    whose lease expired, after `max_attempts` attempts moves to `failed/` instead of being retried forever. Workers
+    waiting for another worker to fill the queue give up once it made no progress for `seed_timeout` seconds.
+    """
+
+    def __init__(
+        self, root: Path, *, lease_timeout: float = 300.0, max_attempts: int = 3, seed_timeout: float = 60.0
+    ) -> None:
+        self.root = root
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.seed_timeout = seed_timeout
+        self._pending = root / "pending"
+        self._leased = root / "leased"
+        self._done = root / "done"
+        self._failed = root / "failed"
+        self._attempts = root / "attempts"
+
+    def seed(self, batches: list[Batch]) -> bool:
+        """Fills the queue unless another worker already did, returns whether this call filled it"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        try:
+            (self.root / "seeding").mkdir()
+        except FileExistsError:
+            self._wait_until_seeded()
+            return False
+
+        for directory in (self._pending, self._leased, self._done, self._failed, self._attempts):
+            directory.mkdir(exist_ok=True)
+        for batch in batches:
+            temporary_path = self.root / "seeding" / f"{batch.id}.json"
+            temporary_path.write_text(batch.json(), encoding="UTF-8")
+            os.replace(temporary_path, self._pending / temporary_path.name)
+        (self.root / "seeded").touch()
+        return True
+
+    def _wait_until_seeded(self, poll_interval: float = 0.1) -> None:
+        seeding = self.root / "seeding"
+        while not (self.root / "seeded").exists():
+            # every batch written while seeding touches the directory
+            try:
+                stalled = time.time() - seeding.stat().st_mtime > self.seed_timeout
+            except FileNotFoundError:
+                stalled = False
+            if stalled:
+                raise TimeoutError(
+                    f"Queue {self.root} was never filled, the worker filling it may have crashed. "
+                    "Remove the directory to start over."
+                )
+            time.sleep(poll_interval)
+
+    def claim(self) -> Optional[Lease]:
+        for path in sorted(self._pending.glob("*.json")):
+            leased_path = self._leased / path.name
+            try:
+                os.rename(path, leased_path)
+                # the lease starts now, not when the batch was queued
+                os.utime(leased_path)
+                batch = Batch(**json.loads(leased_path.read_text(encoding="UTF-8")))
+            except FileNotFoundError:
+                # another worker claimed it first, or requeued it before we could renew the lease
+                continue
+            self._log(path.name, "claimed")
+            return Lease(batch=batch, path=leased_path)
+        return None
+
+    def renew(self, lease: Lease) -> None:
+        try:
+            os.utime(lease.path)
+        except FileNotFoundError:
+            pass
+
+    def complete(self, lease: Lease) -> None:
+        try:
+            os.rename(lease.path, self._done / lease.path.name)
+        except FileNotFoundError:
+            # the lease expired and the batch was requeued, running it twice only rewrites the same predictions
+            pass
+
+    def release(self, lease: Lease, error: str) -> bool:
+        """Hands back a batch that failed, returns whether it ran out of attempts and won't be retried"""
+        return self._retire(lease.path, error) is self._failed
+
+    def requeue_expired(self) -> int:
+        """Hands back the batches of crashed workers, returns how many will be retried"""
+        requeued = 0
+        now = time.time()
+        for path in self._leased.glob("*.json"):
+            try:
+                if now - path.stat().st_mtime < self.lease_timeout:
+                    continue
+            except FileNotFoundError:
+                continue
+            requeued += self._retire(path, "lease expired") is self._pending
+        return requeued
+
+    def attempts(self, batch_id: str) -> int:
+        """How often the batch was claimed, the log also holds the reason each failed attempt was handed back"""
+        try:
+            lines = (self._attempts / f"{batch_id}.json.log").read_text(encoding="UTF-8").splitlines()
+        except FileNotFoundError:
+            return 0
+        return lines.count("claimed")
+
+    def _retire(self, path: Path, reason: str) -> Optional[Path]:
+        """Moves a leased batch back to `pending/`, or to `failed/` once it used up its attempts"""
+        attempts = self.attempts(path.name.removesuffix(".json"))
+        directory = self._failed if attempts >= self.max_attempts else self._pending
+        directory.mkdir(exist_ok=True)
+        try:
+            os.rename(path, directory / path.name)
+        except FileNotFoundError:
+            # another worker requeued or completed it already
+            return None
+        self._log(path.name, reason)
+        return directory
+
+    def _log(self, name: str, message: str) -> None:
+        # appending a single short line is atomic, so workers can log events of the same batch at once
+        line = message.splitlines()[0] if message else ""
+        self._attempts.mkdir(exist_ok=True)
+        with open(self._attempts / f"{name}.log", "a", encoding="UTF-8") as log:
+            log.write(f"{line}\n")
+
+    @property
+    def num_pending(self) -> int:
+        return len(list(self._pending.glob("*.json")))
+
+    @property
+    def num_leased(self) -> int:
+        return len(list(self._leased.glob("*.json")))
+
+    @property
+    def num_done(self) -> int:
+        return len(list(self._done.glob("*.json")))
+
+    @property
+    def failed_batches(self) -> list[str]:
+        return sorted(path.name.removesuffix(".json") for path in self._failed.glob("*.json"))
+
+    def is_finished(self) -> bool:
+        return self.num_pending == 0 and self.num_leased == 0
@@ -0,0 +1,203 @@
+"""Measures benchllm's own overhead on synthetic suites.
+
+python benchmarks/overhead.py --sizes 1000 --sizes 10000 --output overhead.json
+python benchmarks/overhead.py --sizes 1000 --compare overhead.json
+"""
+
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from timeit import default_timer as timer
+from typing import Annotated, Callable, Optional
+
+import typer
+import yaml
+
+from benchllm import Prediction, StringMatchEvaluator, Test, Tester
+from benchllm.cache import FileCache, MemoryCache
+from benchllm.cli.listener import ReportListener
+from benchllm.data_types import FunctionID
+from benchllm.tester import load_files
+from benchllm.utils import find_files
+
+MODULE = """
+import benchllm
+
+
+@benchllm.test(suite=".")
+def noop(input: str):
+    return input
+"""
+
+app = typer.Typer(add_completion=False)
+
+
+def create_suite(directory: Path, size: int) -> None:
+    (directory / "noop.py").write_text(MODULE)
+    for i in range(size):
+        test = {"id": f"test-{i}", "input": f"input {i}", "expected": [f"input {i}", f"other {i}"]}
+        with open(directory / f"{i}.yml", "w") as f:
+            yaml.safe_dump(test, f)
+
+
+def measure(stage: str, size: int, func: Callable[[], object], setup: Optional[Callable[[], object]] = None) -> dict:
+    """Times `func` and measures its peak memory, `setup` rebuilds the state it starts from before each pass"""
+    if setup:
+        setup()
+    start = timer()
+    func()
+    seconds = timer() - start
+
+    # tracing allocations slows everything down, so the peak memory is measured in a separate pass
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    typer.echo(f"{stage:>24} {size:>8} tests {seconds:>9.3f}s {seconds / size * 1e6:>9.1f}us/test {peak >> 20:>6}MiB")
+    return {
+        "stage": stage,
+        "size": size,
+        "seconds": seconds,
+        "per_test_us": seconds / size * 1e6,
+        "peak_memory_bytes": peak,
+    }
+
+
+def predictions_for(size: int) -> list[Prediction]:
+    return [
+        Prediction(
+            test=Test(id=f"test-{i}", input=f"input {i}", expected=[f"other {i}", f"input {i}"]),
+            output=f"input {i}",
+            time_elapsed=0.0,
+            function_id=FunctionID.default(),
+        )
+        for i in range(size)
+    ]
+
+
+def run_size(size: int) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        suite = Path(temp_dir, "suite")
+        suite.mkdir()
+        create_suite(suite, size)
+
+        results.append(measure("find_files", size, lambda: find_files([suite])))
+        results.append(measure("load_files", size, lambda: load_files(suite)))
+
+        def load_and_run() -> None:
+            tester = Tester()
+            tester.load_module(suite / "noop.py")
+            tester.run()
+
+        results.append(measure("Tester.load_module+run", size, load_and_run))
+
+        tests = [Test(id=f"test-{i}", input=f"input {i}", expected=[f"input {i}"]) for i in range(size)]
+
+        def run_noop() -> None:
+            tester = Tester(lambda input: input)
+            tester.add_tests(tests)
+            tester.run()
+
+        results.append(measure("Tester.run", size, run_noop))
+
+        predictions = predictions_for(size)
+
+        def evaluate() -> None:
+            evaluator = StringMatchEvaluator()
+            evaluator.load(predictions)
+            evaluator.run()
+
+        results.append(measure("StringMatchEvaluator.run", size, evaluate))
+
+        memory_cache = MemoryCache(StringMatchEvaluator())
+        memory_cache.load(predictions)
+        memory_cache.run()
+
+        def reload_memory_cache() -> None:
+            # the verdicts are kept, so the run only measures lookups
+            memory_cache.reset()
+            memory_cache.load(predictions)
+
+        results.append(measure("MemoryCache lookups", size, memory_cache.run, setup=reload_memory_cache))
+
+        cache_path = Path(temp_dir, "cache.json")
+
+        def file_cache_round_trip() -> None:
+            evaluator = FileCache(StringMatchEvaluator(), cache_path)
+            evaluator.load(predictions)
+            evaluator.run()
+            FileCache(StringMatchEvaluator(), cache_path)
+
+        def remove_cache_file() -> None:
+            # each pass evaluates every prediction before saving, rather than the second one loading a warm cache
+            cache_path.unlink(missing_ok=True)
+
+        results.append(measure("FileCache save+load", size, file_cache_round_trip, setup=remove_cache_file))
+
+        output_dir = Path(temp_dir, "output")
+        report_listener = ReportListener(output_dir=output_dir)
+
+        def write_reports() -> None:
+            for prediction in predictions:
+                report_listener.test_ended(prediction)
+
+        def remove_reports() -> None:
+            # each pass writes new files rather than overwriting those of the previous one
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+        results.append(measure("ReportListener writes", size, write_reports, setup=remove_reports))
+    return results
+
+
+def startup_time() -> dict:
+    start = timer()
+    subprocess.run([sys.executable, "-c", "import benchllm.cli.main"], check=True)
+    seconds = timer() - start
+    typer.echo(f"{'startup':>24} {seconds:>24.3f}s")
+    return {"stage": "startup", "size": 0, "seconds": seconds, "per_test_us": 0.0, "peak_memory_bytes": 0}
+
+
+def compare(results: list[dict], baseline_path: Path) -> None:
+    baseline = {(r["stage"], r["size"]): r for r in json.loads(baseline_path.read_text())["results"]}
+    typer.echo(f"\nCompared to {baseline_path} ({json.loads(baseline_path.read_text())['version']})")
+    for result in results:
+        previous = baseline.get((result["stage"], result["size"]))
+        if previous is None or not previous["seconds"]:
+            continue
+        ratio = result["seconds"] / previous["seconds"]
+        color = typer.colors.RED if ratio > 1.1 else typer.colors.GREEN if ratio < 0.9 else None
+        typer.secho(f"{result['stage']:>24} {result['size']:>8} tests {ratio:>8.2f}x", fg=color)
+
+
+@app.command()
+def main(
+    sizes: Annotated[list[int], typer.Option(help="Number of tests in each synthetic suite.")] = [1_000, 10_000],
+    output: Annotated[Optional[Path], typer.Option(help="Write the results to this JSON file.")] = None,
+    baseline: Annotated[Optional[Path], typer.Option("--compare", help="Results of a previous run.")] = None,
+) -> None:
+    results = [startup_time()]
+    for size in sizes:
+        results.extend(run_size(size))
+
+    try:
+        benchllm_version = version("benchllm")
+    except PackageNotFoundError:
+        benchllm_version = "unknown"
+    report = {"version": benchllm_version, "python": platform.python_version(), "results": results}
+    if output:
+        output.write_text(json.dumps(report, indent=2))
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    app()
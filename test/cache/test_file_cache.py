@@ -1,9 +1,16 @@
+import json
 import tempfile
 from pathlib import Path
 from unittest.mock import patch
 
-from benchllm import Prediction, StringMatchEvaluator, Test
-from benchllm.cache import FileCache
+from benchllm import (
+    Prediction,
+    RegexEvaluator,
+    SemanticEvaluator,
+    StringMatchEvaluator,
+    Test,
+)
+from benchllm.cache import CACHE_VERSION, FileCache
 from benchllm.data_types import FunctionID
 
 EXAMPLE_PREDICTIONS = [
@@ -72,3 +79,49 @@ def test_file_writes_at_end():
             assert not evaluations[2].passed
             assert mock_method.call_count == 0
             assert evaluator.num_cache_hits == 3
+
+
+def test_evaluators_sharing_a_cache_file_keep_their_own_verdicts():
+    predictions = [
+        Prediction(
+            test=Test(input="foo", expected=[r"a\d+"]), output="a12", time_elapsed=0, function_id=FunctionID.default()
+        )
+    ]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_path = Path(temp_dir, "cache.json")
+        evaluator = FileCache(StringMatchEvaluator(), cache_path)
+        evaluator.load(predictions)
+        assert not evaluator.run()[0].passed
+
+        evaluator = FileCache(RegexEvaluator(), cache_path)
+        evaluator.load(predictions)
+        assert evaluator.run()[0].passed
+        assert evaluator.num_cache_misses == 1
+
+        # the same evaluator with other settings doesn't share verdicts either
+        evaluator = FileCache(RegexEvaluator(full_match=True), cache_path)
+        evaluator.load(predictions)
+        evaluator.run()
+        assert evaluator.num_cache_misses == 1
+
+
+def test_version_1_cache_files_are_kept_for_the_semantic_evaluator():
+    predictions = [
+        Prediction(test=Test(input="foo", expected=["a"]), output="b", time_elapsed=0, function_id=FunctionID.default())
+    ]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_path = Path(temp_dir, "cache.json")
+        v1_cache = {"entries": {json.dumps(["b", "a"]): {"passed": True, "score": 1.0}}, "version": "1"}
+        cache_path.write_text(json.dumps(v1_cache), encoding="UTF-8")
+
+        evaluator = FileCache(SemanticEvaluator(), cache_path)
+        evaluator.load(predictions)
+        assert evaluator.run()[0].passed
+        assert evaluator.num_cache_hits == 1
+        assert json.loads(Path(temp_dir, "cache.v1.json").read_text(encoding="UTF-8")) == v1_cache
+        assert json.loads(cache_path.read_text(encoding="UTF-8"))["version"] == CACHE_VERSION
+
+        # other evaluators don't reuse the semantic verdicts
+        evaluator = FileCache(StringMatchEvaluator(), cache_path)
+        evaluator.load(predictions)
+        assert not evaluator.run()[0].passed
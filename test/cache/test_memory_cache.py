@@ -1,8 +1,8 @@
 from unittest.mock import patch
 
 from benchllm import Prediction, StringMatchEvaluator, Test
-from benchllm.cache import MemoryCache
-from benchllm.data_types import FunctionID
+from benchllm.cache import MemoryCache, MemoryValue
+from benchllm.data_types import Evaluation, FunctionID
 
 EXAMPLE_PREDICTIONS = [
     Prediction(
@@ -161,3 +161,18 @@ def test_memory_cache_supports_numbers():
         assert not evaluations[2].passed
         assert mock_method.call_count == 2
         assert evaluator.num_cache_hits == 1
+
+
+def test_memory_cache_leaves_loaded_predictions_untouched():
+    test = Test(input="foo", expected=["abc", "def"])
+    evaluator = MemoryCache(StringMatchEvaluator())
+    evaluator.store("abc", "def", MemoryValue(passed=False, score=0.0))
+    evaluator.load([Prediction(test=test, output="def", time_elapsed=0, function_id=FunctionID.default())])
+
+    evaluations = evaluator.run()
+    assert evaluations[0].passed
+    assert isinstance(evaluations[0].score, float)
+    assert evaluations[0].prediction.test.expected == ["abc", "def"]
+    assert test.expected == ["abc", "def"]
+    assert evaluator.lookup("def", "def") == MemoryValue(passed=True, score=1.0)
+    assert Evaluation.parse_raw(evaluations[0].json()) == evaluations[0]
@@ -0,0 +1,61 @@
+import json
+import tempfile
+from pathlib import Path
+from test.utils import create_prediction
+from unittest.mock import patch
+
+from benchllm import StringMatchEvaluator
+from benchllm.cache import SemanticCache
+
+
+def test_semantic_cache_reuses_verdicts_of_similar_pairs_across_runs():
+    with patch.object(
+        StringMatchEvaluator, "evaluate_prediction", side_effect=StringMatchEvaluator().evaluate_prediction
+    ) as mock_method:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_path = Path(temp_dir, "cache.json")
+            evaluator = SemanticCache(StringMatchEvaluator(), cache_path)
+            evaluator.load([create_prediction("The capital of France is Paris", ["the capital of france is paris"])])
+            evaluations = evaluator.run()
+            assert evaluations[0].passed
+            assert not evaluations[0].approximate
+            assert mock_method.call_count == 1
+            assert len(list(Path(temp_dir).glob("cache.*.semantic.npz"))) == 1
+            mock_method.reset_mock()
+
+            evaluator = SemanticCache(StringMatchEvaluator(), cache_path)
+            evaluator.load(
+                [
+                    create_prediction("The capital of France is Paris!", ["the capital of france is paris"]),
+                    create_prediction("Rome", ["the capital of france is paris"]),
+                ]
+            )
+            evaluations = evaluator.run()
+            assert evaluations[0].passed
+            assert evaluations[0].approximate
+            assert not evaluations[1].approximate
+            assert mock_method.call_count == 1
+            assert evaluator.num_approximate_hits == 1
+
+            # approximate verdicts are cached as such
+            entries = json.loads(cache_path.read_text())["entries"]
+            assert sum(entry["approximate"] for entry in entries.values()) == 1
+
+
+def test_semantic_cache_does_not_reuse_verdicts_of_pairs_with_other_numbers():
+    sentence = (
+        "The company reported revenue of {} million dollars in the last fiscal year, mostly from its cloud business"
+    )
+    with tempfile.TemporaryDirectory() as temp_dir:
+        evaluator = SemanticCache(StringMatchEvaluator(), Path(temp_dir, "cache.json"))
+        evaluator.load(
+            [
+                create_prediction(sentence.format("2.1"), [sentence.format("2.1")]),
+                # embeds almost the same as the pair above, but has another verdict
+                create_prediction(sentence.format("3.1"), [sentence.format("2.1")]),
+                create_prediction(sentence.format("2.1") + ".", [sentence.format("2.1")]),
+            ]
+        )
+        evaluations = evaluator.run()
+        assert [evaluation.passed for evaluation in evaluations] == [True, False, True]
+        assert [evaluation.approximate for evaluation in evaluations] == [False, False, True]
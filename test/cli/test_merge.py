@@ -0,0 +1,52 @@
+import json
+import tempfile
+from pathlib import Path
+
+from benchllm import Prediction, StringMatchEvaluator, Test
+from benchllm.cache import FileCache
+from benchllm.cli import merge_runs
+from benchllm.cli.listener import ReportListener
+from benchllm.data_types import FunctionID
+from benchllm.utils import load_evaluation_files
+
+
+def _run_shard(output_dir: Path, outputs: list[str]) -> None:
+    report_listener = ReportListener(output_dir=output_dir)
+    evaluator = FileCache(StringMatchEvaluator(), output_dir / "cache.json")
+    evaluator.add_listener(report_listener)
+    for output in outputs:
+        prediction = Prediction(
+            test=Test(input="foo", expected=["yes"]), output=output, time_elapsed=0, function_id=FunctionID.default()
+        )
+        report_listener.test_ended(prediction)
+        evaluator.load([prediction])
+    evaluator.run()
+
+
+def test_merge_combines_reports_and_caches():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        shard_1, shard_2, merged = Path(temp_dir, "1"), Path(temp_dir, "2"), Path(temp_dir, "output", "merged")
+        _run_shard(shard_1, ["yes", "no"])
+        _run_shard(shard_2, ["yes", "maybe"])
+
+        success = merge_runs(output_dirs=[shard_1, shard_2], output_dir=merged)
+
+        assert not success
+        assert len(list((merged / "predictions").glob("*.json"))) == 4
+        evaluations = load_evaluation_files([merged / "evaluations"])
+        assert sorted(evaluation.passed for evaluation in evaluations) == [False, False, True, True]
+        cache = json.loads((merged.parent / "cache.json").read_text())
+        assert len(cache["entries"]) == 3
+
+
+def test_merge_keeps_the_entries_of_the_local_cache():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        shard, merged = Path(temp_dir, "shards", "1"), Path(temp_dir, "output", "merged")
+        _run_shard(shard, ["yes"])
+        _run_shard(merged.parent / "earlier", ["no", "maybe"])
+        (merged.parent / "earlier" / "cache.json").rename(merged.parent / "cache.json")
+
+        merge_runs(output_dirs=[shard], output_dir=merged)
+
+        cache = json.loads((merged.parent / "cache.json").read_text())
+        assert len(cache["entries"]) == 3
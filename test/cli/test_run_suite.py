@@ -1,3 +1,5 @@
+import tempfile
+from pathlib import Path
 from test.utils import create_openai_object
 from unittest.mock import MagicMock, patch
 
@@ -7,6 +9,14 @@ from benchllm.cli.main import app
 
 runner = CliRunner()
 
+PYTHON_CODE = """
+import benchllm
+
+@benchllm.test(suite=".")
+def double(input: int):
+    return input * 2
+"""
+
 
 @patch("openai.Completion.create", return_value=create_openai_object("Hello, user!"))
 def test_run_multiple_suites(completion_mock: MagicMock):
@@ -18,3 +28,36 @@ def test_run_multiple_suites(completion_mock: MagicMock):
 def test_run_target_suite(completion_mock: MagicMock):
     runner.invoke(app, ["run", "examples/qa"])
     completion_mock.assert_called()
+
+
+def test_run_stopped_by_max_failures_keeps_its_profile():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        (temp_dir / "test.py").write_text(PYTHON_CODE)
+        for i in range(3):
+            # the inputs aren't numbers, each test fails to parse
+            (temp_dir / f"{i}.yml").write_text(f"id: '{i}'\ninput: q{i}\nexpected: ['q{i}']\n")
+        output_dir = temp_dir / "output"
+        arguments = ["run", str(temp_dir), "--output-dir", str(output_dir), "--max-failures", "1", "--profile"]
+        result = runner.invoke(app, [*arguments, "--evaluator", "string-match", "--metrics"])
+        assert result.exit_code == 1
+        assert "Stopped after 1 failed tests" in result.output
+        assert "Latency" in result.output
+        assert (output_dir / "profile" / "spans.folded").exists()
+
+
+def test_run_shares_max_failures_between_tests_and_evaluations():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        (temp_dir / "test.py").write_text(PYTHON_CODE)
+        (temp_dir / "broken.yml").write_text("id: broken\ninput: q\nexpected: ['q']\n")
+        for i in range(4):
+            # every output is twice the input, so each evaluation fails
+            (temp_dir / f"{i}.yml").write_text(f"id: '{i}'\ninput: {i + 1}\nexpected: ['0']\n")
+        output_dir = temp_dir / "output"
+        arguments = ["run", str(temp_dir), "--output-dir", str(output_dir), "--max-failures", "2"]
+        result = runner.invoke(app, [*arguments, "--evaluator", "string-match", "--cache", "none"])
+        assert result.exit_code == 1
+        assert len(list((output_dir / "predictions").glob("*.json"))) == 4
+        # the broken test used up one of the two failures
+        assert len(list((output_dir / "evaluations").glob("*.json"))) == 1
@@ -0,0 +1,111 @@
+import json
+import socket
+import sys
+import tempfile
+import urllib.request
+from pathlib import Path
+
+from benchllm.cli.server import BenchServer
+
+PYTHON_CODE = """
+import benchllm
+
+@benchllm.test(suite="suite")
+def echo(input: str):
+    return input
+"""
+
+
+def _write_suite(directory: Path) -> None:
+    (directory / "suite").mkdir()
+    (directory / "test.py").write_text(PYTHON_CODE)
+    for i in range(3):
+        (directory / "suite" / f"{i}.yml").write_text(f"id: '{i}'\ninput: q{i}\nexpected: ['q{i}']\n")
+
+
+def _parse_events(stream: bytes) -> list[tuple[str, dict]]:
+    events = []
+    for block in stream.decode().split("\n\n"):
+        if block:
+            event, data = block.split("\n")
+            events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def _post(url: str, body: dict) -> list[tuple[str, dict]]:
+    request = urllib.request.Request(url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        assert response.headers["Content-Type"] == "text/event-stream"
+        return _parse_events(response.read())
+
+
+def test_server_streams_runs_and_keeps_the_cache_warm():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir).resolve()
+        _write_suite(temp_dir)
+        with BenchServer(cache_path=temp_dir / "output" / "cache.json") as server:
+            body = {"paths": [str(temp_dir)], "evaluator": "string-match", "cache": "memory"}
+            events = _post(f"{server.url}/run", body)
+            names = [name for name, _ in events]
+            assert names[0] == "test_run_started"
+            assert names.count("test_ended") == 3
+            assert names.count("evaluate_prediction_ended") == 3
+            assert events[-1] == ("result", {"errors": {}, "tests": 3, "success": True, "passed": 3, "failed": 0})
+
+            (temp_dir / "suite" / "1.yml").write_text("id: '1'\ninput: q1\nexpected: ['other']\n")
+            events = _post(f"{server.url}/run", body)
+            assert events[-1][1]["failed"] == 1
+            failed = [data for name, data in events if name == "evaluate_prediction_ended" and not data["passed"]]
+            assert failed[0]["prediction"]["test"]["expected"] == ["other"]
+
+            evaluator = next(iter(server._evaluators.values()))
+            assert evaluator.num_cache_hits == 2
+
+            with urllib.request.urlopen(f"{server.url}/health") as response:
+                assert json.loads(response.read())["runs"] == 2
+
+
+def test_evaluators_of_a_server_share_its_cache_file():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir).resolve()
+        _write_suite(temp_dir)
+        cache_path = temp_dir / "output" / "cache.json"
+        cache_path.parent.mkdir()
+        with BenchServer(cache_path=cache_path) as server:
+            for evaluator in ("string-match", "regex", "string-match"):
+                events = _post(f"{server.url}/run", {"paths": [str(temp_dir)], "evaluator": evaluator, "cache": "file"})
+                assert events[-1][1]["passed"] == 3
+        # each evaluator saved its own verdicts without dropping those of the other
+        entries = json.loads(cache_path.read_text())["entries"]
+        assert len(entries) == 6
+
+
+def test_server_rejects_invalid_requests():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with BenchServer(cache_path=Path(temp_dir, "cache.json")) as server:
+            request = urllib.request.Request(f"{server.url}/run", data=json.dumps({"evaluator": "web"}).encode())
+            try:
+                urllib.request.urlopen(request)
+                assert False, "expected a 400"
+            except urllib.error.HTTPError as e:
+                assert e.code == 400
+
+
+def test_server_listens_on_unix_socket():
+    if sys.platform == "win32":
+        return
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir).resolve()
+        _write_suite(temp_dir)
+        socket_path = temp_dir / "bench.sock"
+        with BenchServer(socket_path=socket_path, cache_path=temp_dir / "cache.json"):
+            body = json.dumps({"paths": [str(temp_dir)], "evaluator": "string-match", "eval": False}).encode()
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(str(socket_path))
+                client.sendall(b"POST /run HTTP/1.1\r\nHost: bench\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+                response = b""
+                while chunk := client.recv(65536):
+                    response += chunk
+        _, stream = response.split(b"\r\n\r\n", 1)
+        assert _parse_events(stream)[-1] == ("result", {"errors": {}, "tests": 3, "success": True})
+        assert not socket_path.exists()
@@ -32,3 +32,80 @@ def test_evaluator_can_load_prediction_file():
         assert evaluator.predictions[0].output == "42"
         assert evaluator.predictions[0].test.input == "1+1"
         assert evaluator.predictions[0].test.expected == ["2"]
+
+
+def _string_match_predictions(passing: int, failing: int) -> list[Prediction]:
+    return [
+        Prediction(
+            test=Test(input="foo", expected=["yes"]),
+            output="yes" if i < passing else "no",
+            time_elapsed=0,
+            function_id=FunctionID.default(),
+        )
+        for i in range(passing + failing)
+    ]
+
+
+def test_evaluator_run_sampled_stops_once_interval_is_narrow_enough():
+    evaluator = StringMatchEvaluator()
+    evaluator.load(_string_match_predictions(passing=1000, failing=0))
+
+    estimate = evaluator.run_sampled(width=0.05, seed=1)
+
+    assert estimate.evaluated < 1000
+    assert estimate.width <= 0.05
+    assert len(evaluator.evaluations) == estimate.evaluated
+    assert estimate.estimate == 1.0
+
+
+def test_evaluator_run_sampled_stops_once_threshold_decision_is_certain():
+    evaluator = StringMatchEvaluator()
+    evaluator.load(_string_match_predictions(passing=200, failing=800))
+
+    estimate = evaluator.run_sampled(width=0.01, threshold=0.9, seed=1)
+
+    assert estimate.decided
+    assert not estimate.meets_threshold
+    assert estimate.evaluated < 1000
+    assert estimate.upper < 0.9
+
+
+def test_evaluator_run_sampled_evaluates_everything_when_undecided():
+    evaluator = StringMatchEvaluator()
+    evaluator.load(_string_match_predictions(passing=5, failing=5))
+
+    estimate = evaluator.run_sampled(width=0.01, seed=1)
+
+    assert estimate.evaluated == 10
+    assert estimate.lower == estimate.upper == 0.5
+
+
+def test_evaluator_run_stops_after_max_failures():
+    evaluator = StringMatchEvaluator()
+    evaluator.load(_string_match_predictions(passing=0, failing=10))
+
+    evaluations = evaluator.run(max_failures=3)
+
+    assert len(evaluations) == 3
+    assert not any(evaluation.passed for evaluation in evaluations)
+
+
+def test_evaluator_run_sampled_stops_after_max_failures():
+    evaluator = StringMatchEvaluator()
+    evaluator.load(_string_match_predictions(passing=500, failing=500))
+
+    estimate = evaluator.run_sampled(width=0.01, seed=1, max_failures=3)
+
+    assert len(evaluator.failed) == 3
+    assert estimate.evaluated == len(evaluator.evaluations) < 1000
+
+
+def test_evaluator_candidates_of_custom_evaluators_are_validated():
+    candidate = Evaluator.Candidate(prediction="42", expected="42", score=1, passed="true")
+    assert candidate.dict() == {
+        "prediction": "42",
+        "expected": "42",
+        "score": 1.0,
+        "passed": True,
+        "approximate": False,
+    }
@@ -0,0 +1,72 @@
+from test.utils import create_prediction
+
+import pytest
+
+from benchllm import JsonEvaluator, RegexEvaluator
+
+
+def test_regex_evaluator_searches_the_output():
+    evaluator = RegexEvaluator()
+    evaluator.load(
+        [
+            create_prediction("Your order is ORD-1234.", [r"ORD-\d{4}"]),
+            create_prediction("Your order is ord-1234.", [r"ORD-\d{4}"]),
+            create_prediction("2023-07-01", [r"nope", r"\d{4}-\d{2}-\d{2}"]),
+        ]
+    )
+    assert [evaluation.passed for evaluation in evaluator.run()] == [True, False, True]
+
+
+def test_regex_evaluator_full_match_and_case_insensitive():
+    evaluator = RegexEvaluator(full_match=True, case_sensitive=False)
+    evaluator.load([create_prediction("ord-1234", [r"ORD-\d+"]), create_prediction("id ord-1234", [r"ORD-\d+"])])
+    assert [evaluation.passed for evaluation in evaluator.run()] == [True, False]
+
+
+def test_regex_evaluator_rejects_invalid_patterns_when_loading():
+    with pytest.raises(ValueError):
+        RegexEvaluator().load([create_prediction("foo", ["(unclosed"])])
+
+
+def test_json_evaluator_checks_schemas():
+    schema = (
+        '{"type": "object", "required": ["id", "tags"], "properties": {"id": {"type": "integer", "minimum": 1}, '
+        '"tags": {"type": "array", "items": {"type": "string"}, "maxItems": 2}}, "additionalProperties": false}'
+    )
+    evaluator = JsonEvaluator()
+    evaluator.load(
+        [
+            create_prediction('{"id": 3, "tags": ["a"]}', [schema]),
+            create_prediction('```json\n{"id": 3, "tags": []}\n```', [schema]),
+            create_prediction('{"id": 0, "tags": ["a"]}', [schema]),
+            create_prediction('{"id": 3, "tags": ["a", "b", "c"]}', [schema]),
+            create_prediction('{"id": 3, "tags": [], "extra": true}', [schema]),
+            create_prediction('{"id": true, "tags": []}', [schema]),
+            create_prediction("not json", [schema]),
+        ]
+    )
+    assert [evaluation.passed for evaluation in evaluator.run()] == [True, True, False, False, False, False, False]
+
+
+def test_json_evaluator_checks_key_paths():
+    output = '{"user": {"name": "Ada", "tags": ["admin"], "created": "2023-07-01"}, "status": "ok"}'
+    evaluator = JsonEvaluator()
+    evaluator.load(
+        [
+            create_prediction(output, ['user.name == "Ada"']),
+            create_prediction(output, ["$.user.tags[0] == admin"]),
+            create_prediction(output, [r"user.created =~ ^\d{4}-\d{2}-\d{2}$"]),
+            create_prediction(output, ['status != "error"']),
+            create_prediction(output, ["user.tags"]),
+            create_prediction(output, ["user.tags[1]"]),
+            create_prediction(output, ['user.name == "Bob"', "missing != 1"]),
+        ]
+    )
+    assert [evaluation.passed for evaluation in evaluator.run()] == [True, True, True, True, True, False, False]
+
+
+def test_json_evaluator_rejects_invalid_constraints_when_loading():
+    with pytest.raises(ValueError):
+        JsonEvaluator().load([create_prediction("{}", ['{"type": "thing"}'])])
+    with pytest.raises(ValueError):
+        JsonEvaluator().load([create_prediction("{}", ["user..name"])])
@@ -61,3 +61,34 @@ def test_string_match_passes_if_output_is_equal_to_expected_fuzzy():
     evaluations = evaluator.run()
     assert evaluations[0].passed
     assert not evaluations[1].passed
+
+
+def test_string_match_fuzzy_with_many_references():
+    expected = [f"Phrasing {i}" for i in range(50)] + ["The answer is 42"]
+    evaluator = StringMatchEvaluator(fuzzy=True)
+    evaluator.load(
+        [
+            Prediction(
+                test=Test(input="foo", expected=expected),
+                output="I believe the answer is 42.",
+                time_elapsed=0,
+                function_id=FunctionID.default(),
+            ),
+            Prediction(
+                test=Test(input="foo", expected=expected),
+                output="answer",
+                time_elapsed=0,
+                function_id=FunctionID.default(),
+            ),
+            Prediction(
+                test=Test(input="foo", expected=expected),
+                output="phrasing number 7",
+                time_elapsed=0,
+                function_id=FunctionID.default(),
+            ),
+        ]
+    )
+    evaluations = evaluator.run()
+    assert evaluations[0].passed
+    assert evaluations[1].passed
+    assert not evaluations[2].passed
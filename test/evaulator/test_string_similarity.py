@@ -0,0 +1,74 @@
+from test.utils import create_prediction
+
+import pytest
+
+from benchllm import StringSimilarityEvaluator
+from benchllm.cache import MemoryCache
+from benchllm.evaluator.string_similarity import (
+    jaccard_similarities,
+    levenshtein_distances,
+    token_set_similarities,
+)
+
+
+def test_levenshtein_distances_match_the_textbook_definition():
+    pairs = [("kitten", "sitting"), ("", "abc"), ("abc", ""), ("", ""), ("flaw", "lawn"), ("héllo", "hello")]
+    assert levenshtein_distances(pairs, chunk_size=2).tolist() == [3, 3, 3, 0, 2, 1]
+
+
+def test_token_set_similarity_ignores_word_order_and_repeated_words():
+    similarities = token_set_similarities(
+        [("the capital is paris", "paris is the capital is"), ("paris", "paris, france"), ("", "paris")]
+    )
+    assert similarities.tolist() == [1.0, 1.0, 0.0]
+
+
+def test_jaccard_similarity_of_character_ngrams():
+    similarities = jaccard_similarities([("abc", "abc"), ("abc", "xyz"), ("", "")])
+    assert similarities.tolist() == [1.0, 0.0, 1.0]
+    assert 0.0 < jaccard_similarities([("night", "nacht")], n=2)[0] < 1.0
+
+
+def test_string_similarity_passes_if_every_metric_reaches_its_threshold():
+    evaluator = StringSimilarityEvaluator(levenshtein=0.8, jaccard=0.5)
+    evaluator.load(
+        [
+            create_prediction("Paris", ["paris"]),
+            create_prediction("Pariss", ["nope", "paris"]),
+            create_prediction("London", ["paris"]),
+        ]
+    )
+    evaluations = evaluator.run()
+    assert [evaluation.passed for evaluation in evaluations] == [True, True, False]
+    assert evaluations[0].score == 1.0
+    assert 0.5 <= evaluations[1].score < 1.0
+
+
+def test_string_similarity_scores_predictions_loaded_into_a_cache():
+    evaluator = StringSimilarityEvaluator(levenshtein=None, token_set=0.9)
+    cache = MemoryCache(evaluator)
+    cache.load(
+        [create_prediction("paris is the capital", ["The capital is Paris"]), create_prediction("rome", ["paris"])]
+    )
+    evaluations = cache.run()
+    assert [evaluation.passed for evaluation in evaluations] == [True, False]
+    assert len(evaluator._scores) == 2
+
+
+def test_string_similarity_needs_a_threshold():
+    with pytest.raises(ValueError):
+        StringSimilarityEvaluator(levenshtein=None)
+
+
+def test_string_similarity_scores_loaded_predictions_in_batches():
+    evaluator = StringSimilarityEvaluator(batch_size=2)
+    predictions = [create_prediction(output, ["paris"]) for output in ("paris", "rome", "berlin", "madrid")]
+    evaluator.load(predictions)
+    evaluator.evaluate_prediction(predictions[0])
+    assert set(evaluator._scores) == {("paris", "paris"), ("rome", "paris")}
+
+    assert [evaluation.passed for evaluation in evaluator.run()] == [True, False, False, False]
+    assert len(evaluator._scores) == 4
+
+    evaluator.reset()
+    assert not evaluator._scores
@@ -0,0 +1,20 @@
+from benchllm.automaton import AUTOMATON_MIN_REFERENCES, Automaton, ReferenceMatcher
+
+
+def test_automaton_finds_overlapping_and_nested_patterns():
+    automaton = Automaton(["he", "she", "his", "hers", "xyz"])
+    assert automaton.find("ushers") == {0, 1, 3}
+    assert automaton.find("") == set()
+    assert Automaton(["", "a"]).find("bbb") == {0}
+
+
+def test_reference_matcher_checks_both_directions():
+    references = ["paris", "the capital of france is paris", "rome"] + [
+        f"phrasing {i}" for i in range(AUTOMATON_MIN_REFERENCES)
+    ]
+    matcher = ReferenceMatcher(references)
+    assert matcher.contained_in("i think it is paris, or phrasing 7") == {0, 10}
+    assert matcher.containing("capital of") == {1}
+    assert matcher.containing("ri") == {0, 1}
+    assert matcher.matching("paris") == {0, 1}
+    assert matcher.matching("") == set(range(len(references)))
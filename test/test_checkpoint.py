@@ -0,0 +1,129 @@
+import json
+import tempfile
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from benchllm import Prediction, StringMatchEvaluator, Test, Tester
+from benchllm.checkpoint import CheckpointListener, load_checkpoint
+from benchllm.cli.main import app
+
+PYTHON_CODE = """
+from pathlib import Path
+
+import benchllm
+
+@benchllm.test(suite=".")
+def echo(input: str):
+    here = Path(__file__).parent
+    with open(here / "calls.log", "a") as log:
+        log.write(input + "\\n")
+    if input == "q3" and not (here / "interrupted").exists():
+        (here / "interrupted").touch()
+        raise KeyboardInterrupt()
+    return input
+"""
+
+
+def _tests(count: int) -> list[Test]:
+    return [Test(id=str(i), input=f"q{i}", expected=[f"q{i}"]) for i in range(count)]
+
+
+def test_tester_and_evaluator_resume_from_a_checkpoint():
+    calls = []
+
+    def function(input: str):
+        calls.append(input)
+        if len(calls) == 4:
+            raise KeyboardInterrupt()
+        return input
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir, "checkpoint.jsonl")
+        tester = Tester(function, retry_count=2)
+        tester.add_listener(CheckpointListener(path))
+        tester.add_tests(_tests(3))
+        with pytest.raises(KeyboardInterrupt):
+            tester.run()
+        # a line cut short by the interruption is skipped
+        with open(path, "a") as file:
+            file.write('{"type": "prediction", "predic')
+
+        predictions, evaluations = load_checkpoint(path)
+        assert [prediction.output for prediction in predictions] == ["q0", "q0", "q1"]
+        assert evaluations == []
+
+        calls.clear()
+        tester = Tester(function, retry_count=2)
+        tester.add_tests(_tests(3))
+        tester.resume(predictions)
+        predictions = tester.run()
+        assert calls == ["q1", "q2", "q2"]
+        assert len(predictions) == 6
+
+    evaluated = []
+
+    class CountingEvaluator(StringMatchEvaluator):
+        def evaluate_prediction(self, prediction: Prediction) -> list[StringMatchEvaluator.Candidate]:
+            evaluated.append(prediction.test.id)
+            return super().evaluate_prediction(prediction)
+
+    first = CountingEvaluator()
+    first.load(predictions[:2])
+    done = first.run()
+
+    evaluator = CountingEvaluator()
+    evaluator.load(predictions)
+    evaluator.resume(done)
+    evaluations = evaluator.run()
+    assert evaluated == ["0", "0", "1", "1", "2", "2"]
+    assert len(evaluations) == 6 and all(evaluation.passed for evaluation in evaluations)
+
+
+def test_checkpoint_resumed_after_a_line_cut_short_keeps_the_new_records():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir, "checkpoint.jsonl")
+        tester = Tester(lambda input: input)
+        tester.add_listener(CheckpointListener(path))
+        tester.add_tests(_tests(2))
+        tester.run()
+        # the last record was cut short by a crash
+        path.write_text(path.read_text()[:-20])
+
+        predictions, _ = load_checkpoint(path)
+        assert [prediction.output for prediction in predictions] == ["q0"]
+        tester = Tester(lambda input: input)
+        tester.add_listener(CheckpointListener(path))
+        tester.add_tests(_tests(2))
+        tester.resume(predictions)
+        tester.run()
+
+        predictions, _ = load_checkpoint(path)
+        assert [prediction.output for prediction in predictions] == ["q0", "q1"]
+
+
+def test_run_resumes_an_interrupted_run():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        (temp_dir / "test.py").write_text(PYTHON_CODE)
+        for i in range(6):
+            (temp_dir / f"{i}.yml").write_text(f"id: '{i}'\ninput: q{i}\nexpected: ['q{i}']\n")
+        output_dir = temp_dir / "output"
+        arguments = ["run", str(temp_dir), "--output-dir", str(output_dir), "--evaluator", "string-match"]
+        arguments += ["--cache", "memory"]
+
+        runner = CliRunner()
+        result = runner.invoke(app, arguments)
+        assert result.exit_code == 130
+        assert "--resume" in result.output
+
+        result = runner.invoke(app, [*arguments, "--resume", str(output_dir)])
+        assert result.exit_code == 0, result.output
+        assert "6 passed" in result.output
+
+        calls = (temp_dir / "calls.log").read_text().split()
+        # only the interrupted test runs twice
+        assert sorted(calls) == sorted([*(f"q{i}" for i in range(6)), "q3"])
+        lines = [json.loads(line) for line in (output_dir / "checkpoint.jsonl").read_text().splitlines()]
+        assert [line["type"] for line in lines].count("evaluation") == 6
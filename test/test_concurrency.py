@@ -0,0 +1,101 @@
+import threading
+import time
+from unittest.mock import patch
+
+import openai
+import pytest
+
+from benchllm import Prediction, SemanticEvaluator, Test, Tester, listener
+from benchllm.concurrency import AdaptiveLimiter, is_overload_error
+from benchllm.data_types import FunctionID
+from benchllm.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+
+
+class ConcurrencyListener(listener.TesterListener, listener.EvaluatorListener):
+    def __init__(self) -> None:
+        self.limits: list[tuple[str, int]] = []
+
+    def concurrency_changed(self, name: str, limit: int) -> None:
+        self.limits.append((name, limit))
+
+
+def test_limiter_grows_while_healthy_and_halves_when_throttled():
+    limiter = AdaptiveLimiter("api", initial=2, max_limit=4, backoff=0.001)
+    limits = []
+    limiter.add_listener(lambda name, limit: limits.append(limit))
+    for _ in range(10):
+        limiter.call(lambda: None)
+    assert limits == [3, 4]
+
+    attempts = []
+
+    def throttled_once():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise openai.error.RateLimitError("slow down")
+        return "done"
+
+    assert limiter.call(throttled_once) == "done"
+    assert limiter.limit == 2 and limits == [3, 4, 2]
+    assert limiter.num_throttled == 1
+
+    with pytest.raises(ValueError):
+        limiter.call(lambda: int("not a number"))
+    assert limiter.limit == 2 and limiter.in_flight == 0
+    assert is_overload_error(openai.error.APIError("oops", http_status=502))
+    assert not is_overload_error(openai.error.APIError("oops", http_status=400))
+
+
+def test_limiter_backs_off_when_latency_rises():
+    limiter = AdaptiveLimiter(initial=8, max_limit=8, min_samples=3, smoothing=1.0)
+    for _ in range(3):
+        limiter.call(lambda: None)
+    limiter.call(time.sleep, 0.05)
+    assert limiter.limit == 4
+
+
+def test_tester_adapts_concurrency_per_provider():
+    running = 0
+    most_running = 0
+    lock = threading.Lock()
+
+    def function(input: str):
+        nonlocal running, most_running
+        with lock:
+            running += 1
+            most_running = max(most_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return input
+
+    listener = ConcurrencyListener()
+    tester = Tester(function, adaptive_limit=4)
+    tester.add_listener(listener)
+    tester.add_tests([Test(input=str(i), expected=[str(i)]) for i in range(30)])
+    predictions = tester.run()
+
+    assert [prediction.output for prediction in predictions] == [str(i) for i in range(30)]
+    assert listener.limits[0] == ("default", 2) and ("default", 4) in listener.limits
+    assert 1 < most_running <= 4
+
+
+def test_evaluator_retries_rate_limited_calls():
+    predictions = [
+        Prediction(
+            test=Test(input="q", expected=[str(i)]), output=str(i), time_elapsed=0, function_id=FunctionID.default()
+        )
+        for i in range(20)
+    ]
+    listener = ConcurrencyListener()
+    evaluator = SemanticEvaluator()
+    evaluator.add_listener(listener)
+    evaluator.set_limiter(AdaptiveLimiter("semantic", initial=4, max_limit=8, backoff=0.001, max_retries=20))
+    evaluator.load(predictions)
+    with FakeOpenAIServer(FakeOpenAIConfig(rate_limit_rate=0.2, seed=1)) as server:
+        with patch.object(openai, "api_base", server.url), patch.object(openai, "api_key", "fake"):
+            evaluations = evaluator.run()
+
+    assert len(evaluations) == 20 and all(evaluation.passed for evaluation in evaluations)
+    assert {name for name, _ in listener.limits} == {"semantic"}
+    assert min(limit for _, limit in listener.limits) < 4
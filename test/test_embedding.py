@@ -0,0 +1,87 @@
+from test.utils import create_prediction
+from unittest.mock import patch
+
+import numpy as np
+import openai
+import pytest
+
+from benchllm import EmbeddingEvaluator, Prediction, Test
+from benchllm.data_types import FunctionID
+from benchllm.embedding import (
+    EmbeddingStore,
+    HashingEmbeddingBackend,
+    OpenAIEmbeddingBackend,
+    precompute_expected,
+)
+from benchllm.evaluator.embedding import cosine_similarity, get_embedding
+from benchllm.fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+
+
+def test_hashing_backend_embeds_similar_texts_close_to_each_other():
+    vectors = HashingEmbeddingBackend(dimensions=256).embed(["The capital is Paris", "the capital is paris!", "Rome"])
+    assert vectors.shape == (3, 256)
+    assert vectors[0] @ vectors[1] > 0.8
+    assert vectors[0] @ vectors[2] < 0.5
+
+
+def test_openai_backend_batches_texts():
+    with FakeOpenAIServer(FakeOpenAIConfig(embedding_dimensions=32)) as server:
+        with patch.object(openai, "api_base", server.url), patch.object(openai, "api_key", "fake"):
+            vectors = OpenAIEmbeddingBackend(batch_size=2).embed(["a", "b", "c"])
+    assert vectors.shape == (3, 32)
+    assert server.num_requests == 2
+    assert np.allclose(vectors[2], server.embed("c"))
+
+
+def test_single_text_helpers_embed_and_compare():
+    with FakeOpenAIServer(FakeOpenAIConfig(embedding_dimensions=32)) as server:
+        with patch.object(openai, "api_base", server.url), patch.object(openai, "api_key", "fake"):
+            vector = get_embedding("a\nb", engine="text-similarity-davinci-001")
+    assert np.allclose(vector, server.embed("a b"))
+    assert cosine_similarity(vector, vector) == pytest.approx(1.0)
+
+
+class CountingBackend(HashingEmbeddingBackend):
+    def __init__(self):
+        super().__init__(dimensions=256)
+        self.calls: list[list[str]] = []
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        self.calls.append(texts)
+        return super().embed(texts)
+
+
+def test_embedding_evaluator_uses_the_backend_and_reuses_expected_embeddings():
+    backend = CountingBackend()
+    evaluator = EmbeddingEvaluator(backend=backend, threshold=0.8)
+    expected = ["The answer is 42", "Forty two"]
+    evaluator.load([create_prediction("the answer is 42.", expected), create_prediction("I don't know", expected)])
+    evaluations = evaluator.run()
+    assert [evaluation.passed for evaluation in evaluations] == [True, False]
+    assert evaluations[0].score == pytest.approx(
+        max(backend.embed(["the answer is 42."])[0] @ backend.embed(expected).T)
+    )
+    assert backend.calls[:3] == [expected, ["the answer is 42."], ["I don't know"]]
+
+
+def test_expected_embeddings_are_stored_next_to_the_suite(tmp_path):
+    suite = tmp_path / "suite"
+    suite.mkdir()
+    tests = [
+        Test(input="a", expected=["Paris", "paris, france"], file_path=suite / "a.yml"),
+        Test(input="b", expected=["Paris"], file_path=suite / "b.yml"),
+    ]
+    backend = CountingBackend()
+    embeddings, num_computed = precompute_expected(tests, backend)
+    assert num_computed == 2
+    assert backend.calls == [["Paris", "paris, france"]]
+    assert len(EmbeddingStore.for_directory(suite, backend)) == 2
+
+    evaluator = EmbeddingEvaluator(backend=backend, threshold=0.8)
+    evaluator.load([Prediction(test=tests[0], output="Paris", time_elapsed=0, function_id=FunctionID.default())])
+    assert evaluator.run()[0].passed
+    # the expected values came from the store, only the output was embedded
+    assert backend.calls == [["Paris", "paris, france"], ["Paris"]]
+    assert np.allclose(embeddings["Paris"], backend.embed(["Paris"])[0])
+    # no temporary files are left behind
+    assert [path.name for path in suite.iterdir()] == [EmbeddingStore.for_directory(suite, backend).path.name]
@@ -0,0 +1,53 @@
+import subprocess
+import sys
+from test.utils import create_prediction
+from unittest.mock import patch
+
+import openai
+import pytest
+
+from benchllm import EmbeddingEvaluator, SemanticEvaluator
+from benchllm.cli.main import LatencyDistributionOption
+from benchllm.fake_openai import FakeOpenAIConfig, FakeOpenAIServer, LatencyDistribution
+from benchllm.similarity import semantically_similar
+
+
+@pytest.fixture
+def fake_openai():
+    with FakeOpenAIServer(FakeOpenAIConfig(seed=0)) as server:
+        with patch.object(openai, "api_base", server.url), patch.object(openai, "api_key", "fake"):
+            yield server
+
+
+def test_fake_openai_judges_completions_and_chat_deterministically(fake_openai: FakeOpenAIServer):
+    assert semantically_similar("Yoda I am.", "yoda i am", model="gpt-3")
+    assert not semantically_similar("Yoda I am.", "Luke I am", model="gpt-3")
+    assert semantically_similar("Yoda I am.", "yoda i am", model="gpt-4")
+    assert fake_openai.num_requests == 3
+
+
+def test_fake_openai_serves_evaluators(fake_openai: FakeOpenAIServer):
+    predictions = [create_prediction("42", ["42"]), create_prediction("42", ["24"])]
+    semantic = SemanticEvaluator(workers=2)
+    semantic.load(predictions)
+    assert [evaluation.passed for evaluation in semantic.run()] == [True, False]
+
+    embedding = EmbeddingEvaluator()
+    embedding.load([create_prediction("The answer is 42", ["The answer is 42"])])
+    evaluations = embedding.run()
+    assert evaluations[0].passed
+    assert evaluations[0].score == pytest.approx(1.0)
+
+
+def test_fake_openai_injects_rate_limits():
+    with FakeOpenAIServer(FakeOpenAIConfig(rate_limit_rate=1.0)) as server:
+        with patch.object(openai, "api_base", server.url), patch.object(openai, "api_key", "fake"):
+            with pytest.raises(openai.error.RateLimitError):
+                semantically_similar("a", "b")
+
+
+def test_cli_imports_the_servers_only_when_serving():
+    code = "import sys, benchllm.cli.main; print('benchllm.fake_openai' in sys.modules, 'benchllm.cli.server' in sys.modules)"
+    imported = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert imported.split() == ["False", "False"]
+    assert [option.value for option in LatencyDistributionOption] == [value.value for value in LatencyDistribution]
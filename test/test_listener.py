@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from benchllm import Prediction, StringMatchEvaluator, Test, Tester, listener
+from benchllm.listener import EventDispatcher
+
+
+class RecordingListener(listener.TesterListener, listener.EvaluatorListener):
+    def __init__(self) -> None:
+        self.events: list[str] = []
+        self.threads: set[str] = set()
+
+    def test_started(self, test: Test) -> None:
+        self.threads.add(threading.current_thread().name)
+        self.events.append(f"started {test.input}")
+
+    def test_ended(self, prediction: Prediction) -> None:
+        self.events.append(f"ended {prediction.output}")
+
+    def test_run_ended(self, predications: list[Prediction]) -> None:
+        self.events.append("run ended")
+
+    def evaluate_prediction_ended(self, evaluation) -> None:
+        self.threads.add(threading.current_thread().name)
+        self.events.append(f"evaluated {evaluation.prediction.output}")
+
+
+class SynchronousListener(RecordingListener):
+    synchronous = True
+
+
+def test_listeners_get_every_event_in_order_before_run_returns():
+    recording = RecordingListener()
+    synchronous = SynchronousListener()
+    tester = Tester(lambda input: input)
+    tester.add_listener(recording)
+    tester.add_listener(synchronous)
+    tester.add_tests([Test(input=f"q{i}", expected=[f"q{i}"]) for i in range(50)])
+    predictions = tester.run()
+
+    expected = [event for i in range(50) for event in (f"started q{i}", f"ended q{i}")] + ["run ended"]
+    assert recording.events == expected
+    assert synchronous.events == expected
+    assert recording.threads == {"benchllm-listeners"}
+    assert synchronous.threads == {threading.current_thread().name}
+
+    evaluator = StringMatchEvaluator(workers=4)
+    evaluator.add_listener(recording)
+    evaluator.load(predictions)
+    evaluator.run()
+    # evaluations finish on the worker threads in any order, but are delivered one at a time from the listener thread
+    assert sorted(recording.events[len(expected) :]) == sorted(f"evaluated q{i}" for i in range(50))
+    assert recording.threads == {"benchllm-listeners"}
+
+
+def test_emitting_blocks_once_the_queue_is_full():
+    release = threading.Event()
+    delivered = []
+
+    class SlowListener(listener.TesterListener):
+        def test_started(self, test: Test) -> None:
+            release.wait(timeout=5)
+            delivered.append(test)
+
+    dispatcher = EventDispatcher(max_queue=2, batch_size=1)
+    dispatcher.add_listener(SlowListener())
+    emitter = threading.Thread(target=lambda: [dispatcher.emit("test_started", i) for i in range(5)])
+    emitter.start()
+    emitter.join(timeout=0.2)
+    # one event is being delivered and two are queued, the rest wait for room
+    assert emitter.is_alive()
+    release.set()
+    emitter.join(timeout=5)
+    dispatcher.flush()
+    assert delivered == [0, 1, 2, 3, 4]
+
+
+def test_listener_errors_are_raised_when_the_run_ends():
+    class FailingListener(listener.TesterListener):
+        def test_ended(self, prediction: Prediction) -> None:
+            raise ValueError("broken listener")
+
+    tester = Tester(lambda input: input)
+    tester.add_listener(FailingListener())
+    tester.add_tests([Test(input="q", expected=["q"])])
+    with pytest.raises(ValueError, match="broken listener"):
+        tester.run()
@@ -0,0 +1,117 @@
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from benchllm import Evaluation, Prediction, StringMatchEvaluator, Test, Tester
+from benchllm.cli.listener import print_comparison
+from benchllm.data_types import FunctionID
+from benchllm.matrix import check_matrix_parameters, compare_variants, matrix_cells
+
+PYTHON_CODE = """
+import threading
+import time
+
+import benchllm
+
+running = {"a": 0, "b": 0}
+most_running = {"a": 0, "b": 0}
+lock = threading.Lock()
+
+@benchllm.test(suite=".", matrix={"provider": ["a", "b"], "suffix": ["", "!"]})
+def test(input: str, provider: str, suffix: str):
+    with lock:
+        running[provider] += 1
+        most_running[provider] = max(most_running[provider], running[provider])
+    time.sleep(0.02)
+    with lock:
+        running[provider] -= 1
+    return input + suffix
+"""
+
+
+def test_matrix_cells_combine_dicts_and_keep_lists():
+    assert matrix_cells({"model": ["a", "b"], "temperature": [0, 1]}) == [
+        {"model": "a", "temperature": 0},
+        {"model": "a", "temperature": 1},
+        {"model": "b", "temperature": 0},
+        {"model": "b", "temperature": 1},
+    ]
+    assert matrix_cells([{"prompt": "short"}, {"prompt": "long", "model": "b"}]) == [
+        {"prompt": "short"},
+        {"prompt": "long", "model": "b"},
+    ]
+
+    def function(input: str, model: str):
+        return input
+
+    check_matrix_parameters(function, [{"model": "a"}])
+    with pytest.raises(Exception):
+        check_matrix_parameters(function, [{"temperature": 0}])
+    with pytest.raises(Exception):
+        check_matrix_parameters(function, [{"input": "a"}])
+
+
+def test_tester_runs_matrix_variants_with_per_provider_limits():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        (temp_dir / "test.py").write_text(PYTHON_CODE)
+        for i in range(6):
+            (temp_dir / f"{i}.yml").write_text(f"id: '{i}'\ninput: q{i}\nexpected: ['q{i}']\n")
+
+        tester = Tester(concurrency={"a": 3})
+        tester.load_module(temp_dir / "test.py")
+        predictions = tester.run()
+        module = tester.test_functions[0].function.func.__globals__
+
+    variants = [test_function.function_id.variant for test_function in tester.test_functions]
+    assert variants == ["provider=a,suffix=", "provider=a,suffix=!", "provider=b,suffix=", "provider=b,suffix=!"]
+    assert len(predictions) == 24
+    assert [prediction.function_id.variant for prediction in predictions[:6]] == ["provider=a,suffix="] * 6
+    assert {prediction.output for prediction in predictions[6:12]} == {f"q{i}!" for i in range(6)}
+    assert module["most_running"] == {"a": 3, "b": 1}
+
+    evaluator = StringMatchEvaluator()
+    evaluator.load(predictions)
+    comparison = compare_variants(evaluator.run())
+    (function,) = comparison["functions"].values()
+    assert function["variants"]["provider=b,suffix="]["pass_rate"] == 1.0
+    assert function["variants"]["provider=b,suffix=!"]["pass_rate"] == 0.0
+    assert function["tests"]["0"]["variants"]["provider=a,suffix=!"] == {
+        "runs": 1,
+        "passed": 0,
+        "score": 0.0,
+        "output": "q0!",
+    }
+
+
+def test_compare_variants_ignores_functions_without_variants():
+    prediction = Prediction(
+        test=Test(input="foo", expected=["foo"]), output="foo", time_elapsed=0, function_id=FunctionID.default()
+    )
+    evaluation = Evaluation(prediction=prediction, passed=True, eval_time_elapsed=0, score=1.0)
+    assert compare_variants([evaluation]) == {"functions": {}}
+    assert "[model=a]" in str(FunctionID.default().copy(update={"variant": "model=a"}))
+
+
+def test_print_comparison_prints_outputs_as_they_are(capsys):
+    def verdict(output: str, passed: int) -> dict:
+        return {"runs": 1, "passed": passed, "score": float(passed), "output": output}
+
+    summary = {"pass_rate": 0.5, "score": 0.5, "mean_time_elapsed": 0.1}
+    comparison = {
+        "functions": {
+            "test.py:1:test": {
+                "variants": {"model=a": summary, "model=b": summary},
+                "tests": {
+                    "0": {
+                        "input": "[INST] say hi",
+                        "variants": {"model=a": verdict("hi [/INST]", 1), "model=b": verdict("[red]bye", 0)},
+                    }
+                },
+            }
+        }
+    }
+    print_comparison(comparison)
+    output = capsys.readouterr().out
+    assert "[INST] say hi" in output and "hi [/INST]" in output and "[red]bye" in output
@@ -0,0 +1,65 @@
+import json
+import tempfile
+from pathlib import Path
+
+from benchllm import Prediction, StringMatchEvaluator, Test
+from benchllm.cache import MemoryCache
+from benchllm.cli.listener import RichCliListener
+from benchllm.data_types import FunctionID, TestFunction
+from benchllm.metrics import LatencyHistogram, MetricsListener
+
+
+def test_latency_histogram_percentiles_are_within_precision():
+    histogram = LatencyHistogram(precision=0.01)
+    for i in range(1, 1001):
+        histogram.record(i / 1000)
+
+    assert histogram.count == 1000
+    assert histogram.max == 1.0
+    assert abs(histogram.percentile(50) - 0.5) <= 0.5 * 0.01
+    assert abs(histogram.percentile(90) - 0.9) <= 0.9 * 0.01
+    assert abs(histogram.percentile(99) - 0.99) <= 0.99 * 0.01
+    assert histogram.percentile(100) == 1.0
+
+
+def test_metrics_listener_writes_summary_per_function():
+    function_id = FunctionID(module_path=Path("module.py"), line_number=1, name="function")
+    predictions = [
+        Prediction(test=Test(input="foo", expected=["42"]), output="42", time_elapsed=0.1, function_id=function_id)
+        for _ in range(3)
+    ]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir, "metrics.json")
+        evaluator = MemoryCache(StringMatchEvaluator())
+        listener = MetricsListener(path=path, evaluator=evaluator)
+        evaluator.add_listener(listener)
+        for prediction in predictions:
+            listener.test_ended(prediction)
+        evaluator.load(predictions)
+        evaluator.run()
+
+        summary = json.loads(path.read_text())
+
+    function_summary = summary["functions"][str(function_id)]
+    assert function_summary["tests"]["count"] == 3
+    assert function_summary["tests"]["max"] == 0.1
+    assert function_summary["evaluations"]["count"] == 3
+    assert summary["cache_hit_ratio"] == 2 / 3
+
+
+def test_cli_listener_shows_live_latency_and_throughput(capsys):
+    function_id = FunctionID(module_path=Path("module.py"), line_number=1, name="function")
+    test_function = TestFunction(function=lambda input: input, function_id=function_id, input_type=str)
+    listener = RichCliListener(root_dir=Path.cwd(), interactive=False, live_metrics=True)
+    listener.test_run_started()
+    listener.test_function_started(test_function)
+    for time_elapsed in (0.01, 0.02, 0.1):
+        test = Test(input="foo", expected=["foo"])
+        listener.test_ended(Prediction(test=test, output="foo", time_elapsed=time_elapsed, function_id=function_id))
+    listener.test_skipped(Test(input="bar", expected=["bar"]), error=True)
+
+    lines = capsys.readouterr().out.split("\r")
+    assert lines[1].startswith("module.py:1 (function) 1 tests  p50 10.00ms, p95 10.00ms, ")
+    # percentiles are accurate to within the 1% precision of the histogram
+    assert "3 tests  p50 20.1" in lines[3] and "p95 100.00ms" in lines[3]
+    assert "3 tests, " in lines[4] and "1 errors" in lines[4] and "tests/s" in lines[4]
@@ -0,0 +1,53 @@
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+from benchllm import Test, Tester
+from benchllm.profiler import Profiler
+
+
+def test_profiler_records_self_time_of_nested_spans():
+    profiler = Profiler()
+    with profiler.span("outer"):
+        with profiler.span("inner"):
+            time.sleep(0.02)
+
+    span_times = profiler.span_times
+    assert span_times["outer;inner"] >= 0.02
+    assert span_times["outer"] < span_times["outer;inner"]
+
+
+def test_profiler_writes_flame_graph_and_function_profiles():
+    profiler = Profiler(cprofile=True, memory=True)
+    tester = Tester(Mock(return_value="42"), profiler=profiler)
+    tester.add_test(Test(input="1+1", expected=["2"]))
+    tester.run()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        profiler.write(Path(temp_dir))
+        spans = Path(temp_dir, "spans.folded").read_text().splitlines()
+        assert "Tester.run;default;mocks;function" in {line.rsplit(" ", 1)[0] for line in spans}
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in spans)
+        assert list(Path(temp_dir).glob("*.prof"))
+        assert Path(temp_dir, "memory.json").exists()
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler(enabled=False)
+    with profiler.span("outer"):
+        pass
+
+    assert profiler.span_times == {}
+
+
+def test_profiler_profiles_tests_run_concurrently():
+    for options in ({"concurrency": {"default": 2}}, {"retry_count": 4, "retry_workers": 2}):
+        profiler = Profiler(cprofile=True)
+        tester = Tester(lambda input: input, profiler=profiler, **options)
+        tester.add_tests([Test(input=f"q{i}", expected=[f"q{i}"]) for i in range(4)])
+        tester.run()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            profiler.write(Path(temp_dir))
+            assert len(list(Path(temp_dir).glob("*.prof"))) == 1
@@ -0,0 +1,96 @@
+import threading
+from itertools import count
+
+from benchllm import Evaluation, Prediction, Test, Tester
+from benchllm.data_types import FunctionID
+from benchllm.stability import RetryTracker, summarize_stability
+
+
+def test_retry_tracker_decides_stable_and_flaky():
+    tracker = RetryTracker(min_attempts=3, max_disagreements=2)
+    tracker.add("a")
+    tracker.add("a")
+    assert tracker.verdict is None
+    tracker.add("a")
+    assert tracker.verdict == "stable"
+
+    tracker = RetryTracker(min_attempts=3, max_disagreements=2)
+    for output in ["a", "b", "a", "a"]:
+        tracker.add(output)
+    # a single odd output isn't enough to call it either way
+    assert tracker.verdict is None
+    tracker.add({"answer": 1})
+    assert tracker.verdict == "flaky"
+
+
+def test_retries_run_concurrently_and_stop_once_decided():
+    running = 0
+    most_running = 0
+    lock = threading.Lock()
+    barrier = threading.Barrier(2, timeout=5)
+
+    def stable(input: str):
+        nonlocal running, most_running
+        with lock:
+            running += 1
+            most_running = max(most_running, running)
+        barrier.wait()
+        with lock:
+            running -= 1
+        return input
+
+    tester = Tester(stable, retry_count=10, retry_workers=2, adaptive_retries=True)
+    tester.add_tests([Test(input="a", expected=["a"])])
+    predictions = tester.run()
+    assert most_running == 2
+    # the retries already running when it turned stable still finish
+    assert 3 <= len(predictions) <= 4
+
+    counter = count()
+
+    def flaky(input: str):
+        return next(counter)
+
+    tester = Tester(flaky, retry_count=10, retry_workers=1, adaptive_retries=True)
+    tester.add_tests([Test(input="a", expected=["a"])])
+    assert len(tester.run()) == 3
+
+    tester = Tester(flaky, retry_count=4, concurrency={"default": 2})
+    tester.add_tests([Test(input="a", expected=["a"])])
+    assert len(tester.run()) == 4
+
+
+def test_summarize_stability():
+    function_id = FunctionID.default()
+    stable = Test(input="1 + 1", expected=["2"])
+    flaky = Test(input="2 + 2", expected=["4"])
+    once = Test(input="3 + 3", expected=["6"])
+
+    def evaluation(test: Test, output, passed: bool) -> Evaluation:
+        prediction = Prediction(test=test, output=output, time_elapsed=0, function_id=function_id)
+        return Evaluation(prediction=prediction, passed=passed, score=1.0 if passed else 0.0, eval_time_elapsed=0)
+
+    summary = summarize_stability(
+        [
+            evaluation(stable, 2, True),
+            evaluation(stable, 2, True),
+            evaluation(flaky, 4, True),
+            evaluation(flaky, 5, False),
+            evaluation(flaky, 4, True),
+            evaluation(flaky, 3, False),
+            evaluation(once, 6, True),
+        ]
+    )
+    assert summary["tests"] == 2 and summary["flaky"] == 1
+    tests = summary["functions"][str(function_id)]
+    assert tests[stable.id]["pass_rate"] == 1.0 and not tests[stable.id]["flaky"]
+    assert tests[stable.id]["output_variance"] == 0
+    result = tests[flaky.id]
+    assert result["flaky"] and result["pass_rate"] == 0.5
+    assert result["distinct_outputs"] == 3 and result["agreement"] == 0.5
+    assert result["score_variance"] == 0.25 and result["output_variance"] == 0.5
+    assert once.id not in tests
+
+    nan = Test(input="0 / 0", expected=["nan"])
+    summary = summarize_stability([evaluation(nan, "nan", True), evaluation(nan, "1", False)])
+    assert summary["functions"][str(function_id)][nan.id]["output_variance"] is None
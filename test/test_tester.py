@@ -1,8 +1,16 @@
+import json
+import os
 import tempfile
 from pathlib import Path
 from unittest.mock import Mock, call
 
-from benchllm import Test, Tester
+import pytest
+from pydantic import ValidationError
+
+from benchllm import SimilarityInput, Test, Tester
+from benchllm.data_types import FunctionID, TestCall, TestFunction
+from benchllm.scheduler import TestHistory, load_history
+from benchllm.tester import TestPlan
 
 
 def test_tester_run_through_each_test_once():
@@ -46,3 +54,170 @@ expected: [2]
         assert predictions[0].output == "42"
         assert predictions[0].test.input == "1+1"
         assert predictions[0].test.expected == ["2"]
+
+
+def test_tester_prioritize_runs_failed_then_slowest_tests_first():
+    test_function = Mock(return_value="42")
+    tester = Tester(test_function=test_function)
+    tester.add_tests(
+        [
+            Test(id="passed-fast", input="1", expected=["2"]),
+            Test(id="new", input="2", expected=["2"]),
+            Test(id="passed-slow", input="3", expected=["2"]),
+            Test(id="failed", input="4", expected=["2"]),
+        ]
+    )
+    tester.prioritize(
+        {
+            "passed-fast": TestHistory(passed=True, time_elapsed=0.1),
+            "passed-slow": TestHistory(passed=True, time_elapsed=2.0),
+            "failed": TestHistory(passed=False, time_elapsed=0.5),
+        }
+    )
+    tester.run()
+
+    test_function.assert_has_calls([call("4"), call("2"), call("3"), call("1")])
+
+
+def test_tester_stops_after_max_failures():
+    test_function = Mock(return_value="42")
+    tester = Tester(test_function=test_function, max_failures=2)
+    tester.add_test_function(TestFunction(function=test_function, function_id=FunctionID.default(), input_type=int))
+    tester.add_tests([Test(input="not a number", expected=["2"]) for _ in range(5)])
+    tester.run()
+
+    assert tester.aborted
+    assert tester.num_failures == 2
+    test_function.assert_not_called()
+
+
+def test_tester_counts_test_function_errors_as_failures():
+    def broken(input: str):
+        raise ValueError(input)
+
+    for options in ({}, {"concurrency": {"default": 2}}, {"retry_count": 3, "retry_workers": 2}):
+        tester = Tester(broken, max_failures=2, **options)
+        tester.add_tests([Test(input=f"q{i}", expected=["2"]) for i in range(5)])
+        assert tester.run() == []
+        assert tester.aborted
+        assert tester.num_failures == 2
+
+    # without max_failures, the error ends the run
+    tester = Tester(broken)
+    tester.add_tests([Test(input="q", expected=["2"])])
+    with pytest.raises(ValueError):
+        tester.run()
+
+
+def test_load_history_prefers_evaluations_over_predictions():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_dir = Path(temp_dir)
+        (output_dir / "predictions").mkdir()
+        (output_dir / "evaluations").mkdir()
+        prediction = {"test": {"id": "a"}, "time_elapsed": 1.5}
+        (output_dir / "predictions" / "a.json").write_text(json.dumps(prediction))
+        (output_dir / "predictions" / "b.json").write_text(json.dumps({"test": {"id": "b"}, "time_elapsed": 3}))
+        evaluation = {**prediction, "evaluation": {"passed": False}}
+        (output_dir / "evaluations" / "a.json").write_text(json.dumps(evaluation))
+
+        history = load_history(output_dir)
+
+        assert history["a"] == TestHistory(passed=False, time_elapsed=1.5)
+        assert history["b"] == TestHistory(passed=None, time_elapsed=3)
+
+        # matrix runs write the reports of each variant into a folder of its own
+        (output_dir / "evaluations" / "model=b").mkdir()
+        (output_dir / "evaluations" / "model=b" / "b.json").write_text(
+            json.dumps({"test": {"id": "b"}, "time_elapsed": 3, "evaluation": {"passed": True}})
+        )
+        assert load_history(output_dir)["b"] == TestHistory(passed=True, time_elapsed=3)
+
+
+def test_tester_shards_split_tests_deterministically():
+    tests = [Test(id=f"test-{i}", input=str(i), expected=["2"]) for i in range(50)]
+    shard_outputs = []
+    for index in range(3):
+        tester = Tester(lambda input: input, shard=(index, 3))
+        tester.add_tests(tests)
+        shard_outputs.append([prediction.output for prediction in tester.run()])
+
+    assert all(shard_outputs)
+    assert sorted(sum(shard_outputs, []), key=int) == [str(i) for i in range(50)]
+
+
+def test_tester_runs_module_functions_in_worker_processes():
+    python_code = """
+import os
+
+import benchllm
+import helper
+
+@benchllm.test(suite=".")
+def test(input: int):
+    return f"{helper.square(x=input)} {os.getpid()}"
+    """
+    helper_code = """
+def square(x):
+    return x * x
+"""
+    mocked_test_case = """
+input: 100
+expected: ["10000"]
+calls:
+  - name: helper.square
+    returns: 42
+    arguments: {}
+"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        (temp_dir / "test.py").write_text(python_code)
+        (temp_dir / "helper.py").write_text(helper_code)
+        (temp_dir / "mocked.yml").write_text(mocked_test_case)
+        for i in range(8):
+            (temp_dir / f"{i}.yml").write_text(f"input: {i}\nexpected: ['{i * i}']\n")
+        (temp_dir / "invalid.yml").write_text("input: not a number\nexpected: ['0']\n")
+
+        tester = Tester(processes=2, batch_size=2)
+        tester.load_module(temp_dir / "test.py")
+        predictions = tester.run()
+
+    outputs = {prediction.test.input: prediction.output.split()[0] for prediction in predictions}
+    assert outputs == {**{i: str(i * i) for i in range(8)}, 100: "42"}
+    mocked = [prediction for prediction in predictions if prediction.test.calls]
+    assert mocked[0].calls == {"helper.square": [{"x": 100}]}
+    assert tester.num_failures == 1
+    assert {prediction.output.split()[1] for prediction in predictions} != {str(os.getpid())}
+
+
+def test_test_plan_validates_inputs_and_installs_each_mock():
+    plan = TestPlan(lambda input: input, SimilarityInput)
+    with pytest.raises(ValidationError):
+        plan.parse_input(Test(input={"prompt_1": "a", "prompt_2": ["not", "a", "string"]}, expected=[]))
+    with pytest.raises(Exception, match="input parameter"):
+        plan.parse_input(Test(input={"prompt_1": "a"}, expected=[]))
+
+    test = Test(
+        input={"prompt_1": "a", "prompt_2": "b"},
+        expected=[],
+        calls=[
+            TestCall(name="json.dumps", arguments={}, returns="dumped"),
+            TestCall(name="json.loads", arguments={}, returns="loaded"),
+        ],
+    )
+    plan = TestPlan(lambda input: (json.dumps(obj=input.prompt_1), json.loads(s=input.prompt_2)), SimilarityInput)
+    for _ in range(2):
+        output, _, calls = plan.call(plan.parse_input(test), test)
+        assert output == ("dumped", "loaded")
+        assert calls == {"json.dumps": [{"obj": "a"}], "json.loads": [{"s": "b"}]}
+    assert json.dumps(1) == "1"
+
+
+def test_tester_converts_outputs_that_are_not_strings():
+    test = Tester(test_function=Mock(side_effect=[4, "4"]))
+    test.add_test(Test(input="2+2", expected=["4"]))
+    test.add_test(Test(input="2*2", expected=["4"]))
+    predictions = test.run()
+
+    assert [prediction.output for prediction in predictions] == ["4", "4"]
+    assert predictions[0].json() == predictions[0].parse_raw(predictions[0].json()).json()
+    assert predictions[1].json() == predictions[1].parse_raw(predictions[1].json()).json()
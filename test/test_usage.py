@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+import openai
+
+import benchllm
+from benchllm import Prediction, SemanticEvaluator, Test, Tester
+from benchllm.cache import MemoryCache
+from benchllm.data_types import FunctionID
+from benchllm.fake_openai import FakeOpenAIServer
+from benchllm.usage import UsageTracker, cost_of
+
+
+def test_cost_of_uses_the_longest_matching_price():
+    assert cost_of("gpt-4-0613", 1000, 1000) == 0.09
+    assert cost_of("gpt-4-32k-0613", 1000, 0) == 0.06
+    assert cost_of("my-local-model", 1000, 1000) == 0.0
+    assert cost_of(None, 1000, 1000) == 0.0
+
+
+def test_tester_records_usage_per_function_and_stops_once_the_budget_is_spent():
+    def function(input: str):
+        benchllm.record_usage({"model": "gpt-4", "usage": {"prompt_tokens": 30, "completion_tokens": 10}})
+        return input
+
+    usage = UsageTracker(max_tokens=100)
+    tester = Tester(function, usage=usage)
+    tester.add_tests([Test(input=str(i), expected=[str(i)]) for i in range(5)])
+    predictions = tester.run()
+
+    assert len(predictions) == 3
+    assert tester.over_budget and not tester.aborted
+    summary = usage.summary()
+    assert summary["functions"][str(FunctionID.default())]["total_tokens"] == 120
+    assert summary["total"]["requests"] == 3
+    assert summary["budget"]["exhausted"]
+
+
+def test_tester_stops_scheduled_tests_once_the_budget_is_spent():
+    def function(input: str):
+        benchllm.record_usage(prompt_tokens=10, cost=0.5)
+        return input
+
+    usage = UsageTracker(max_cost=1.0)
+    tester = Tester(function, usage=usage, concurrency={"default": 1})
+    tester.add_tests([Test(input=str(i), expected=[str(i)]) for i in range(5)])
+    predictions = tester.run()
+
+    assert len(predictions) == 2
+    assert tester.num_failures == 0
+    assert usage.total.cost == 1.0
+
+
+def test_semantic_evaluator_records_usage_under_its_own_name():
+    predictions = [
+        Prediction(
+            test=Test(input="q", expected=["a", "b"]),
+            output=output,
+            time_elapsed=0,
+            function_id=FunctionID.default(),
+        )
+        for output in ("b", "c")
+    ]
+    usage = UsageTracker()
+    evaluator = MemoryCache(SemanticEvaluator(early_quitting=False))
+    evaluator.set_usage_tracker(usage)
+    evaluator.load(predictions)
+    with FakeOpenAIServer() as server:
+        with patch.object(openai, "api_base", server.url), patch.object(openai, "api_key", "fake"):
+            evaluator.run()
+
+    summary = usage.summary()
+    assert list(summary["evaluators"]) == ["SemanticEvaluator"]
+    semantic = summary["evaluators"]["SemanticEvaluator"]
+    assert semantic["requests"] == 4
+    assert semantic["prompt_tokens"] > 0 and semantic["completion_tokens"] > 0
+    assert semantic["cost"] == cost_of("text-davinci-003", semantic["prompt_tokens"], semantic["completion_tokens"])
+    assert summary["functions"] == {}
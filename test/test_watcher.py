@@ -0,0 +1,116 @@
+import sys
+import tempfile
+from pathlib import Path
+
+from benchllm import StringMatchEvaluator
+from benchllm.cache import MemoryCache
+from benchllm.cli.commands.watch import run_affected
+from benchllm.tester import Tester
+from benchllm.watcher import FileWatcher, WatchedSuite
+
+PYTHON_CODE = """
+import benchllm
+import watched_helper
+
+@benchllm.test(suite="suite")
+def test(input: int):
+    return watched_helper.format(input)
+"""
+
+
+def _write_suite(directory: Path) -> None:
+    # the helper of an earlier test would be imported from the module cache
+    sys.modules.pop("watched_helper", None)
+    (directory / "suite").mkdir()
+    (directory / "test.py").write_text(PYTHON_CODE)
+    (directory / "watched_helper.py").write_text("def format(x):\n    return str(x)\n")
+    for i in range(3):
+        (directory / "suite" / f"{i}.yml").write_text(f"id: '{i}'\ninput: {i}\nexpected: ['{i}']\n")
+
+
+def _inputs(runs) -> list:
+    return sorted(test.input for _, tests in runs for test in tests)
+
+
+def test_file_watcher_reports_added_modified_and_removed_files():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir).resolve()
+        _write_suite(temp_dir)
+        (temp_dir / "output").mkdir()
+        watcher = FileWatcher([temp_dir], ignore=[temp_dir / "output"], interval=0.01)
+        assert watcher.poll() == set()
+
+        (temp_dir / "suite" / "0.yml").write_text("id: '0'\ninput: 0\nexpected: ['zero']\n")
+        (temp_dir / "suite" / "3.yml").write_text("id: '3'\ninput: 3\nexpected: ['3']\n")
+        (temp_dir / "suite" / "1.yml").unlink()
+        (temp_dir / "output" / "report.json").write_text("{}")
+        (temp_dir / "notes.txt").write_text("not watched")
+        assert watcher.wait(timeout=1) == {temp_dir / "suite" / name for name in ("0.yml", "1.yml", "3.yml")}
+        assert watcher.wait(timeout=0.05) == set()
+
+
+def test_watched_suite_reloads_only_what_changed():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir).resolve()
+        _write_suite(temp_dir)
+        suite = WatchedSuite([temp_dir])
+        assert _inputs(suite.load()) == [0, 1, 2]
+
+        (temp_dir / "suite" / "1.yml").write_text("id: '1'\ninput: 10\nexpected: ['10']\n")
+        runs = suite.update({temp_dir / "suite" / "1.yml"})
+        assert _inputs(runs) == [10]
+        assert sorted(test.input for test in suite.tests(runs[0][0].function_id)) == [0, 2, 10]
+
+        (temp_dir / "watched_helper.py").write_text("def format(x):\n    return f'<{x}>'\n")
+        runs = suite.update({temp_dir / "watched_helper.py"})
+        assert _inputs(runs) == [0, 2, 10]
+        assert runs[0][0].function(1) == "<1>"
+
+        (temp_dir / "test.py").write_text("import benchllm\n\n@benchllm.test(suite='suite')\ndef test(input:\n")
+        assert suite.update({temp_dir / "test.py"}) == []
+        assert not suite.test_functions
+        assert temp_dir / "test.py" in suite.errors
+
+        (temp_dir / "test.py").write_text(PYTHON_CODE)
+        assert _inputs(suite.update({temp_dir / "test.py"})) == [0, 2, 10]
+        assert not suite.errors
+
+
+def test_run_affected_reuses_the_evaluator_cache():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir).resolve()
+        _write_suite(temp_dir)
+        suite = WatchedSuite([temp_dir])
+        evaluator = MemoryCache(StringMatchEvaluator())
+        options = dict(listeners=[], evaluator=evaluator, pass_threshold=None, max_failures=None)
+
+        assert run_affected(suite.load(), tester=Tester(), **options)
+        assert evaluator.num_cache_misses == 3
+
+        (temp_dir / "suite" / "2.yml").write_text("id: '2'\ninput: 2\nexpected: ['two']\n")
+        assert not run_affected(suite.update({temp_dir / "suite" / "2.yml"}), tester=Tester(), **options)
+        assert len(evaluator.evaluations) == 1
+        assert evaluator.num_cache_misses == 1
+
+        (temp_dir / "suite" / "2.yml").write_text("id: '2'\ninput: 2\nexpected: ['2']\n")
+        assert run_affected(suite.update({temp_dir / "suite" / "2.yml"}), tester=Tester(), **options)
+        assert evaluator.num_cache_hits == 1
+
+
+def test_run_affected_reports_errors_of_test_functions(capsys):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir).resolve()
+        _write_suite(temp_dir)
+        suite = WatchedSuite([temp_dir])
+        runs = suite.load()
+        options = dict(
+            listeners=[], evaluator=MemoryCache(StringMatchEvaluator()), pass_threshold=None, max_failures=None
+        )
+
+        (temp_dir / "watched_helper.py").write_text("def format(x):\n    raise ValueError('broken prompt')\n")
+        runs = suite.update({temp_dir / "watched_helper.py"})
+        assert not run_affected(runs, tester=Tester(), **options)
+        assert "ValueError: broken prompt" in capsys.readouterr().out
+
+        (temp_dir / "watched_helper.py").write_text("def format(x):\n    return str(x)\n")
+        assert run_affected(suite.update({temp_dir / "watched_helper.py"}), tester=Tester(), **options)
@@ -0,0 +1,150 @@
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from benchllm.cli.commands.worker import run_worker
+from benchllm.work_queue import Batch, WorkQueue
+
+BATCHES = [Batch(id=f"{i:08d}", tests=[("function", f"test-{i}")]) for i in range(3)]
+
+PYTHON_CODE = """
+import benchllm
+
+@benchllm.test(suite=".")
+def echo(input: str):
+    if input == "q1":
+        raise ValueError("cannot answer q1")
+    return input
+"""
+
+
+def test_work_queue_is_seeded_once_and_drained():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        queue = WorkQueue(Path(temp_dir))
+        assert queue.seed(BATCHES)
+        assert not WorkQueue(Path(temp_dir)).seed(BATCHES)
+
+        claimed = []
+        while lease := queue.claim():
+            claimed.append(lease.batch)
+            queue.complete(lease)
+
+        assert claimed == BATCHES
+        assert queue.is_finished()
+        assert queue.num_done == 3
+
+
+def test_work_queue_requeues_expired_leases():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        queue = WorkQueue(Path(temp_dir), lease_timeout=60)
+        queue.seed(BATCHES[:1])
+        lease = queue.claim()
+        assert lease is not None
+        assert queue.claim() is None
+        assert queue.requeue_expired() == 0
+
+        # simulate a worker that crashed a while ago
+        expired = time.time() - 120
+        os.utime(lease.path, (expired, expired))
+        assert queue.requeue_expired() == 1
+
+        retried = queue.claim()
+        assert retried is not None and retried.batch == lease.batch
+        queue.complete(lease)
+        queue.complete(retried)
+        assert queue.is_finished()
+
+
+def test_work_queue_gives_up_on_batches_after_max_attempts():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        queue = WorkQueue(Path(temp_dir), lease_timeout=60, max_attempts=2)
+        queue.seed(BATCHES[:1])
+        lease = queue.claim()
+        assert lease is not None
+        assert not queue.release(lease, error="ValueError: broken")
+
+        # a crashed worker's attempt counts too
+        lease = queue.claim()
+        assert lease is not None
+        expired = time.time() - 120
+        os.utime(lease.path, (expired, expired))
+        assert queue.requeue_expired() == 0
+
+        assert queue.claim() is None
+        assert queue.is_finished()
+        assert queue.failed_batches == [BATCHES[0].id]
+        assert queue.attempts(BATCHES[0].id) == 2
+
+
+def test_work_queue_stops_waiting_for_a_crashed_seeder():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        (Path(temp_dir) / "seeding").mkdir()
+        expired = time.time() - 120
+        os.utime(Path(temp_dir) / "seeding", (expired, expired))
+        with pytest.raises(TimeoutError):
+            WorkQueue(Path(temp_dir), seed_timeout=60).seed(BATCHES)
+
+
+def test_run_worker_completes_the_queue_and_reports_failed_batches():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        (temp_dir / "test.py").write_text(PYTHON_CODE)
+        for i in range(3):
+            (temp_dir / f"{i}.yml").write_text(f"id: '{i}'\ninput: q{i}\nexpected: ['q{i}']\n")
+        arguments = dict(
+            file_search_paths=[temp_dir],
+            queue_dir=temp_dir / "queue",
+            output_dir=temp_dir / "queue" / "output",
+            batch_size=1,
+            lease_timeout=60,
+            retry_count=1,
+            max_attempts=2,
+            poll_interval=0.01,
+        )
+        assert not run_worker(**arguments)
+
+        queue = WorkQueue(temp_dir / "queue")
+        assert queue.is_finished()
+        assert queue.num_done == 2
+        [failed] = queue.failed_batches
+        assert queue.attempts(failed) == 2
+        assert "ValueError: cannot answer q1" in (temp_dir / "queue" / "attempts" / f"{failed}.json.log").read_text()
+        assert len(list((temp_dir / "queue" / "output" / "predictions").glob("*.json"))) == 2
+
+        # a worker joining the finished queue doesn't run anything again
+        assert not run_worker(**arguments)
+        assert WorkQueue(temp_dir / "queue").num_done == 2
+
+
+def test_run_worker_finds_the_tests_of_a_queue_filled_from_another_mount():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        for mount in ("a", "b"):
+            (temp_dir / mount / "suite").mkdir(parents=True)
+            (temp_dir / mount / "suite" / "test.py").write_text(PYTHON_CODE)
+            (temp_dir / mount / "suite" / "0.yml").write_text("id: '0'\ninput: q0\nexpected: ['q0']\n")
+        queue_dir = temp_dir / "queue"
+        WorkQueue(queue_dir).seed(
+            [Batch(id="00000000", tests=[("test.py:4 (echo)", "0.yml")]), Batch(id="00000001", tests=BATCHES[0].tests)]
+        )
+
+        arguments = dict(
+            queue_dir=queue_dir,
+            output_dir=queue_dir / "output",
+            batch_size=1,
+            lease_timeout=60,
+            retry_count=1,
+            max_attempts=1,
+            poll_interval=0.01,
+        )
+        assert not run_worker(file_search_paths=[temp_dir / "b" / "suite"], **arguments)
+
+        # the batch of an unknown test fails on its own, the worker carries on with the others
+        queue = WorkQueue(queue_dir)
+        assert queue.num_done == 1
+        assert queue.failed_batches == ["00000001"]
+        assert "LookupError" in (queue_dir / "attempts" / "00000001.json.log").read_text()
+        assert len(list((queue_dir / "output" / "predictions").glob("*.json"))) == 1
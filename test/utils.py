@@ -1,5 +1,8 @@
 from openai.openai_object import OpenAIObject
 
+from benchllm import Prediction, Test
+from benchllm.data_types import FunctionID
+
 
 def create_openai_object(text):
     obj = OpenAIObject()
@@ -7,3 +10,9 @@ def create_openai_object(text):
     message.text = text
     obj.choices = [message]
     return obj
+
+
+def create_prediction(output: str, expected: list[str]) -> Prediction:
+    return Prediction(
+        test=Test(input="foo", expected=expected), output=output, time_elapsed=0, function_id=FunctionID.default()
+    )